@@ -4,6 +4,7 @@ import sys
 from importlib import import_module
 
 from base_project import log
+from base_project.main.base import base
 from base_project.utils import time_util
 from base_project.utils.database import connection_pool
 
@@ -55,7 +56,7 @@ class CLI(object):
         # 処理を実行
         try:
             logger.info('start main_process')
-            processor.run()
+            base.run_logic(processor)
             logger.info('end main_process')
         except Exception as e:
             logger.exception(e)
@@ -101,7 +101,9 @@ class Config(object):
             'max_overflow': os.getenv('SAMPLE_DB_MAXCONN'),
         }
 
-        self.MARKET_DB_URL = template_db_url.format(
+        # 組み込みDB(例: sqlite:///market.db、duckdb:///market.duckdb)を使う場合はMARKET_DB_URLで指定する
+        self.MARKET_DB_RDBMS = os.getenv('MARKET_DB_RDBMS', 'PostgreSQL')
+        self.MARKET_DB_URL = os.getenv('MARKET_DB_URL') or template_db_url.format(
             rdbms='postgresql',
             user=os.getenv('MARKET_DB_USER'),
             password=os.getenv('MARKET_DB_PASSWORD'),
@@ -110,13 +112,66 @@ class Config(object):
             dbname=os.getenv('MARKET_DB_DBNAME')
         )
 
+        # リードレプリカの接続URL(カンマ区切り)
+        self.MARKET_DB_REPLICA_URLS = [url.strip() for url in os.getenv('MARKET_DB_REPLICA_URLS', '').split(',')
+                                       if url.strip()]
+
         self._MARKET_DB = {
-            'rdbms': 'PostgreSQL',
+            'rdbms': self.MARKET_DB_RDBMS,
             'url': self.MARKET_DB_URL,
             'max_overflow': os.getenv('MARKET_DB_MAXCONN'),
             'pool_size': os.getenv('MARKET_DB_MINCONN'),
+            'replica_urls': self.MARKET_DB_REPLICA_URLS,
+            # round_robin または least_busy
+            'replica_selection': os.getenv('MARKET_DB_REPLICA_SELECTION', 'round_robin'),
+            # 更新後の読み込みをプライマリで行う
+            'read_your_writes': os.getenv('MARKET_DB_READ_YOUR_WRITES', 'false').lower() in ('1', 'true', 'yes'),
         }
 
+        # 株価の格納方式(per_ticker: 銘柄ごとのテーブル、partitioned: (symbol, date)をキーとする1つのテーブル)
+        self.MARKET_STORAGE_LAYOUT = os.getenv('MARKET_STORAGE_LAYOUT', 'per_ticker')
+        # partitionedの場合のPostgreSQLのパーティション方式(hash: 銘柄のハッシュ、range: 日付の年ごと)
+        self.MARKET_PARTITION_BY = os.getenv('MARKET_PARTITION_BY', 'hash')
+        # hashの場合のパーティション数
+        self.MARKET_PARTITION_COUNT = int(os.getenv('MARKET_PARTITION_COUNT', '16'))
+
+        # データソースへのリクエストのホストごとのレート制限(1秒あたりのリクエスト数)と連続して送れるリクエスト数
+        self.MARKET_DATA_RATE_LIMIT = float(os.getenv('MARKET_DATA_RATE_LIMIT', '2'))
+        self.MARKET_DATA_BURST = float(os.getenv('MARKET_DATA_BURST', '5'))
+        # データソースへの同時接続数
+        self.MARKET_DATA_MAX_CONNECTIONS = int(os.getenv('MARKET_DATA_MAX_CONNECTIONS', '4'))
+        # 429、5xxの場合のリトライ回数
+        self.MARKET_DATA_MAX_RETRIES = int(os.getenv('MARKET_DATA_MAX_RETRIES', '5'))
+
+        # StockPriceUpdaterのステージごとのスレッド数(取得、変換、書き込み)とステージ間のキューの大きさ
+        self.MARKET_UPDATE_FETCH_WORKERS = int(os.getenv('MARKET_UPDATE_FETCH_WORKERS',
+                                                         str(self.MARKET_DATA_MAX_CONNECTIONS)))
+        self.MARKET_UPDATE_TRANSFORM_WORKERS = int(os.getenv('MARKET_UPDATE_TRANSFORM_WORKERS', '1'))
+        self.MARKET_UPDATE_WRITE_WORKERS = int(os.getenv('MARKET_UPDATE_WRITE_WORKERS', '2'))
+        self.MARKET_UPDATE_QUEUE_SIZE = int(os.getenv('MARKET_UPDATE_QUEUE_SIZE', '8'))
+        # StockPriceUpdaterで同じ開始日の銘柄をまとめて取得する銘柄数
+        self.MARKET_UPDATE_FETCH_BATCH_SIZE = int(os.getenv('MARKET_UPDATE_FETCH_BATCH_SIZE', '50'))
+
+        # データソースから取得した株価のキャッシュ(parquet、featherはpyarrowが必要)
+        self.MARKET_DATA_CACHE_ENABLED = os.getenv('MARKET_DATA_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.MARKET_DATA_CACHE_DIR = os.getenv('MARKET_DATA_CACHE_DIR',
+                                               os.path.join(self.PROJECT_ROOT_PATH, 'cache', 'market_data'))
+        self.MARKET_DATA_CACHE_FORMAT = os.getenv('MARKET_DATA_CACHE_FORMAT', 'parquet')
+        # キャッシュする銘柄数の上限(未設定の場合は削除しない)
+        self.MARKET_DATA_CACHE_MAX_SYMBOLS = int(os.environ['MARKET_DATA_CACHE_MAX_SYMBOLS']) \
+            if os.getenv('MARKET_DATA_CACHE_MAX_SYMBOLS') else None
+
+        ###########################################################################
+        # SQLトレースの設定
+        ###########################################################################
+
+        # 集計するクエリの割合(スロークエリは常に集計する)
+        self.SQL_TRACE_SAMPLE_RATE = float(os.getenv('SQL_TRACE_SAMPLE_RATE', '1.0'))
+        # スロークエリとみなす実行時間(ミリ秒)
+        self.SQL_SLOW_QUERY_MS = float(os.getenv('SQL_SLOW_QUERY_MS', '1000'))
+        # スロークエリの実行計画をEXPLAINで取得する
+        self.SQL_EXPLAIN_SLOW_QUERY = os.getenv('SQL_EXPLAIN_SLOW_QUERY', 'false').lower() in ('1', 'true', 'yes')
+
         ###########################################################################
         # メールの設定
         ###########################################################################
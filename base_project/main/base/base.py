@@ -1,5 +1,10 @@
+import asyncio
+import inspect
 from abc import ABCMeta, abstractmethod
 
+from base_project.config import Config
+from base_project.utils.database import connection_pool, query_tracer
+
 
 class BasicLogic(metaclass=ABCMeta):
     """
@@ -30,3 +35,45 @@ class BasicLogic(metaclass=ABCMeta):
         """
         pass
 
+
+class AsyncBasicLogic(BasicLogic):
+    """
+    メイン処理をコルーチンで実装する基底ロジック
+    """
+    @abstractmethod
+    async def run(self):
+        """メイン処理
+        """
+        pass
+
+
+def run_logic(processor: BasicLogic):
+    """ロジックのメイン処理を実行する
+
+    runがコルーチン関数の場合はイベントループを作成して実行し、終了時にasyncio用のコネクションプールを閉じる。
+    終了時にはクエリのフィンガープリントごとの実行統計をログに出力する
+
+    Args:
+        processor: BasicLogicのインスタンス
+
+    """
+    config = Config.get_instance()
+    tracer = query_tracer.get_tracer()
+    tracer.configure(sample_rate=config.SQL_TRACE_SAMPLE_RATE,
+                     slow_query_ms=config.SQL_SLOW_QUERY_MS,
+                     explain=config.SQL_EXPLAIN_SLOW_QUERY)
+
+    try:
+        if inspect.iscoroutinefunction(processor.run):
+            asyncio.run(_run_async(processor))
+        else:
+            processor.run()
+    finally:
+        tracer.log_summary()
+
+
+async def _run_async(processor: BasicLogic):
+    try:
+        await processor.run()
+    finally:
+        await connection_pool.ConnectionPoolManager.close_async_connection_pools()
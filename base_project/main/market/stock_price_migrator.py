@@ -0,0 +1,80 @@
+import argparse
+import logging
+import time
+from concurrent import futures
+
+from base_project.main.base import base
+from base_project.models.market import stock_price
+
+logger = logging.getLogger(__name__)
+
+
+class StockPriceMigrator(base.BasicLogic):
+    """
+    銘柄ごとのテーブルの株価を(symbol, date)をキーとする1つのテーブルへ移行する
+
+    銘柄ごとに並列で、サーバサイドカーソルでbatch_size件ずつ読み込みながらupsertするため、
+    メモリ使用量はテーブルの大きさによらず、途中で失敗しても再実行できる
+    """
+
+    def __init__(self, ticker_symbol, batch_size=50000, workers=4, drop_source=False):
+
+        self._ticker_symbols = ticker_symbol
+        self._batch_size = int(batch_size)
+        self._workers = int(workers)
+        self._drop_source = drop_source
+
+    def run(self):
+
+        symbols = sorted(set(self._ticker_symbols))
+        source_symbols = stock_price.StockPrice.existing_symbols(symbols, stock_price.LAYOUT_PER_TICKER)
+        for symbol in sorted(set(symbols) - source_symbols):
+            logger.warning('{} table does not exist'.format(symbol))
+        if not source_symbols:
+            return
+
+        stock_price.StockPrice(symbols[0], stock_price.LAYOUT_PARTITIONED).create_partitioned_table()
+
+        migrated_symbols = []
+        total_rows = 0
+        with futures.ThreadPoolExecutor(max_workers=self._workers) as executor:
+            future_dict = {executor.submit(self._migrate, symbol): symbol for symbol in sorted(source_symbols)}
+            for future in futures.as_completed(future_dict):
+                total_rows += future.result()
+                migrated_symbols.append(future_dict[future])
+
+        logger.info('migrated {} symbols, {} rows'.format(len(migrated_symbols), total_rows))
+
+        if self._drop_source:
+            stock_price.StockPrice(symbols[0], stock_price.LAYOUT_PER_TICKER).drop_tables(migrated_symbols)
+
+    def _migrate(self, symbol):
+        """1銘柄のテーブルをbatch_size件ずつ移行する
+
+        Args:
+            symbol: 銘柄
+
+        Returns:
+            移行した行数
+        """
+        start_time = time.perf_counter()
+        source = stock_price.StockPrice(symbol, stock_price.LAYOUT_PER_TICKER)
+        target = stock_price.StockPrice(symbol, stock_price.LAYOUT_PARTITIONED)
+
+        row_count = 0
+        for rows in source.iter_price_batches(self._batch_size):
+            row_count += target.upsert_rows(rows).row_count
+
+        logger.info('{}: {} rows ({:.3f}s)'.format(symbol, row_count, time.perf_counter() - start_time))
+        return row_count
+
+    @staticmethod
+    def cli(sys_argv):
+        parser = argparse.ArgumentParser()
+
+        parser.add_argument('-ts', '--ticker-symbol', nargs='*', required=True)
+        parser.add_argument('-bs', '--batch-size', default=50000)
+        parser.add_argument('-w', '--workers', default=4)
+        parser.add_argument('--drop-source', action='store_true')
+
+        return parser.parse_args(sys_argv)
@@ -1,36 +1,246 @@
 import argparse
+import collections
+import datetime
 import logging
 import os
-from concurrent import futures
+from dataclasses import dataclass
 
-from base_project import slack
+import pandas as pd
+
+from base_project import config, slack
 from base_project.main.base import base
 from base_project.models.market import stock_price
-from base_project.utils import market_data, time_util, util
+from base_project.utils import market_data, stage_pipeline, time_util, util
 
 logger = logging.getLogger(__name__)
 
+# テーブル(partitionedの場合は銘柄の行)が存在しない
+STATUS_NEW = 'new'
+# 最新の日付より後のデータを取得する
+STATUS_STALE = 'stale'
+# 最新のデータが存在する
+STATUS_CURRENT = 'current'
+
+
+@dataclass
+class UpdatePlan:
+    """
+    銘柄ごとの更新計画
+    """
+    symbol: str
+    status: str
+    start_date: str = None
+    latest_date: datetime.date = None
+
 
 class StockPriceUpdater(base.BasicLogic):
 
-    def __init__(self, ticker_symbol, start_date=None, end_date=None):
+    def __init__(self, ticker_symbol, start_date=None, end_date=None, fetch_workers=None, transform_workers=None,
+                 write_workers=None, queue_size=None, fetch_batch_size=None):
 
         self._ticker_symbols = ticker_symbol
         self._start_date = start_date
         self._end_date = end_date
 
+        conf = config.Config.get_instance()
+        self._fetch_workers = int(fetch_workers or conf.MARKET_UPDATE_FETCH_WORKERS)
+        self._transform_workers = int(transform_workers or conf.MARKET_UPDATE_TRANSFORM_WORKERS)
+        self._write_workers = int(write_workers or conf.MARKET_UPDATE_WRITE_WORKERS)
+        self._queue_size = int(queue_size or conf.MARKET_UPDATE_QUEUE_SIZE)
+        self._fetch_batch_size = int(fetch_batch_size or conf.MARKET_UPDATE_FETCH_BATCH_SIZE)
+        self._partitioned = False
+
         self._slack_notificator = slack.SlackNotificator(util.name2base_name(__name__))
         self._start_time = None
 
     def run(self):
 
-        future_list = []
+        symbols = sorted(set(self._ticker_symbols))
+        if not symbols:
+            return
+
+        stock_price_obj = stock_price.StockPrice(symbols[0])
+        if stock_price_obj.partitioned:
+            # 1つのテーブルに格納する場合は、並列の投入より前にテーブルと不足している年のパーティションを作成しておく
+            stock_price_obj.create_partitioned_table()
+
+        self._partitioned = stock_price_obj.partitioned
+        plans = [plan for plan in self._plan(symbols, stock_price_obj.partitioned) if plan.status != STATUS_CURRENT]
+
+        # 取得、変換、書き込みを別のスレッドで並行に実行し、ステージ間のキューの大きさで処理中のデータ量を制限する
+        # 取得は同じ開始日の銘柄をまとめて1回のリクエストで行い、変換以降は銘柄ごとに処理する
+        pipeline = stage_pipeline.StagePipeline([
+            stage_pipeline.Stage('fetch', self._fetch, self._fetch_workers, self._queue_size, expand=True),
+            stage_pipeline.Stage('transform', self._transform, self._transform_workers, self._queue_size),
+            stage_pipeline.Stage('write', self._write, self._write_workers, self._queue_size),
+        ])
+        stats, errors = pipeline.run(self._group(plans), key=self._symbols)
+
+        for stage_name, symbols, exception in errors:
+            logger.error('{} {} failed\n{}'.format(', '.join(symbols), stage_name, util.exception2str(exception)))
+        pipeline.log_stats(stats)
+        market_data.get_scheduler().latency.log_summary()
+
+        if errors:
+            failed_symbols = sorted(symbol for _, symbols, _ in errors for symbol in symbols)
+            raise RuntimeError('{} of {} symbols failed: {}'.format(len(failed_symbols), len(plans),
+                                                                    ', '.join(failed_symbols)))
+
+    def _expected_latest_date(self) -> datetime.date:
+        """最新とみなす日付(終了日、未指定の場合は前日以前の直近の営業日)を返却する
+
+        Returns:
+            最新とみなす日付
+        """
+        if self._end_date:
+            end_date = pd.Timestamp(self._end_date)
+        else:
+            # 当日分は取引時間中に確定しないため、前日までを対象とする
+            end_date = pd.Timestamp.today().normalize() - pd.Timedelta(days=1)
+        return pd.offsets.BDay().rollback(end_date).date()
+
+    def _plan(self, symbols, partitioned) -> list:
+        """全銘柄のテーブルの有無と最新の日付をまとめて取得し、銘柄ごとの取得期間を決める
+
+        Args:
+            symbols: 銘柄のリスト
+            partitioned: 1つのテーブルに格納している
+
+        Returns:
+            UpdatePlanのリスト
+        """
+        if partitioned:
+            latest_dates = stock_price.StockPrice.latest_dates(symbols)
+            existing_symbols = set(latest_dates)
+        else:
+            # テーブルの有無を1回のクエリで確認し、存在するテーブルの最新の日付を1回のクエリで取得する
+            existing_symbols = stock_price.StockPrice.existing_symbols(symbols)
+            latest_dates = stock_price.StockPrice.latest_dates(existing_symbols)
+
+        expected_latest_date = self._expected_latest_date()
+        initial_start_date = time_util.get_past_date_stamp(years=2)
+
+        plans = []
+        for symbol in symbols:
+            latest_date = latest_dates.get(symbol)
+            if symbol not in existing_symbols:
+                plan = UpdatePlan(symbol, STATUS_NEW, initial_start_date)
+            elif self._start_date:
+                # --start-dateでの再実行は既存の日付と重複しても更新する
+                plan = UpdatePlan(symbol, STATUS_STALE, self._start_date, latest_date)
+            elif latest_date is None:
+                plan = UpdatePlan(symbol, STATUS_STALE, initial_start_date)
+            elif latest_date >= expected_latest_date:
+                plan = UpdatePlan(symbol, STATUS_CURRENT, None, latest_date)
+            else:
+                plan = UpdatePlan(symbol, STATUS_STALE, time_util.get_past_date_stamp(latest_date, days=-1),
+                                  latest_date)
+            logger.debug('plan {}: {} from {} (latest: {})'.format(plan.symbol, plan.status, plan.start_date,
+                                                                   plan.latest_date))
+            plans.append(plan)
+
+        counts = collections.Counter(plan.status for plan in plans)
+        logger.info('update plan: {} symbols (new: {}, stale: {}, current: {}), up to {}'.format(
+            len(plans), counts[STATUS_NEW], counts[STATUS_STALE], counts[STATUS_CURRENT],
+            self._end_date or expected_latest_date))
+        return plans
+
+    def _group(self, plans) -> list:
+        """取得開始日が同じ銘柄をfetch_batch_size銘柄ずつまとめる
+
+        Args:
+            plans: UpdatePlanのリスト
+
+        Returns:
+            UpdatePlanのリストのリスト
+        """
+        plans_by_start_date = collections.defaultdict(list)
+        for plan in plans:
+            plans_by_start_date[plan.start_date].append(plan)
+
+        return [group[i:i + self._fetch_batch_size] for _, group in sorted(plans_by_start_date.items())
+                for i in range(0, len(group), self._fetch_batch_size)]
+
+    @staticmethod
+    def _symbols(item) -> tuple:
+        """パイプラインのデータ(UpdatePlanのリスト、または各ステージの結果)の銘柄を返却する(エラーの報告に利用する)
+
+        Args:
+            item: パイプラインのデータ
+
+        Returns:
+            銘柄のタプル
+        """
+        plans = item if isinstance(item, list) else [item[0]]
+        return tuple(plan.symbol for plan in plans)
+
+    def _fetch(self, plans):
+        """取得開始日が同じ銘柄の株価をまとめてデータソースから取得する(ネットワークの待ち時間が主のステージ)
 
-        with futures.ThreadPoolExecutor() as executor:
-            for symbol in set(self._ticker_symbols):
-                future = executor.submit(fn=self._update, symbol=symbol)
-                future_list.append(future)
-        futures.as_completed(future_list)
+        キャッシュが有効な場合は、キャッシュ済みの期間をデータソースから取得しない
+
+        Args:
+            plans: 取得開始日が同じUpdatePlanのリスト
+
+        Returns:
+            (UpdatePlan, 株価のDataFrame, 開始時刻)のリスト。取得したデータがない銘柄は含まない
+        """
+        start_time = time_util.get_timestamp_now()
+        market_data_dfs = market_data.fetch_stock_data_batch([plan.symbol for plan in plans], plans[0].start_date,
+                                                             self._end_date, batch_size=self._fetch_batch_size)
+
+        fetched = []
+        for plan in plans:
+            market_data_df = market_data_dfs.get(plan.symbol)
+            if market_data_df is None or not len(market_data_df):
+                if plan.status == STATUS_STALE:
+                    logger.info('{} data is up to date'.format(plan.symbol))
+                else:
+                    logger.warning('{} data do not exists'.format(plan.symbol))
+                continue
+            fetched.append((plan, market_data_df, start_time))
+        return fetched
+
+    def _transform(self, fetched):
+        """カラム名の変換と型の変換を行う
+
+        Args:
+            fetched: _fetchの結果
+
+        Returns:
+            (UpdatePlan, テーブルのカラムのDataFrame, 開始時刻)
+        """
+        plan, market_data_df, start_time = fetched
+        symbol = plan.symbol if self._partitioned else None
+        return plan, stock_price.StockPrice.to_table_columns(market_data_df, symbol), start_time
+
+    def _write(self, transformed):
+        """データベースに書き込む
+
+        Args:
+            transformed: _transformの結果
+
+        Returns:
+            UpdatePlan
+        """
+        plan, table_df, start_time = transformed
+        stock_price_obj = stock_price.StockPrice(plan.symbol)
+
+        if plan.status == STATUS_STALE:
+            stock_price_obj.upsert_table_df(table_df)
+        else:
+            # 対象データの初回実行時
+            # テーブル作成とデータ投入を1つのトランザクションで行い、エラー時はテーブルも残さない
+            with stock_price_obj.transaction():
+                stock_price_obj.create_table()
+                stock_price_obj.insert_table_df(table_df)
+
+        self._slack_notificator.notify_from_file(os.path.join('slack', 'market', 'success.txt'),
+                                                 {'ticker_symbol': plan.symbol,
+                                                  'start_time': start_time,
+                                                  'end_time': time_util.get_timestamp_now()
+                                                  })
+        return plan
 
     def do_after_exception(self, exception):
         self._slack_notificator.notify_from_file(os.path.join('slack', 'utils', 'error.txt'),
@@ -46,49 +256,10 @@ class StockPriceUpdater(base.BasicLogic):
         parser.add_argument('-ts', '--ticker-symbol', nargs='*', required=True)
         parser.add_argument('-st', '--start-date', default=None)
         parser.add_argument('-et', '--end-date', default=None)
+        parser.add_argument('--fetch-workers', default=None)
+        parser.add_argument('--transform-workers', default=None)
+        parser.add_argument('--write-workers', default=None)
+        parser.add_argument('--queue-size', default=None)
+        parser.add_argument('--fetch-batch-size', default=None)
 
         return parser.parse_args(sys_argv)
-
-    def _update(self, symbol):
-        start_time = time_util.get_timestamp_now()
-        stock_price_obj = stock_price.StockPrice(symbol)
-        if stock_price_obj.table_exists():
-            if self._start_date:
-                latest_date = self._start_date
-            else:
-                latest_date = stock_price_obj.select_latest_date()
-                latest_date = time_util.get_past_date_stamp(latest_date, days=-1)
-
-            market_data_df = market_data.fetch_stock_data_from_yf(symbol, latest_date, self._end_date)
-            if len(market_data_df):
-                stock_price_obj.insert_market_data_df(market_data_df)
-            else:
-                logger.info('{} data is up to date'.format(symbol))
-        else:
-            #  対象データの初回実行時
-            stock_price_obj.create_table()
-            latest_date = time_util.get_past_date_stamp(years=2)
-
-            try:
-                market_data_df = market_data.fetch_stock_data_from_yf(symbol, latest_date, self._end_date)
-            except Exception:
-                # データ初回投入時のエラー発生後は対象テーブルの削除をおこなう
-                stock_price_obj.drop_table()
-                raise
-
-            if len(market_data_df):
-                try:
-                    stock_price_obj.insert_market_data_df(market_data_df)
-                except Exception:
-                    # データ初回投入時のエラー発生後は対象テーブルの削除をおこなう
-                    stock_price_obj.drop_table()
-                    raise
-
-            else:
-                logger.warning('{} data do not exists'.format(symbol))
-
-        self._slack_notificator.notify_from_file(os.path.join('slack', 'market', 'success.txt'),
-                                                 {'ticker_symbol': symbol,
-                                                  'start_time': start_time,
-                                                  'end_time': time_util.get_timestamp_now()
-                                                  })
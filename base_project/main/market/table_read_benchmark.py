@@ -0,0 +1,58 @@
+import argparse
+import logging
+import time
+
+from base_project.main.base import base
+from base_project.models.market import stock_price
+
+logger = logging.getLogger(__name__)
+
+
+class TableReadBenchmark(base.BasicLogic):
+    """
+    株価テーブルの読み込みをread_sql_queryとCOPY TO STDOUTで比較する
+    """
+
+    def __init__(self, ticker_symbol, repeat=3):
+
+        self._ticker_symbols = ticker_symbol
+        self._repeat = int(repeat)
+
+    def run(self):
+
+        for symbol in self._ticker_symbols:
+            stock_price_obj = stock_price.StockPrice(symbol)
+            query = 'SELECT * FROM "{}"'.format(symbol)
+
+            read_sql_seconds = self._measure(
+                lambda: stock_price_obj.read_table_by_query(query, index_col='date', parse_dates=['date']))
+            copy_seconds = self._measure(
+                lambda: stock_price_obj.read_table_by_copy(query, index_col='date', parse_dates=['date']))
+
+            logger.info('{}: read_sql_query {:.3f}s, copy {:.3f}s ({:.1f}x)'.format(
+                symbol, read_sql_seconds, copy_seconds, read_sql_seconds / copy_seconds if copy_seconds else 0.0))
+
+    def _measure(self, function):
+        """関数の実行時間の最小値を計測する
+
+        Args:
+            function: 計測する関数
+
+        Returns:
+            実行時間(秒)
+        """
+        elapsed_seconds = []
+        for _ in range(self._repeat):
+            start_time = time.perf_counter()
+            function()
+            elapsed_seconds.append(time.perf_counter() - start_time)
+        return min(elapsed_seconds)
+
+    @staticmethod
+    def cli(sys_argv):
+        parser = argparse.ArgumentParser()
+
+        parser.add_argument('-ts', '--ticker-symbol', nargs='*', required=True)
+        parser.add_argument('-r', '--repeat', default=3)
+
+        return parser.parse_args(sys_argv)
@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import logging
+
+from base_project.config import Config
+from base_project.main.base import base
+from base_project.utils.database import async_database_accessor
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSample(base.AsyncBasicLogic):
+    """
+    asyncio用のアクセサで複数のテーブルの有無を並行に確認するサンプル
+
+    runがコルーチン関数のため、base.run_logicがイベントループで実行し、終了時にコネクションプールを閉じる
+    """
+
+    def __init__(self, table_name):
+        super().__init__()
+        self._table_names = table_name
+
+    async def run(self):
+        db = await async_database_accessor.AsyncDatabaseAccessorFactory.create(**Config.get_instance().MARKET_DB)
+
+        exists_list = await asyncio.gather(*[db.table_exists(table_name) for table_name in self._table_names])
+        for table_name, exists in zip(self._table_names, exists_list):
+            logger.info('{}: {}'.format(table_name, 'exists' if exists else 'does not exist'))
+
+    @staticmethod
+    def cli(sys_argv):
+        parser = argparse.ArgumentParser()
+        parser.add_argument('-t', '--table-name', nargs='*', required=True)
+
+        return parser.parse_args(sys_argv)
@@ -1,28 +1,59 @@
-import os
 from abc import ABCMeta
 from typing import Union
 
-from base_project import config
+from base_project import sql_file_reader
 from base_project.utils.database import database_accessor
 
-SQl_ROOT_PATH = config.Config.get_instance().SQL_ROOT_PATH
 
+class ModelForDatabase(metaclass=ABCMeta):
+    # モデルが利用するSQLファイルの論理名(インスタンス生成時に存在を確認する)
+    SQL_FILES = ()
 
-def join_sql_file_path(*sql_file_dirs):
-    def _join_sql_file_path(function):
-        def __join_sql_file_path(self, file_path, *args, **kwargs):
-            abs_sql_file_path = os.path.join(*sql_file_dirs, file_path)
-            return function(self, abs_sql_file_path, *args, **kwargs)
+    def __init__(self, **kwargs):
+        self._sql_file_reader = sql_file_reader.SqlFileReader.get_instance()
+        self._sql_file_reader.validate(self.SQL_FILES)
+        self._db = database_accessor.DatabaseAccessorFactory.create(**kwargs)
 
-        return __join_sql_file_path
+    def read_query(self, file_path: str, encoding: str = None) -> str:
+        """SQL_ROOT_PATH配下のSQLファイルのクエリを取得する
 
-    return _join_sql_file_path
+        Args:
+            file_path: 論理名(例: market/select_latest_date)またはSQL_ROOT_PATHからの相対パス
+            encoding: エンコーディング
 
+        Returns:
+            クエリ
+        """
+        return self._sql_file_reader.read(file_path, encoding)
 
-class ModelForDatabase(metaclass=ABCMeta):
+    def enable_result_cache(self, maxsize: int = 1024, ttl: float = 60):
+        """select_*、read_table_by_queryの結果のキャッシュを有効にする
 
-    def __init__(self, **kwargs):
-        self._db = database_accessor.DatabaseAccessorFactory.create(**kwargs)
+        Args:
+            maxsize: 最大のエントリ数
+            ttl: エントリの有効期間(秒)
+
+        """
+        self._db.enable_result_cache(maxsize, ttl)
+
+    def result_cache_stats(self):
+        return self._db.result_cache_stats()
+
+    def transaction(self):
+        """1つのコネクションを固定し、ブロック内のクエリを1つのトランザクションで実行する
+
+        Returns:
+            トランザクションのコンテキストマネージャ
+        """
+        return self._db.transaction()
+
+    def use_primary(self):
+        """ブロック内の読み込みをリードレプリカではなくプライマリで実行する
+
+        Returns:
+            プライマリを利用するコンテキストマネージャ
+        """
+        return self._db.use_primary()
 
     def execute(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None):
         """クエリを実行する
@@ -35,137 +66,188 @@ class ModelForDatabase(metaclass=ABCMeta):
         """
         self._db.execute(query, params, raw_params)
 
-    @join_sql_file_path(SQl_ROOT_PATH)
     def execute_from_file(self, file_path: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
                           encoding: str = None):
         """ファイルからクエリを読み込み、executeを実行する
 
         Args:
-            file_path: ファイルのパス
+            file_path: SQLファイルの論理名またはSQL_ROOT_PATHからの相対パス
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
             encoding: エンコーディング
 
         """
-        self._db.execute_from_file(file_path, params, raw_params, encoding)
+        self._db.execute(self.read_query(file_path, encoding), params, raw_params)
 
-    def executemany(self, query: str, params: Union[list, tuple] = None, raw_params: dict = None):
-        """タプル、リストからデータのINSERTを行う
+    def executemany(self, query: str, params: Union[list, tuple] = None, raw_params: dict = None,
+                    page_size: int = database_accessor.DatabaseAccessor.DEFAULT_PAGE_SIZE) -> int:
+        """タプル、リストからデータのINSERTをpage_size件ずつまとめて行う
 
         Args:
             query: クエリ
             params: インサートのデータ
             raw_params: formatで設定するパラメタ
+            page_size: 1回のラウンドトリップで送る件数
 
+        Returns:
+            影響を受けた行数(取得できない場合は-1)
         """
+        return self._db.executemany(query, params, raw_params, page_size)
 
-        self._db.execute_from_file(query, params, raw_params)
-
-    @join_sql_file_path(SQl_ROOT_PATH)
     def executemany_from_file(self, file_path: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
-                              encoding: str = None):
+                              encoding: str = None,
+                              page_size: int = database_accessor.DatabaseAccessor.DEFAULT_PAGE_SIZE) -> int:
         """ファイルからクエリを読み込み、executemanyを実行する
 
         Args:
-            file_path: ファイルのパス
+            file_path: SQLファイルの論理名またはSQL_ROOT_PATHからの相対パス
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
             encoding: エンコーディング
+            page_size: 1回のラウンドトリップで送る件数
 
+        Returns:
+            影響を受けた行数(取得できない場合は-1)
         """
+        return self._db.executemany(self.read_query(file_path, encoding), params, raw_params, page_size)
 
-        self._db.execute_from_file(file_path, params, raw_params, encoding)
-
-    def select_all(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None) -> tuple:
+    def select_all(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
+                   row_format: str = None):
         """SELECT文を実行し、結果をすべて取得する
 
         Args:
             query: クエリ
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
+            row_format: tuple、namedtuple、dict、columnsのいずれか(デフォルト: tuple)
 
         Returns:
             クエリの実行結果
         """
-        return self._db.select_all_from_file(query, params, raw_params)
+        return self._db.select_all(query, params, raw_params, row_format=row_format)
 
-    @join_sql_file_path(SQl_ROOT_PATH)
     def select_all_from_file(self, file_path: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
-                             encoding: str = None) -> tuple:
+                             encoding: str = None, row_format: str = None):
         """ファイルからクエリを読み込み、select_allを実行する
 
         Args:
-            file_path: ファイルのパス
+            file_path: SQLファイルの論理名またはSQL_ROOT_PATHからの相対パス
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
             encoding: エンコーディング
+            row_format: tuple、namedtuple、dict、columnsのいずれか(デフォルト: tuple)
 
         Returns:
             クエリの実行結果
         """
-        return self._db.select_all_from_file(file_path, params, raw_params, encoding)
+        return self._db.select_all(self.read_query(file_path, encoding), params, raw_params, row_format=row_format)
 
     def select_many(self, query: str, fetch_size: int, params: Union[dict, list, tuple] = None,
-                    raw_params: dict = None) -> tuple:
-        """SELECT文を実行し、結果をすべて取得する
+                    raw_params: dict = None, row_format: str = None):
+        """SELECT文を実行し、結果をfetch_size件取得する
 
         Args:
             query: クエリ
             fetch_size: 取得行の数
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
+            row_format: tuple、namedtuple、dict、columnsのいずれか(デフォルト: tuple)
 
         Returns:
             クエリの実行結果
         """
-        return self._db.select_many(query, fetch_size, params, raw_params)
+        return self._db.select_many(query, fetch_size, params, raw_params, row_format=row_format)
 
-    @join_sql_file_path(SQl_ROOT_PATH)
     def select_many_from_file(self, file_path: str, fetch_size: int, params: Union[dict, list, tuple] = None,
                               raw_params: dict = None,
-                              encoding: str = None) -> tuple:
-        """ファイルからクエリを読み込み、select_allを実行する
+                              encoding: str = None, row_format: str = None):
+        """ファイルからクエリを読み込み、select_manyを実行する
 
         Args:
-            file_path: ファイルのパス
+            file_path: SQLファイルの論理名またはSQL_ROOT_PATHからの相対パス
             fetch_size: 取得行の数
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
             encoding: エンコーディング
+            row_format: tuple、namedtuple、dict、columnsのいずれか(デフォルト: tuple)
 
         Returns:
             クエリの実行結果
         """
-        return self._db.select_many_from_file(file_path, fetch_size, params, raw_params, encoding)
+        return self._db.select_many(self.read_query(file_path, encoding), fetch_size, params, raw_params,
+                                    row_format=row_format)
 
-    def select_one(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None) -> tuple:
+    def select_one(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
+                   row_format: str = None):
         """SELECT文を実行し、結果の先頭を取得する
 
         Args:
             query: クエリ
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
+            row_format: tuple、namedtuple、dict、columnsのいずれか(デフォルト: tuple)
 
         Returns:
             クエリの実行結果
         """
-        return self._db.select_one(query, params, raw_params)
+        return self._db.select_one(query, params, raw_params, row_format=row_format)
 
-    @join_sql_file_path(SQl_ROOT_PATH)
     def select_one_from_file(self, file_path: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
-                             encoding: str = None) -> tuple:
+                             encoding: str = None, row_format: str = None):
         """ファイルからクエリを読み込み、select_oneを実行する
 
         Args:
-            file_path: ファイルのパス
+            file_path: SQLファイルの論理名またはSQL_ROOT_PATHからの相対パス
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
             encoding: エンコーディング
+            row_format: tuple、namedtuple、dict、columnsのいずれか(デフォルト: tuple)
 
         Returns:
             クエリの実行結果
         """
-        return self._db.select_one_from_file(file_path, params, raw_params, encoding)
+        return self._db.select_one(self.read_query(file_path, encoding), params, raw_params, row_format=row_format)
+
+    def select_iter(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
+                    to_dict: bool = False, itersize: int = database_accessor.DatabaseAccessor.DEFAULT_ITERSIZE,
+                    as_batches: bool = False, row_format: str = None):
+        """サーバサイドカーソルでSELECT文を実行し、結果を逐次取得する
+
+        Args:
+            query: クエリ
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+            to_dict: 結果を辞書で返却する
+            itersize: 1回のフェッチで取得する行数
+            as_batches: 行ではなくitersize件ごとのリストで返却する
+            row_format: tuple、namedtuple、dict、columnsのいずれか
+
+        Returns:
+            クエリの実行結果のジェネレータ
+        """
+        return self._db.select_iter(query, params, raw_params, to_dict, itersize, as_batches, row_format)
+
+    def select_iter_from_file(self, file_path: str, params: Union[dict, list, tuple] = None,
+                              raw_params: dict = None, to_dict: bool = False,
+                              itersize: int = database_accessor.DatabaseAccessor.DEFAULT_ITERSIZE,
+                              as_batches: bool = False, encoding: str = None, row_format: str = None):
+        """ファイルからクエリを読み込み、select_iterを実行する
+
+        Args:
+            file_path: SQLファイルの論理名またはSQL_ROOT_PATHからの相対パス
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+            to_dict: 結果を辞書で返却する
+            itersize: 1回のフェッチで取得する行数
+            as_batches: 行ではなくitersize件ごとのリストで返却する
+            encoding: エンコーディング
+            row_format: tuple、namedtuple、dict、columnsのいずれか
+
+        Returns:
+            クエリの実行結果のジェネレータ
+        """
+        return self._db.select_iter(self.read_query(file_path, encoding), params, raw_params, to_dict, itersize,
+                                    as_batches, row_format)
 
     def read_table_by_name(self, table_name,
                            schema=None,
@@ -188,13 +270,50 @@ class ModelForDatabase(metaclass=ABCMeta):
                             params=None,
                             parse_dates=None,
                             chunksize=None):
-        return self._db.read_table_by_query(sql=query,
+        return self._db.read_table_by_query(query=query,
                                             index_col=index_col,
                                             coerce_float=coerce_float,
                                             params=params,
                                             parse_dates=parse_dates,
                                             chunksize=chunksize)
 
+    def read_table_by_copy(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
+                           index_col=None, dtype=None, parse_dates=None, chunksize: int = None,
+                           as_numpy: bool = False):
+        """COPY TO STDOUTでクエリの結果を列指向に読み込む
+
+        Args:
+            query: クエリ
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+            index_col: インデックスにするカラム
+            dtype: カラムごとの型のヒント
+            parse_dates: 日付として読み込むカラム
+            chunksize: 指定した場合はchunksize行ごとのイテレータで返却する
+            as_numpy: DataFrameではなく{カラム名: numpy.ndarray}で返却する
+
+        Returns:
+            DataFrame、{カラム名: numpy.ndarray}、またはそれらのイテレータ
+        """
+        return self._db.read_table_by_copy(query, params, raw_params, index_col=index_col, dtype=dtype,
+                                           parse_dates=parse_dates, chunksize=chunksize, as_numpy=as_numpy)
+
+    def read_table_parallel(self, key_column: str, table_name: str = None, query: str = None, params: dict = None,
+                            **kwargs):
+        """テーブル(クエリの結果)をキーの範囲で分割して並列に読み込む
+
+        Args:
+            key_column: 分割に利用するカラム
+            table_name: テーブル名
+            query: テーブルの代わりに分割するクエリ
+            params: クエリパラメタ(辞書)
+            **kwargs: partitions、bounds、max_workers、max_in_flightなどのオプション
+
+        Returns:
+            DataFrame
+        """
+        return self._db.read_table_parallel(key_column, table_name=table_name, query=query, params=params, **kwargs)
+
     def write_table(self, dataframe,
                     table_name: str,
                     schema=None,
@@ -215,12 +334,76 @@ class ModelForDatabase(metaclass=ABCMeta):
                              method=method
                              )
 
+    def bulk_load(self, data, table_name: str, columns: list = None, schema: str = None, index: bool = True,
+                  **kwargs):
+        """データベースのネイティブなバルクロードでデータを投入する
+
+        Args:
+            data: DataFrameまたは行のイテレータ
+            table_name: テーブル名
+            columns: カラム名のリスト
+            schema: スキーマ
+            index: DataFrameのインデックスをカラムとして含める
+            **kwargs: 各データベースのバルクロードのオプション
+
+        Returns:
+            投入行数と処理時間
+        """
+        return self._db.bulk_load(data, table_name, columns=columns, schema=schema, index=index, **kwargs)
+
+    def upsert_dataframe(self, data, table_name: str, key_columns: list, columns: list = None, schema: str = None,
+                         index: bool = True, update_columns: list = None, **kwargs):
+        """一時テーブルへのバルクロードを経由して、キーが重複する行は更新しながら投入する
+
+        Args:
+            data: DataFrameまたは行のイテレータ
+            table_name: テーブル名
+            key_columns: 主キー(一意制約)のカラム名のリスト
+            columns: カラム名のリスト
+            schema: スキーマ
+            index: DataFrameのインデックスをカラムとして含める
+            update_columns: キーが重複した場合に更新するカラム名のリスト
+            **kwargs: バルクロードのオプション
+
+        Returns:
+            投入行数と処理時間
+        """
+        return self._db.upsert_dataframe(data, table_name, key_columns, columns=columns, schema=schema, index=index,
+                                         update_columns=update_columns, **kwargs)
+
     def drop_table(self, table_name):
         self._db.drop_table(table_name)
 
     def table_exists(self, table_name):
         return self._db.table_exists(table_name)
 
+    def tables_exist(self, table_names, schema: str = None) -> set:
+        """1回のクエリでテーブルの存在を確認する
+
+        Args:
+            table_names: テーブル名のリスト
+            schema: スキーマ
+
+        Returns:
+            存在するテーブル名の集合
+        """
+        return self._db.tables_exist(table_names, schema)
+
+    def create_tables_from_file(self, file_path: str, table_names, raw_params: dict = None, encoding: str = None):
+        """SQLファイルのクエリで複数のテーブルを1つのトランザクションで作成する
+
+        Args:
+            file_path: SQLファイルの論理名またはSQL_ROOT_PATHからの相対パス
+            table_names: テーブル名のリスト
+            raw_params: table_name以外のformatで設定するパラメタ
+            encoding: エンコーディング
+
+        """
+        self._db.create_tables(self.read_query(file_path, encoding), table_names, raw_params)
+
+    def drop_tables(self, table_names, schema: str = None):
+        self._db.drop_tables(table_names, schema)
+
     def close(self):
         """コネクションをクローズする
 
@@ -1,32 +1,488 @@
-import os
+import datetime
+
+import pandas as pd
 
 from base_project import config
 from base_project.models.base import base
+from base_project.utils.database import result_format
+
+# 銘柄ごとのテーブル
+LAYOUT_PER_TICKER = 'per_ticker'
+# (symbol, date)をキーとする1つのテーブル
+LAYOUT_PARTITIONED = 'partitioned'
+
+LAYOUTS = (LAYOUT_PER_TICKER, LAYOUT_PARTITIONED)
+
+PARTITION_BY_HASH = 'hash'
+PARTITION_BY_RANGE = 'range'
+
+COLUMNS = ['date', 'high', 'low', 'open', 'close', 'volume', 'adj_close']
+
+DTYPES = {'symbol': 'object', 'high': 'float64', 'low': 'float64', 'open': 'float64', 'close': 'float64',
+          'volume': 'int64', 'adj_close': 'float64'}
 
 
 class StockPrice(base.ModelForDatabase):
+    SQL_FILES = ('market/create_table', 'market/select_latest_date', 'market/create_partitioned_table',
+                 'market/create_partition', 'market/select_latest_date_by_symbol', 'market/select_existing_symbols',
+                 'market/select_prices', 'market/select_range', 'market/select_latest', 'market/select_range_many',
+                 'market/select_latest_many', 'market/select_latest_dates', 'market/create_detached_partition',
+                 'market/move_default_partition_rows', 'market/attach_partition')
 
-    def __init__(self, table_name):
-        self._table_name = table_name
+    # partitionedの場合のテーブル名
+    PARTITIONED_TABLE_NAME = 'stock_price'
+    # rangeの場合に年ごとのパーティションを作成する期間(これより前の日付はDEFAULTパーティションに格納する)
+    RANGE_PARTITION_YEARS = 10
+    # latest_dates、select_*_manyの1回のクエリで対象とする銘柄数(SQLiteのUNION ALLの上限(500)以下)
+    LATEST_DATES_CHUNK_SIZE = 500
+
+    def __init__(self, table_name, layout: str = None):
+        """コンストラクタ
+
+        Args:
+            table_name: 銘柄(per_tickerの場合はテーブル名)
+            layout: per_ticker または partitioned(デフォルト: MARKET_STORAGE_LAYOUT)
+
+        Raises:
+            ValueError: 存在しない格納方式の場合
+        """
         self._config = config.Config.get_instance()
+        self._layout = layout or self._config.MARKET_STORAGE_LAYOUT
+        if self._layout not in LAYOUTS:
+            raise ValueError('{} of storage layout not exists'.format(self._layout))
+
+        self._symbol = table_name
+        self._table_name = self.PARTITIONED_TABLE_NAME if self.partitioned else table_name
         super(StockPrice, self).__init__(**self._config.MARKET_DB)
 
+    @property
+    def partitioned(self) -> bool:
+        return self._layout == LAYOUT_PARTITIONED
+
+    @classmethod
+    def existing_symbols(cls, symbols, layout: str = None) -> set:
+        """1回のクエリでデータが存在する銘柄を取得する
+
+        Args:
+            symbols: 銘柄のリスト
+            layout: per_ticker または partitioned
+
+        Returns:
+            per_tickerの場合はテーブルが存在する銘柄、partitionedの場合は行が存在する銘柄の集合
+        """
+        symbols = list(symbols)
+        if not symbols:
+            return set()
+
+        stock_price_obj = cls(symbols[0], layout)
+        if not stock_price_obj.partitioned:
+            return stock_price_obj.tables_exist(symbols)
+
+        if not stock_price_obj.tables_exist([cls.PARTITIONED_TABLE_NAME]):
+            return set()
+        rows = stock_price_obj.select_all_from_file('market/select_existing_symbols', {'symbols': tuple(symbols)},
+                                                    raw_params={'table_name': cls.PARTITIONED_TABLE_NAME})
+        return {row[0] for row in rows}
+
+    @classmethod
+    def latest_dates(cls, symbols, layout: str = None) -> dict:
+        """データが存在する銘柄の最新の日付をまとめて取得する
+
+        テーブルの有無を1回のクエリで確認した後、partitionedの場合はGROUP BY、per_tickerの場合は
+        銘柄ごとのmax(date)のUNION ALLで、LATEST_DATES_CHUNK_SIZE銘柄ずつ1回のクエリで取得する
+
+        Args:
+            symbols: 銘柄のリスト
+            layout: per_ticker または partitioned
+
+        Returns:
+            {銘柄: datetime.date}。データが存在しない銘柄は含まない
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return {}
+
+        stock_price_obj = cls(symbols[0], layout)
+        if stock_price_obj.partitioned:
+            if not stock_price_obj.tables_exist([cls.PARTITIONED_TABLE_NAME]):
+                return {}
+        else:
+            existing_symbols = stock_price_obj.tables_exist(symbols)
+            symbols = [symbol for symbol in symbols if symbol in existing_symbols]
+
+        latest_dates = {}
+        for i in range(0, len(symbols), cls.LATEST_DATES_CHUNK_SIZE):
+            chunk = symbols[i:i + cls.LATEST_DATES_CHUNK_SIZE]
+            params, raw_params = stock_price_obj._many_params(chunk, [])
+            params['symbols'] = tuple(chunk)
+
+            rows = stock_price_obj.select_all_from_file('market/select_latest_dates', params, raw_params)
+            for symbol, latest_date in rows:
+                if latest_date is not None:
+                    latest_dates[symbol] = pd.Timestamp(latest_date).date()
+        return latest_dates
+
+    def create_partitioned_table(self):
+        """partitionedの場合のテーブルとパーティションを作成する
+
+        PostgreSQLではMARKET_PARTITION_BYに従い、銘柄のハッシュまたは日付の年ごとにパーティションを作成する。
+        rangeでテーブルが作成済みの場合は、不足している年のパーティションを追加する。
+        その他のデータベースではパーティションのない1つのテーブルを作成する(作成済みの場合は何もしない)
+
+        """
+        partition_by = self._config.MARKET_PARTITION_BY if self._config.MARKET_DB['rdbms'].lower() == 'postgresql' \
+            else None
+        raw_params = {'table_name': self.PARTITIONED_TABLE_NAME, 'partition_by': partition_by}
+        this_year = datetime.date.today().year
+        years = list(range(this_year - self.RANGE_PARTITION_YEARS, this_year + 2))
+
+        if self.tables_exist([self.PARTITIONED_TABLE_NAME]):
+            if partition_by == PARTITION_BY_RANGE:
+                self._add_year_partitions(raw_params, years)
+            return
+
+        with self.transaction():
+            self.execute_from_file('market/create_partitioned_table', raw_params=raw_params)
+
+            if partition_by == PARTITION_BY_HASH:
+                modulus = self._config.MARKET_PARTITION_COUNT
+                for remainder in range(modulus):
+                    self.execute_from_file('market/create_partition',
+                                           raw_params=dict(raw_params, modulus=modulus, remainder=remainder))
+            elif partition_by == PARTITION_BY_RANGE:
+                for year in years + [None]:
+                    self.execute_from_file('market/create_partition', raw_params=dict(raw_params, year=year))
+
+    def _add_year_partitions(self, raw_params: dict, years: list):
+        """作成済みのrangeのテーブルに不足している年のパーティションを追加する
+
+        DEFAULTパーティションに該当する年の行がある場合はパーティションを追加できないため、
+        パーティションにするテーブルを作成して行を移動した後にアタッチする
+
+        Args:
+            raw_params: テンプレートのパラメータ
+            years: パーティションを作成する年のリスト
+
+        """
+        partition_names = {year: '{}_{}'.format(self.PARTITIONED_TABLE_NAME, year) for year in years}
+        existing_partitions = self.tables_exist(list(partition_names.values()))
+        missing_years = [year for year in years if partition_names[year] not in existing_partitions]
+        if not missing_years:
+            return
+
+        with self.transaction():
+            for year in missing_years:
+                year_params = dict(raw_params, year=year)
+                self.execute_from_file('market/create_detached_partition', raw_params=year_params)
+                self.execute_from_file('market/move_default_partition_rows', raw_params=year_params)
+                self.execute_from_file('market/attach_partition', raw_params=year_params)
+
     def create_table(self):
-        sql_file_path = os.path.join('market', 'create_table.sql')
-        self.execute_from_file(sql_file_path, raw_params={'table_name': self._table_name})
+        if self.partitioned:
+            self.create_partitioned_table()
+        else:
+            self.execute_from_file('market/create_table', raw_params={'table_name': self._table_name})
 
-    def insert_market_data_df(self, market_data_df):
+    @staticmethod
+    def to_table_columns(market_data_df, symbol: str = None):
+        """データソースの株価のDataFrameをテーブルのカラム名、型に変換する
+
+        Args:
+            market_data_df: 株価のDataFrame
+            symbol: 銘柄のカラムとして追加する銘柄(partitionedの場合)
+
+        Returns:
+            変換したDataFrame
+        """
+        if isinstance(market_data_df.index, pd.DatetimeIndex):
+            # date型のカラムには日付のみを投入する(SQLite、DuckDBでは日時の文字列のまま格納されるため)
+            market_data_df.index = market_data_df.index.date
         market_data_df.index.name = 'date'
-        market_data_df.columns = ['high', 'low', 'open', 'close', 'volume', 'adj_close']
-        self.write_table(market_data_df, self._table_name, if_exists='append')
+        market_data_df.columns = COLUMNS[1:]
+        market_data_df = market_data_df.astype({column: DTYPES[column] for column in COLUMNS[1:]})
+        if symbol is not None:
+            market_data_df.insert(0, 'symbol', symbol)
+        return market_data_df
+
+    def _to_table_columns(self, market_data_df):
+        return self.to_table_columns(market_data_df, self._symbol if self.partitioned else None)
+
+    @property
+    def _key_columns(self) -> list:
+        return ['symbol', 'date'] if self.partitioned else ['date']
+
+    def insert_market_data_df(self, market_data_df):
+        return self.insert_table_df(self._to_table_columns(market_data_df))
+
+    def insert_table_df(self, table_df):
+        """to_table_columnsで変換済みの株価を投入する
+
+        Args:
+            table_df: テーブルのカラムのDataFrame
+
+        Returns:
+            投入行数と処理時間
+        """
+        return self.bulk_load(table_df, self._table_name)
+
+    def upsert_market_data_df(self, market_data_df):
+        """株価を投入し、既に存在する日付の行は更新する
+
+        Args:
+            market_data_df: 株価のDataFrame
+
+        Returns:
+            投入行数と処理時間
+        """
+        return self.upsert_table_df(self._to_table_columns(market_data_df))
+
+    def upsert_table_df(self, table_df):
+        """to_table_columnsで変換済みの株価を投入し、既に存在する日付の行は更新する
+
+        Args:
+            table_df: テーブルのカラムのDataFrame
+
+        Returns:
+            投入行数と処理時間
+        """
+        return self.upsert_dataframe(table_df, self._table_name, key_columns=self._key_columns)
+
+    def upsert_rows(self, rows, chunk_size: int = None):
+        """(date, high, low, open, close, volume, adj_close)の行のイテレータを投入し、既存の行は更新する
+
+        Args:
+            rows: 行のイテレータ
+            chunk_size: バルクロードの1チャンクの行数
+
+        Returns:
+            投入行数と処理時間
+        """
+        columns = COLUMNS
+        if self.partitioned:
+            columns = ['symbol'] + COLUMNS
+            rows = ((self._symbol,) + tuple(row) for row in rows)
+
+        kwargs = {'chunk_size': chunk_size} if chunk_size else {}
+        return self.upsert_dataframe(rows, self._table_name, key_columns=self._key_columns, columns=columns,
+                                     **kwargs)
+
+    def iter_price_batches(self, batch_size: int):
+        """銘柄ごとのテーブルの行を日付順にbatch_size件ずつのリストで逐次取得する
+
+        Args:
+            batch_size: 1回に取得する行数
+
+        Returns:
+            (date, high, low, open, close, volume, adj_close)のリストのジェネレータ
+        """
+        return self.select_iter_from_file('market/select_prices', raw_params={'table_name': self._symbol},
+                                          itersize=batch_size, as_batches=True)
 
     def select_latest_date(self):
-        sql_file_path = os.path.join('market', 'select_latest_date.sql')
-        latest_date = self.select_one_from_file(sql_file_path, raw_params={'table_name': self._table_name})[0]
+        if self.partitioned:
+            return self.select_one_from_file('market/select_latest_date_by_symbol', {'symbol': self._symbol},
+                                             raw_params={'table_name': self._table_name})[0]
+
+        latest_date = self.select_one_from_file('market/select_latest_date',
+                                                raw_params={'table_name': self._table_name})[0]
         return latest_date
 
+    @staticmethod
+    def _select_columns(columns) -> list:
+        """取得するカラムを検証し、dateを先頭にしたリストを返却する
+
+        Args:
+            columns: カラム名のリスト(Noneの場合はすべて)
+
+        Returns:
+            カラム名のリスト
+
+        Raises:
+            ValueError: 存在しないカラムの場合
+        """
+        if columns is None:
+            return list(COLUMNS)
+
+        unknown_columns = [column for column in columns if column not in COLUMNS]
+        if unknown_columns:
+            raise ValueError('{} of columns not exists'.format(', '.join(map(str, unknown_columns))))
+        return ['date'] + [column for column in dict.fromkeys(columns) if column != 'date']
+
+    @staticmethod
+    def _to_frame(result: dict, columns: list, index_columns: list, as_arrays: bool):
+        """select_*のcolumns形式の結果を型を揃えたDataFrameまたは配列に変換する
+
+        Args:
+            result: {カラム名: 値のリスト}
+            columns: カラム名のリスト
+            index_columns: インデックスにするカラム名のリスト
+            as_arrays: DataFrameではなく{カラム名: numpy.ndarray}で返却する
+
+        Returns:
+            DataFrameまたは{カラム名: numpy.ndarray}
+        """
+        dataframe = pd.DataFrame({column: result.get(column, []) for column in index_columns[:-1] + columns})
+        dataframe['date'] = pd.to_datetime(dataframe['date'])
+        dataframe = dataframe.astype({column: DTYPES[column] for column in dataframe.columns if column in DTYPES})
+
+        if as_arrays:
+            return {column: dataframe[column].to_numpy() for column in dataframe.columns}
+        return dataframe.set_index(index_columns)
+
+    def _query_params(self, start=None, end=None) -> tuple:
+        params = {'start': start, 'end': end}
+        raw_params = {'table_name': self._table_name, 'partitioned': self.partitioned,
+                      'with_start': start is not None, 'with_end': end is not None}
+        if self.partitioned:
+            params['symbol'] = self._symbol
+        return params, raw_params
+
+    def select_range(self, start=None, end=None, columns: list = None, as_arrays: bool = False):
+        """期間内の株価を日付順に取得する
+
+        期間の条件はSQLで指定するため、主キー(date、partitionedの場合は(symbol, date))の範囲スキャンになる
+
+        Args:
+            start: 開始日(この日を含む。Noneの場合は最初から)
+            end: 終了日(この日を含む。Noneの場合は最後まで)
+            columns: 取得するカラム名のリスト(デフォルト: すべて)
+            as_arrays: DataFrameではなく{カラム名: numpy.ndarray}で返却する
+
+        Returns:
+            dateをインデックスとするDataFrameまたは{カラム名: numpy.ndarray}
+        """
+        columns = self._select_columns(columns)
+        params, raw_params = self._query_params(start, end)
+        raw_params['columns'] = ', '.join(columns)
+
+        result = self.select_all_from_file('market/select_range', params, raw_params,
+                                           row_format=result_format.COLUMNS)
+        return self._to_frame(result, columns, ['date'], as_arrays)
+
+    def select_latest(self, n: int = 1, columns: list = None, as_arrays: bool = False):
+        """直近n日分の株価を日付順に取得する
+
+        主キーを降順にn件だけ読み込む
+
+        Args:
+            n: 取得する日数
+            columns: 取得するカラム名のリスト(デフォルト: すべて)
+            as_arrays: DataFrameではなく{カラム名: numpy.ndarray}で返却する
+
+        Returns:
+            dateをインデックスとするDataFrameまたは{カラム名: numpy.ndarray}
+        """
+        columns = self._select_columns(columns)
+        params, raw_params = self._query_params()
+        params['n'] = int(n)
+        raw_params['columns'] = ', '.join(columns)
+
+        result = self.select_all_from_file('market/select_latest', params, raw_params,
+                                           row_format=result_format.COLUMNS)
+        result = {column: values[::-1] for column, values in result.items()}
+        return self._to_frame(result, columns, ['date'], as_arrays)
+
+    def _many_params(self, symbols: list, columns: list) -> tuple:
+        params = {'symbol_{}'.format(i): symbol for i, symbol in enumerate(symbols)}
+        raw_params = {'columns': ', '.join(columns), 'partitioned': self.partitioned, 'table_name': self._table_name,
+                      'table_names': [self._table_name] * len(symbols) if self.partitioned else symbols}
+        return params, raw_params
+
+    @classmethod
+    def _select_many(cls, sql_file: str, symbols: list, columns: list, layout: str, params: dict,
+                     raw_params: dict) -> dict:
+        """複数銘柄のクエリをLATEST_DATES_CHUNK_SIZE銘柄ずつ実行し、結果を(symbol, date)の順に連結する
+
+        Args:
+            sql_file: SQLファイル
+            symbols: 銘柄のリスト
+            columns: カラム名のリスト
+            layout: per_ticker または partitioned
+            params: 銘柄以外のクエリのパラメータ
+            raw_params: 銘柄以外のテンプレートのパラメータ
+
+        Returns:
+            {カラム名: 値のリスト}
+        """
+        stock_price_obj = cls(symbols[0], layout)
+        result = {}
+        for i in range(0, len(symbols), cls.LATEST_DATES_CHUNK_SIZE):
+            chunk = symbols[i:i + cls.LATEST_DATES_CHUNK_SIZE]
+            chunk_params, chunk_raw_params = stock_price_obj._many_params(chunk, columns)
+            chunk_params.update(params, symbols=tuple(chunk))
+            chunk_raw_params.update(raw_params)
+
+            chunk_result = stock_price_obj.select_all_from_file(sql_file, chunk_params, chunk_raw_params,
+                                                                row_format=result_format.COLUMNS)
+            for column, values in chunk_result.items():
+                result.setdefault(column, []).extend(values)
+
+        if len(symbols) > cls.LATEST_DATES_CHUNK_SIZE and result:
+            order = sorted(range(len(result['symbol'])), key=lambda j: (result['symbol'][j], result['date'][j]))
+            result = {column: [values[j] for j in order] for column, values in result.items()}
+        return result
+
+    @classmethod
+    def select_range_many(cls, symbols, start=None, end=None, columns: list = None, layout: str = None,
+                          as_arrays: bool = False):
+        """複数銘柄の期間内の株価をLATEST_DATES_CHUNK_SIZE銘柄ずつ1回のクエリで取得する
+
+        partitionedの場合はsymbol IN (...)と期間で主キーを範囲スキャンし、
+        per_tickerの場合は銘柄ごとのテーブルの範囲スキャンをUNION ALLで連結する
+
+        Args:
+            symbols: 銘柄のリスト
+            start: 開始日(この日を含む)
+            end: 終了日(この日を含む)
+            columns: 取得するカラム名のリスト(デフォルト: すべて)
+            layout: per_ticker または partitioned
+            as_arrays: DataFrameではなく{カラム名: numpy.ndarray}で返却する
+
+        Returns:
+            (symbol, date)をインデックスとするDataFrameまたは{カラム名: numpy.ndarray}
+        """
+        symbols = list(dict.fromkeys(symbols))
+        columns = cls._select_columns(columns)
+        if not symbols:
+            return cls._to_frame({}, columns, ['symbol', 'date'], as_arrays)
+
+        result = cls._select_many('market/select_range_many', symbols, columns, layout, {'start': start, 'end': end},
+                                  {'with_start': start is not None, 'with_end': end is not None})
+        return cls._to_frame(result, columns, ['symbol', 'date'], as_arrays)
+
+    @classmethod
+    def select_latest_many(cls, symbols, n: int = 1, columns: list = None, layout: str = None,
+                           as_arrays: bool = False):
+        """複数銘柄の直近n日分の株価をLATEST_DATES_CHUNK_SIZE銘柄ずつ1回のクエリで取得する
+
+        銘柄ごとに主キーを降順にn件読み込む副問い合わせをUNION ALLで連結する
+
+        Args:
+            symbols: 銘柄のリスト
+            n: 取得する日数
+            columns: 取得するカラム名のリスト(デフォルト: すべて)
+            layout: per_ticker または partitioned
+            as_arrays: DataFrameではなく{カラム名: numpy.ndarray}で返却する
+
+        Returns:
+            (symbol, date)をインデックスとするDataFrameまたは{カラム名: numpy.ndarray}
+        """
+        symbols = list(dict.fromkeys(symbols))
+        columns = cls._select_columns(columns)
+        if not symbols:
+            return cls._to_frame({}, columns, ['symbol', 'date'], as_arrays)
+
+        result = cls._select_many('market/select_latest_many', symbols, columns, layout, {'n': int(n)}, {})
+        return cls._to_frame(result, columns, ['symbol', 'date'], as_arrays)
+
     def drop_table(self, **kwargs):
-        super().drop_table(self._table_name)
+        if self.partitioned:
+            self.execute('DELETE FROM {} WHERE symbol = %(symbol)s'.format(self._table_name),
+                         {'symbol': self._symbol})
+        else:
+            super().drop_table(self._table_name)
 
     def table_exists(self, **kwargs):
+        if self.partitioned:
+            return self._symbol in self.existing_symbols([self._symbol], self._layout)
         return super().table_exists(self._table_name)
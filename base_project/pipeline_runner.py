@@ -7,6 +7,7 @@ from concurrent import futures
 from importlib import import_module
 import contextlib
 from base_project import config, log
+from base_project.main.base import base
 from base_project.utils import time_util
 from base_project.utils.database import connection_pool
 
@@ -74,7 +75,10 @@ class PipelineRunner(object):
                 if type(process_def) is list:
                     future_list = []
                     multiprocess_num = min(int(process.get('multiprocessNum')), len(process_def))
-                    with futures.ProcessPoolExecutor(multiprocess_num) as executor:
+                    with futures.ProcessPoolExecutor(
+                            multiprocess_num,
+                            initializer=connection_pool.ConnectionPoolManager.initialize_worker,
+                            initargs=(multiprocess_num,)) as executor:
                         for p in process_def:
                             p_def = p.get('process')
                             future = executor.submit(self._run_process, process_def=p_def)
@@ -100,7 +104,7 @@ class PipelineRunner(object):
         # 処理を実行
         try:
             logger.info('start main_process')
-            processor.run()
+            base.run_logic(processor)
             logger.info('end main_process')
         except Exception as e:
             logger.exception(e)
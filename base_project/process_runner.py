@@ -6,6 +6,7 @@ import logging
 from importlib import import_module
 
 from base_project import config, log
+from base_project.main.base import base
 from base_project.utils import time_util
 from base_project.utils.database import connection_pool
 
@@ -54,7 +55,7 @@ class ProcessRunner(object):
         # 処理を実行
         try:
             logger.info('start main_process')
-            processor.run()
+            base.run_logic(processor)
             logger.info('end main_process')
         except Exception as e:
             logger.exception(e)
@@ -0,0 +1,162 @@
+"""
+SQL_ROOT_PATH配下のSQLファイルを論理名(例: market/select_latest_date)で管理する
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from base_project import config
+from base_project.utils.database import database_accessor
+
+logger = logging.getLogger(__name__)
+
+SQL_FILE_EXTENSION = '.sql'
+
+
+@dataclass
+class SqlFile:
+    """
+    読み込み済みのSQLファイル
+    """
+    name: str
+    path: str
+    query: str
+    mtime: float
+    checked_at: float
+
+
+class SqlFileReader(object):
+    """
+    SQLファイルを起動時に一括で読み込み、更新日時が変わった場合のみ再読み込みするクラス
+    """
+
+    _instance_lock = threading.Lock()
+
+    def __init__(self, root_dir: str = None, encoding: str = 'utf-8', check_interval: float = 1.0):
+        """コンストラクタ
+
+        Args:
+            root_dir: SQLファイルのルートディレクトリ(デフォルト: SQL_ROOT_PATH)
+            encoding: エンコーディング
+            check_interval: ファイルの更新日時を確認する間隔(秒)
+        """
+        self._root_dir = root_dir or config.Config.get_instance().SQL_ROOT_PATH
+        self._encoding = encoding
+        self._check_interval = check_interval
+        self._sql_files = {}
+        self._lock = threading.Lock()
+
+        self.scan()
+
+    @classmethod
+    def get_instance(cls):
+        """SQL_ROOT_PATHを対象とした共有のインスタンスを取得する
+
+        Returns:
+            SqlFileReader
+        """
+        with cls._instance_lock:
+            if not hasattr(cls, '_instance'):
+                cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def to_name(file_path: str) -> str:
+        """ファイルパスを論理名に変換する
+
+        Args:
+            file_path: SQL_ROOT_PATHからの相対パスまたは論理名
+
+        Returns:
+            論理名
+        """
+        name = file_path.replace(os.path.sep, '/')
+        if name.endswith(SQL_FILE_EXTENSION):
+            name = name[:-len(SQL_FILE_EXTENSION)]
+        return name
+
+    def _to_path(self, name: str) -> str:
+        return os.path.join(self._root_dir, *name.split('/')) + SQL_FILE_EXTENSION
+
+    def _load(self, name: str, path: str, encoding: str = None) -> SqlFile:
+        mtime = os.path.getmtime(path)
+        with open(path, mode='r', encoding=encoding or self._encoding) as fin:
+            query = fin.read()
+
+        database_accessor.DatabaseAccessor.compile_query(query)
+
+        sql_file = SqlFile(name=name, path=path, query=query, mtime=mtime, checked_at=time.monotonic())
+        self._sql_files[name] = sql_file
+        logger.debug('loaded sql file: {}'.format(name))
+        return sql_file
+
+    def scan(self):
+        """ルートディレクトリ配下のSQLファイルをすべて読み込む
+        """
+        with self._lock:
+            self._sql_files.clear()
+            for dir_path, _, file_names in os.walk(self._root_dir):
+                for file_name in sorted(file_names):
+                    if not file_name.endswith(SQL_FILE_EXTENSION):
+                        continue
+                    path = os.path.join(dir_path, file_name)
+                    self._load(self.to_name(os.path.relpath(path, self._root_dir)), path)
+
+        logger.debug('scanned {} sql files: {}'.format(len(self._sql_files), self._root_dir))
+
+    def read(self, file_path: str, encoding: str = None) -> str:
+        """論理名またはSQL_ROOT_PATHからの相対パスでクエリを取得する
+
+        Args:
+            file_path: 論理名またはSQL_ROOT_PATHからの相対パス
+            encoding: 再読み込み時のエンコーディング
+
+        Returns:
+            クエリ
+
+        Raises:
+            FileNotFoundError: SQLファイルが存在しない場合
+        """
+        name = self.to_name(file_path)
+
+        with self._lock:
+            sql_file = self._sql_files.get(name)
+
+            if sql_file is None:
+                path = self._to_path(name)
+                if not os.path.isfile(path):
+                    raise FileNotFoundError('sql file: {} does not exist'.format(name))
+                return self._load(name, path, encoding).query
+
+            now = time.monotonic()
+            if now - sql_file.checked_at >= self._check_interval:
+                try:
+                    mtime = os.path.getmtime(sql_file.path)
+                except FileNotFoundError:
+                    self._sql_files.pop(name)
+                    raise FileNotFoundError('sql file: {} does not exist'.format(name))
+
+                if mtime != sql_file.mtime:
+                    sql_file = self._load(name, sql_file.path, encoding)
+                else:
+                    sql_file.checked_at = now
+
+            return sql_file.query
+
+    def validate(self, names):
+        """SQLファイルがすべて存在することを確認する
+
+        Args:
+            names: 論理名のリスト
+
+        Raises:
+            FileNotFoundError: 存在しないSQLファイルがある場合
+        """
+        missing_names = [name for name in names if self.to_name(name) not in self._sql_files]
+        if missing_names:
+            raise FileNotFoundError('sql files: {} do not exist'.format(', '.join(missing_names)))
+
+    def names(self) -> list:
+        return sorted(self._sql_files)
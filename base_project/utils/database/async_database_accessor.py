@@ -0,0 +1,340 @@
+import logging
+import os
+import tempfile
+import time
+from abc import ABCMeta, abstractmethod
+from typing import Iterable, Union
+
+import pandas as pd
+
+from base_project.utils.database import bulk_loader, connection_pool, cursor, database_accessor, query_tracer
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabaseAccessor(metaclass=ABCMeta):
+    """
+    asyncioでデータベースアクセスを行う基底のクラス
+    """
+
+    _dict_cursor = None
+
+    DEFAULT_PAGE_SIZE = database_accessor.DatabaseAccessor.DEFAULT_PAGE_SIZE
+
+    def __init__(self, async_connection_pool):
+        """コンストラクタ
+
+        Args:
+            async_connection_pool: asyncio用のコネクションプール
+
+        """
+        self._connection_pool = async_connection_pool
+
+    @staticmethod
+    def render_query(query: str, raw_params: dict = None) -> str:
+        return database_accessor.DatabaseAccessor.render_query(query, raw_params)
+
+    async def _execute(self, cur, query, params=None, raw_params=None):
+        query = self.render_query(query, raw_params)
+
+        start_time = time.perf_counter()
+        await cur.execute(query, params)
+        query_tracer.get_tracer().record(query, (time.perf_counter() - start_time) * 1000, cur.rowcount)
+        return cur
+
+    async def execute(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None):
+        """クエリを実行する
+
+        Args:
+            query: クエリ
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+
+        """
+        async with cursor.AsyncCursorFromConnectionFromPool(self._connection_pool) as cur:
+            await self._execute(cur, query, params, raw_params)
+
+    async def execute_from_file(self, file_path: str, params: Union[dict, list, tuple] = None,
+                                raw_params: dict = None, encoding: str = None):
+        """ファイルからクエリを読み込み、executeを実行する
+
+        Args:
+            file_path: ファイルのパス
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+            encoding: エンコーディング
+
+        """
+        query = database_accessor.DatabaseAccessor.read_query_from_file(file_path, encoding)
+        await self.execute(query, params, raw_params)
+
+    async def executemany(self, query: str, params: Union[list, tuple] = None, raw_params: dict = None,
+                          page_size: int = DEFAULT_PAGE_SIZE) -> int:
+        """タプル、リストからデータのINSERTをpage_size件ずつまとめて行う
+
+        Args:
+            query: クエリ
+            params: インサートのデータ
+            raw_params: formatで設定するパラメタ
+            page_size: 1回のラウンドトリップで送る件数
+
+        Returns:
+            影響を受けた行数
+        """
+        query = self.render_query(query, raw_params)
+
+        rowcount = 0
+        start_time = time.perf_counter()
+        async with cursor.AsyncCursorFromConnectionFromPool(self._connection_pool) as cur:
+            for page in bulk_loader.iter_chunks(params, page_size):
+                await cur.executemany(query, page)
+                rowcount += max(cur.rowcount, 0)
+        query_tracer.get_tracer().record(query, (time.perf_counter() - start_time) * 1000, rowcount)
+
+        logger.info('SQL(executemany): {} rows affected'.format(rowcount))
+        return rowcount
+
+    async def select_all(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
+                         to_dict: bool = False) -> list:
+        """SELECT文を実行し、結果をすべて取得する
+
+        Args:
+            query: クエリ
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+            to_dict: 結果を辞書で返却する
+
+        Returns:
+            クエリの実行結果
+        """
+        dict_cursor = self._dict_cursor if to_dict else None
+
+        async with cursor.AsyncCursorFromConnectionFromPool(self._connection_pool, dict_cursor) as cur:
+            await self._execute(cur, query, params, raw_params)
+            return await cur.fetchall()
+
+    async def select_many(self, query: str, fetch_size: int, params: Union[dict, list, tuple] = None,
+                          raw_params: dict = None, to_dict: bool = False) -> list:
+        """SELECT文を実行し、結果をfetch_size件取得する
+
+        Args:
+            query: クエリ
+            fetch_size: 取得行の数
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+            to_dict: 結果を辞書で返却する
+
+        Returns:
+            クエリの実行結果
+        """
+        dict_cursor = self._dict_cursor if to_dict else None
+
+        async with cursor.AsyncCursorFromConnectionFromPool(self._connection_pool, dict_cursor) as cur:
+            await self._execute(cur, query, params, raw_params)
+            return await cur.fetchmany(fetch_size)
+
+    async def select_one(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
+                         to_dict: bool = False) -> Union[tuple, dict]:
+        """SELECT文を実行し、結果の先頭を取得する
+
+        Args:
+            query: クエリ
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+            to_dict: 結果を辞書で返却する
+
+        Returns:
+            クエリの実行結果
+        """
+        dict_cursor = self._dict_cursor if to_dict else None
+
+        async with cursor.AsyncCursorFromConnectionFromPool(self._connection_pool, dict_cursor) as cur:
+            await self._execute(cur, query, params, raw_params)
+            return await cur.fetchone()
+
+    async def select_all_from_file(self, file_path: str, params: Union[dict, list, tuple] = None,
+                                   raw_params: dict = None, to_dict: bool = False, encoding: str = None) -> list:
+        query = database_accessor.DatabaseAccessor.read_query_from_file(file_path, encoding)
+        return await self.select_all(query, params, raw_params, to_dict)
+
+    async def select_one_from_file(self, file_path: str, params: Union[dict, list, tuple] = None,
+                                   raw_params: dict = None, to_dict: bool = False,
+                                   encoding: str = None) -> Union[tuple, dict]:
+        query = database_accessor.DatabaseAccessor.read_query_from_file(file_path, encoding)
+        return await self.select_one(query, params, raw_params, to_dict)
+
+    @abstractmethod
+    async def bulk_load(self, data: Union[pd.DataFrame, Iterable], table_name: str, columns: list = None,
+                        schema: str = None, index: bool = True,
+                        chunk_size: int = bulk_loader.DEFAULT_CHUNK_SIZE) -> bulk_loader.BulkLoadResult:
+        pass
+
+    @abstractmethod
+    async def table_exists(self, table_name) -> bool:
+        pass
+
+    async def drop_table(self, table_names):
+
+        if type(table_names) is str:
+            table_names = [table_names]
+
+        for table_name in table_names:
+            await self.execute(self._drop_table_query, raw_params={'table_name': table_name})
+
+    async def close(self):
+        """コネクションをクローズする
+
+        """
+        await connection_pool.ConnectionPoolManager.close_async_connection_pool(self._connection_pool)
+
+
+class AsyncPostgreSQLAccessor(AsyncDatabaseAccessor):
+    """
+    psycopg(v3)でPostgreSQLのアクセスを行うクラス
+    """
+
+    _drop_table_query = 'DROP TABLE IF EXISTS "{{ table_name }}"'
+
+    def __init__(self, async_connection_pool):
+
+        super().__init__(async_connection_pool)
+
+        from psycopg.rows import dict_row
+        self._dict_cursor = {'row_factory': dict_row}
+
+    async def bulk_load(self, data: Union[pd.DataFrame, Iterable], table_name: str, columns: list = None,
+                        schema: str = None, index: bool = True, chunk_size: int = bulk_loader.DEFAULT_CHUNK_SIZE,
+                        copy_format: str = 'text') -> bulk_loader.BulkLoadResult:
+        """COPY ... FROM STDINでデータを投入する
+
+        Args:
+            data: DataFrameまたは行のイテレータ
+            table_name: テーブル名
+            columns: カラム名のリスト
+            schema: スキーマ
+            index: DataFrameのインデックスをカラムとして含める
+            chunk_size: 1チャンクの行数
+            copy_format: COPYの形式(text または binary)
+
+        Returns:
+            投入行数と処理時間
+        """
+        from psycopg import sql
+
+        start_time = time.perf_counter()
+
+        columns, rows = database_accessor.DatabaseAccessor._to_bulk_rows(data, columns, index)
+        row_counter = bulk_loader.RowCounter(rows)
+
+        if copy_format == 'text':
+            chunks = bulk_loader.encode_text_rows(row_counter, chunk_size)
+        elif copy_format == 'binary':
+            chunks = bulk_loader.encode_binary_rows(row_counter, chunk_size)
+        else:
+            raise ValueError('{} of copy format not exists'.format(copy_format))
+
+        if schema:
+            table = sql.Identifier(schema, table_name)
+        else:
+            table = sql.Identifier(table_name)
+
+        if columns:
+            column_list = sql.SQL('({})').format(sql.SQL(', ').join(map(sql.Identifier, columns)))
+        else:
+            column_list = sql.SQL('')
+
+        query = sql.SQL('COPY {} {} FROM STDIN WITH (FORMAT {})').format(table, column_list, sql.SQL(copy_format))
+
+        async with cursor.AsyncCursorFromConnectionFromPool(self._connection_pool) as cur:
+            async with cur.copy(query) as copy:
+                for chunk in chunks:
+                    await copy.write(chunk)
+
+        result = bulk_loader.BulkLoadResult(table_name=table_name,
+                                            row_count=row_counter.count,
+                                            elapsed_seconds=time.perf_counter() - start_time)
+        logger.info('bulk load {}: {} rows ({:.3f}s)'.format(table_name, result.row_count, result.elapsed_seconds))
+        return result
+
+    async def table_exists(self, table_name) -> bool:
+        row = await self.select_one('SELECT * FROM information_schema.tables WHERE table_name = %(table_name)s',
+                                    params={'table_name': table_name})
+        return row is not None
+
+
+class AsyncMySQLAccessor(AsyncDatabaseAccessor):
+    """
+    aiomysqlでMySQLのアクセスを行うクラス
+    """
+
+    _drop_table_query = 'DROP TABLE IF EXISTS `{{ table_name }}`'
+
+    def __init__(self, async_connection_pool):
+
+        super().__init__(async_connection_pool)
+
+        import aiomysql
+        self._dict_cursor = {'cursor': aiomysql.DictCursor}
+
+    async def bulk_load(self, data: Union[pd.DataFrame, Iterable], table_name: str, columns: list = None,
+                        schema: str = None, index: bool = True,
+                        chunk_size: int = bulk_loader.DEFAULT_CHUNK_SIZE) -> bulk_loader.BulkLoadResult:
+        """LOAD DATA LOCAL INFILEでデータを投入する
+
+        Args:
+            data: DataFrameまたは行のイテレータ
+            table_name: テーブル名
+            columns: カラム名のリスト
+            schema: スキーマ
+            index: DataFrameのインデックスをカラムとして含める
+            chunk_size: 1チャンクの行数
+
+        Returns:
+            投入行数と処理時間
+        """
+        start_time = time.perf_counter()
+
+        columns, rows = database_accessor.DatabaseAccessor._to_bulk_rows(data, columns, index)
+        row_counter = bulk_loader.RowCounter(rows)
+        query = database_accessor.MySQLAccessor.load_data_query(table_name, columns, schema)
+
+        async with cursor.AsyncCursorFromConnectionFromPool(self._connection_pool) as cur:
+            for chunk in bulk_loader.encode_text_rows(row_counter, chunk_size):
+                with tempfile.NamedTemporaryFile(mode='wb', suffix='.tsv', delete=False) as fout:
+                    fout.write(chunk)
+                try:
+                    await cur.execute(query, (fout.name,))
+                finally:
+                    os.remove(fout.name)
+
+        result = bulk_loader.BulkLoadResult(table_name=table_name,
+                                            row_count=row_counter.count,
+                                            elapsed_seconds=time.perf_counter() - start_time)
+        logger.info('bulk load {}: {} rows ({:.3f}s)'.format(table_name, result.row_count, result.elapsed_seconds))
+        return result
+
+    async def table_exists(self, table_name) -> bool:
+        row = await self.select_one('SELECT TABLE_NAME FROM information_schema.tables WHERE table_name= %(table_name)s',
+                                    params={'table_name': table_name})
+        return row is not None
+
+
+class AsyncDatabaseAccessorFactory(object):
+
+    @classmethod
+    async def create(cls, **kwargs):
+        rdbms = kwargs.pop('rdbms')
+        if rdbms is None:
+            raise KeyError('rdbms does not set')
+        rdbms = rdbms.lower()
+        # asyncio用のアクセサはリードレプリカへの振り分けを行わず、読み込みもプライマリで行う
+        for key in ('replica_urls', 'replica_selection', 'read_your_writes'):
+            kwargs.pop(key, None)
+
+        pool = await connection_pool.ConnectionPoolManager.get_or_create_async_connection_pool(rdbms, **kwargs)
+        if rdbms == 'postgresql':
+            return AsyncPostgreSQLAccessor(pool)
+        elif rdbms == 'mysql':
+            return AsyncMySQLAccessor(pool)
+        else:
+            raise ValueError('{} of Accessor class not exists'.format(rdbms))
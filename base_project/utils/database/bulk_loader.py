@@ -0,0 +1,261 @@
+import datetime
+import io
+import itertools
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+PGCOPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+PG_EPOCH_DATE = datetime.date(2000, 1, 1)
+PG_EPOCH_DATETIME = datetime.datetime(2000, 1, 1)
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+@dataclass
+class BulkLoadResult:
+    """
+    バルクロードの実行結果
+    """
+    table_name: str
+    row_count: int
+    elapsed_seconds: float
+
+
+class IteratorStream(io.RawIOBase):
+    """
+    bytesのイテレータをファイルライクオブジェクトとして読み込むクラス
+
+    COPY FROM STDINへ渡すと、readが呼ばれた分だけイテレータを進めるため、
+    全データをメモリに展開せずにストリーミングできる
+    """
+
+    def __init__(self, chunks):
+        """コンストラクタ
+
+        Args:
+            chunks: bytesを返すイテレータ
+        """
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        """最大sizeバイトを読み込む
+
+        Args:
+            size: 読み込むバイト数(負の場合はすべて)
+
+        Returns:
+            読み込んだバイト列
+        """
+        while size is None or size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                break
+
+        if size is None or size < 0:
+            size = len(self._buffer)
+
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def readline(self, size=-1):
+        index = self._buffer.find(b'\n')
+        while index < 0:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                break
+            index = self._buffer.find(b'\n')
+
+        if index < 0:
+            return self.read(size)
+        return self.read(index + 1 if size is None or size < 0 else min(size, index + 1))
+
+
+class RowCounter(object):
+    """
+    イテレータを通過した行数を数えるクラス
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self.count = 0
+
+    def __iter__(self):
+        for row in self._rows:
+            self.count += 1
+            yield row
+
+
+def dataframe_to_rows(dataframe: pd.DataFrame, index: bool = True):
+    """DataFrameを行のタプルのイテレータに変換する
+
+    Args:
+        dataframe: DataFrame
+        index: インデックスを先頭のカラムとして含める
+
+    Returns:
+        カラム名のリスト, 行のイテレータ
+    """
+    columns = [str(column) for column in dataframe.columns]
+    if index:
+        index_names = [name if name is not None else 'index' for name in dataframe.index.names]
+        columns = [str(name) for name in index_names] + columns
+
+    if index and dataframe.index.nlevels > 1:
+        rows = (tuple(row[0]) + row[1:] for row in dataframe.itertuples(index=True, name=None))
+    else:
+        rows = dataframe.itertuples(index=index, name=None)
+
+    return columns, rows
+
+
+def iter_chunks(rows, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """行のイテレータをchunk_size件ずつのリストに分割する
+
+    Args:
+        rows: 行のイテレータ
+        chunk_size: 1チャンクの行数
+
+    Returns:
+        行のリストのイテレータ
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def _is_null(value):
+    return value is None or value is pd.NaT or (isinstance(value, float) and value != value)
+
+
+def _to_python(value):
+    if _is_null(value):
+        return None
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def to_python_rows(rows):
+    """行の値をDB-APIのドライバがそのまま扱える型(numpyの型、日時はPythonの型、文字列)に変換する
+
+    Args:
+        rows: 行のイテレータ
+
+    Returns:
+        タプルのイテレータ
+    """
+    for row in rows:
+        yield tuple([_to_python(value) for value in row])
+
+
+def _to_text(value):
+    if _is_null(value):
+        return '\\N'
+    if isinstance(value, (bool, np.bool_)):
+        return '1' if value else '0'
+    if isinstance(value, np.integer):
+        value = int(value)
+    elif isinstance(value, np.floating):
+        value = float(value)
+    elif isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    elif isinstance(value, datetime.date):
+        return value.isoformat()
+    elif isinstance(value, bytes):
+        value = value.decode()
+
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+
+def encode_text_rows(rows, chunk_size: int = DEFAULT_CHUNK_SIZE, encoding: str = 'utf-8'):
+    """行をタブ区切りのテキスト形式(PostgreSQLのCOPY TEXT、MySQLのLOAD DATAの既定形式)にエンコードする
+
+    Args:
+        rows: 行のイテレータ
+        chunk_size: 1チャンクの行数
+        encoding: エンコーディング
+
+    Returns:
+        チャンクごとのbytesのイテレータ
+    """
+    for chunk in iter_chunks(rows, chunk_size):
+        lines = ['\t'.join([_to_text(value) for value in row]) for row in chunk]
+        yield ('\n'.join(lines) + '\n').encode(encoding)
+
+
+def _to_binary(value):
+    if _is_null(value):
+        return b'\xff\xff\xff\xff'
+    if isinstance(value, (bool, np.bool_)):
+        data = b'\x01' if value else b'\x00'
+    elif isinstance(value, (int, np.integer)):
+        data = struct.pack('>q', int(value))
+    elif isinstance(value, (float, np.floating)):
+        data = struct.pack('>d', float(value))
+    elif isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        delta = value - PG_EPOCH_DATETIME
+        microseconds = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+        data = struct.pack('>q', microseconds)
+    elif isinstance(value, datetime.date):
+        data = struct.pack('>i', (value - PG_EPOCH_DATE).days)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+    elif isinstance(value, (bytes, bytearray)):
+        data = bytes(value)
+    else:
+        raise TypeError('{} is not supported in binary copy'.format(type(value)))
+
+    return struct.pack('>i', len(data)) + data
+
+
+def encode_binary_rows(rows, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """行をPostgreSQLのCOPY BINARY形式にエンコードする
+
+    intはbigint、floatはdouble precision、datetimeはtimestamp、dateはdateとして
+    エンコードするため、テーブルのカラムの型と一致させる必要がある
+
+    Args:
+        rows: 行のイテレータ
+        chunk_size: 1チャンクの行数
+
+    Returns:
+        チャンクごとのbytesのイテレータ
+    """
+    yield PGCOPY_SIGNATURE + struct.pack('>ii', 0, 0)
+
+    for chunk in iter_chunks(rows, chunk_size):
+        buffer = bytearray()
+        for row in chunk:
+            buffer += struct.pack('>h', len(row))
+            for value in row:
+                buffer += _to_binary(value)
+        yield bytes(buffer)
+
+    yield struct.pack('>h', -1)
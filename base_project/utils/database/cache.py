@@ -0,0 +1,451 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from jinja2 import BaseLoader, Environment
+
+
+@dataclass
+class CacheStats:
+    """
+    キャッシュの統計情報
+    """
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LRUCache(object):
+    """
+    スレッドセーフなLRUキャッシュ
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None):
+        """コンストラクタ
+
+        Args:
+            maxsize: 最大のエントリ数
+            ttl: エントリの有効期間(秒)。Noneの場合は期限切れにしない
+        """
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key, default=None):
+        """キャッシュから値を取得する
+
+        Args:
+            key: キー
+            default: キャッシュに存在しない場合の値
+
+        Returns:
+            キャッシュの値
+        """
+        with self._lock:
+            entry = self._data.get(key, self._MISSING)
+            if entry is self._MISSING:
+                self._misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self._misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value):
+        """キャッシュへ値を設定し、最大数を超えた場合は最も古いエントリを削除する
+
+        Args:
+            key: キー
+            value: 値
+
+        """
+        expires_at = time.monotonic() + self._ttl if self._ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key, factory):
+        """キャッシュから値を取得し、存在しない場合はfactoryの結果を設定する
+
+        Args:
+            key: キー
+            factory: 値を生成する関数
+
+        Returns:
+            キャッシュの値
+        """
+        value = self.get(key, self._MISSING)
+        if value is self._MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def keys(self):
+        with self._lock:
+            return list(self._data.keys())
+
+    def items(self):
+        with self._lock:
+            return [(key, value) for key, (_, value) in self._data.items()]
+
+    def clear(self):
+        """キャッシュと統計情報をクリアする
+        """
+        with self._lock:
+            self._data.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(hits=self._hits, misses=self._misses, size=len(self._data), maxsize=self._maxsize)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def freeze(value):
+    """辞書やリストをキャッシュのキーに使えるハッシュ可能な値に変換する
+
+    Args:
+        value: 変換する値
+
+    Returns:
+        ハッシュ可能な値
+
+    Raises:
+        TypeError: ハッシュ化できない値が含まれる場合
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(freeze(v) for v in value)
+    hash(value)
+    return value
+
+
+class QueryTemplateCache(object):
+    """
+    Jinjaで記述されたクエリのコンパイル結果とレンダリング結果をキャッシュするクラス
+    """
+
+    def __init__(self, maxsize: int = 256, rendered_maxsize: int = 4096):
+        """コンストラクタ
+
+        Args:
+            maxsize: コンパイル済みテンプレートの最大数
+            rendered_maxsize: レンダリング済みクエリの最大数
+        """
+        self._env = Environment(loader=BaseLoader())
+        self._templates = LRUCache(maxsize)
+        self._rendered = LRUCache(rendered_maxsize)
+
+    def get_template(self, query: str):
+        """コンパイル済みのテンプレートを取得する
+
+        Args:
+            query: クエリ
+
+        Returns:
+            jinja2.Template
+        """
+        return self._templates.get_or_set(query, lambda: self._env.from_string(query))
+
+    def render(self, query: str, raw_params: dict) -> str:
+        """クエリをレンダリングする
+
+        raw_paramsがハッシュ化できない場合はレンダリング結果をキャッシュしない
+
+        Args:
+            query: クエリ
+            raw_params: formatで設定するパラメタ
+
+        Returns:
+            レンダリング後のクエリ
+        """
+        try:
+            key = (query, freeze(raw_params))
+        except TypeError:
+            return self.get_template(query).render(raw_params)
+
+        return self._rendered.get_or_set(key, lambda: self.get_template(query).render(raw_params))
+
+    def clear(self):
+        self._templates.clear()
+        self._rendered.clear()
+
+    def stats(self) -> dict:
+        """キャッシュの統計情報を返却する
+
+        Returns:
+            {'templates': CacheStats, 'rendered': CacheStats}
+        """
+        return {'templates': self._templates.stats(), 'rendered': self._rendered.stats()}
+
+
+_IDENTIFIER = r'(?:"[^"]+"|`[^`]+`|[\w$]+)'
+_TABLE_NAME = r'({identifier}(?:\s*\.\s*{identifier})?)'.format(identifier=_IDENTIFIER)
+_FROM_PATTERN = re.compile(r'\b(?:FROM|JOIN)\b', re.IGNORECASE)
+_FROM_ITEM_PATTERN = re.compile(r'\s*' + _TABLE_NAME)
+_ALIAS_PATTERN = re.compile(r'\s*(?:AS\s+)?(' + _IDENTIFIER + ')', re.IGNORECASE)
+# FROM句の要素の後に続くキーワード(別名ではない)
+_FROM_CLAUSE_KEYWORDS = frozenset([
+    'where', 'join', 'inner', 'left', 'right', 'full', 'outer', 'cross', 'natural', 'straight_join', 'on', 'using',
+    'group', 'having', 'window', 'qualify', 'order', 'limit', 'offset', 'fetch', 'for', 'union', 'except',
+    'intersect', 'returning', 'with', 'tablesample', 'select', 'into', 'set', 'values', 'lateral', 'only',
+])
+_WRITE_TABLE_PATTERNS = (
+    re.compile(r'^\s*(?:INSERT|REPLACE)\s+(?:IGNORE\s+)?INTO\s+' + _TABLE_NAME, re.IGNORECASE),
+    re.compile(r'^\s*UPDATE\s+(?:ONLY\s+)?' + _TABLE_NAME, re.IGNORECASE),
+    re.compile(r'^\s*DELETE\s+FROM\s+(?:ONLY\s+)?' + _TABLE_NAME, re.IGNORECASE),
+    re.compile(r'^\s*ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?' + _TABLE_NAME, re.IGNORECASE),
+    re.compile(r'^\s*CREATE\s+(?:(?:GLOBAL|LOCAL)\s+)?(?:TEMP(?:ORARY)?\s+|UNLOGGED\s+)?TABLE\s+'
+               r'(?:IF\s+NOT\s+EXISTS\s+)?' + _TABLE_NAME, re.IGNORECASE),
+)
+_TABLE_LIST_PATTERN = re.compile(r'^\s*(?:DROP\s+(?:TEMPORARY\s+)?TABLE\s+(?:IF\s+EXISTS\s+)?'
+                                 r'|TRUNCATE\s+(?:TABLE\s+)?(?:ONLY\s+)?)([^;]+)', re.IGNORECASE)
+_DDL_PATTERN = re.compile(r'^\s*(?:CREATE|DROP|ALTER|TRUNCATE)\b', re.IGNORECASE)
+_READ_ONLY_PATTERN = re.compile(r'^\s*(?:SELECT|SHOW|EXPLAIN|SET|BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b',
+                                re.IGNORECASE)
+_WITH_WRITE_PATTERN = re.compile(r'\b(?:INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+# DDLでテーブル一覧が変わった場合に無効化するカタログ
+CATALOG_TABLE = 'information_schema.tables'
+
+
+def normalize_table_name(table_name: str) -> set:
+    """テーブル名を比較用の名前に正規化する
+
+    Args:
+        table_name: テーブル名(スキーマ修飾、引用符付きも可)
+
+    Returns:
+        スキーマ修飾した名前と修飾なしの名前の集合
+    """
+    parts = [part.strip().strip('"`').lower() for part in table_name.split('.')]
+    return {'.'.join(parts), parts[-1]}
+
+
+def _skip_parentheses(query: str, position: int):
+    """positionの括弧に対応する閉じ括弧の次の位置を返却する。対応が取れない場合はNone
+    """
+    depth = 0
+    quote = None
+    for index in range(position, len(query)):
+        char = query[index]
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    return None
+
+
+def _skip_whitespace(query: str, position: int) -> int:
+    while position < len(query) and query[position].isspace():
+        position += 1
+    return position
+
+
+def referenced_tables(query: str):
+    """クエリが参照するテーブル名を抽出する
+
+    FROM句はカンマ区切りの要素をすべて解析する。サブクエリ内のテーブルはサブクエリのFROM句から抽出する
+
+    Args:
+        query: クエリ
+
+    Returns:
+        正規化したテーブル名の集合。テーブル関数など、参照するテーブルを特定できない場合はNone
+    """
+    tables = set()
+    for match in _FROM_PATTERN.finditer(query):
+        position = match.end()
+        while True:
+            position = _skip_whitespace(query, position)
+            if query.startswith('(', position):
+                position = _skip_parentheses(query, position)
+                if position is None:
+                    return None
+            else:
+                item_match = _FROM_ITEM_PATTERN.match(query, position)
+                if item_match is None or item_match.group(1).lower() in _FROM_CLAUSE_KEYWORDS:
+                    return None
+                position = _skip_whitespace(query, item_match.end())
+                # テーブル関数や3階層以上の修飾名
+                if query.startswith(('(', '.'), position):
+                    return None
+                tables |= normalize_table_name(item_match.group(1))
+
+            alias_match = _ALIAS_PATTERN.match(query, position)
+            if alias_match is not None and alias_match.group(1).lower() not in _FROM_CLAUSE_KEYWORDS:
+                position = _skip_whitespace(query, alias_match.end())
+                # 列の別名
+                if query.startswith('(', position):
+                    position = _skip_parentheses(query, position)
+                    if position is None:
+                        return None
+            position = _skip_whitespace(query, position)
+            if not query.startswith(',', position):
+                break
+            position += 1
+    return frozenset(tables)
+
+
+def written_tables(query: str):
+    """クエリが更新するテーブル名を抽出する
+
+    Args:
+        query: クエリ
+
+    Returns:
+        正規化したテーブル名の集合。更新対象を特定できない場合はNone
+    """
+    if _READ_ONLY_PATTERN.match(query):
+        return frozenset()
+    if query.lstrip()[:4].upper() == 'WITH' and not _WITH_WRITE_PATTERN.search(query):
+        return frozenset()
+
+    tables = set()
+    match = _TABLE_LIST_PATTERN.match(query)
+    if match:
+        for table_name in match.group(1).split(','):
+            table_name = re.sub(r'\s+(?:CASCADE|RESTRICT)\s*$', '', table_name.strip(), flags=re.IGNORECASE)
+            tables |= normalize_table_name(table_name)
+    else:
+        for pattern in _WRITE_TABLE_PATTERNS:
+            match = pattern.match(query)
+            if match:
+                tables |= normalize_table_name(match.group(1))
+                break
+        else:
+            return None
+
+    if _DDL_PATTERN.match(query):
+        tables |= normalize_table_name(CATALOG_TABLE)
+
+    return frozenset(tables)
+
+
+class ResultCache(object):
+    """
+    SELECTの結果をキャッシュし、参照しているテーブルの更新時に無効化するクラス
+
+    テーブルごとの世代番号を更新のたびに進め、クエリの実行中に参照テーブルが更新された場合は結果を設定しない
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        """コンストラクタ
+
+        Args:
+            maxsize: 最大のエントリ数
+            ttl: エントリの有効期間(秒)
+        """
+        self._cache = LRUCache(maxsize, ttl)
+        self._lock = threading.Lock()
+        # すべてを無効化した回数と、テーブルごとの無効化の回数
+        self._generation = 0
+        self._table_generations = {}
+
+    def _generations(self, tables: frozenset) -> tuple:
+        return self._generation, tuple(self._table_generations.get(table, 0) for table in sorted(tables))
+
+    def get_or_set(self, key, query: str, factory):
+        """キャッシュから結果を取得し、存在しない場合はfactoryの結果を設定する
+
+        Args:
+            key: キー
+            query: 参照テーブルの抽出に利用するクエリ
+            factory: 結果を取得する関数
+
+        Returns:
+            クエリの結果
+        """
+        entry = self._cache.get(key)
+        if entry is not None:
+            return entry[1]
+
+        tables = referenced_tables(query)
+        if tables is None:
+            return factory()
+
+        with self._lock:
+            generations = self._generations(tables)
+
+        result = factory()
+
+        with self._lock:
+            # factoryの実行中に無効化された場合、結果は更新前のものの可能性があるため設定しない
+            if self._generations(tables) == generations:
+                self._cache.set(key, (tables, result))
+        return result
+
+    def invalidate(self, tables=None):
+        """テーブルを参照しているエントリを無効化する
+
+        Args:
+            tables: 正規化したテーブル名の集合。Noneの場合はすべて無効化する
+
+        """
+        with self._lock:
+            if tables is None:
+                self._generation += 1
+                for key in self._cache.keys():
+                    self._cache.pop(key)
+                return
+
+            for table in tables:
+                self._table_generations[table] = self._table_generations.get(table, 0) + 1
+            for key, (entry_tables, _) in self._cache.items():
+                if entry_tables & tables:
+                    self._cache.pop(key)
+
+    def invalidate_query(self, query: str):
+        """更新クエリの対象テーブルを参照しているエントリを無効化する
+
+        Args:
+            query: 更新クエリ
+
+        """
+        tables = written_tables(query)
+        if tables is None or tables:
+            self.invalidate(tables)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> CacheStats:
+        return self._cache.stats()
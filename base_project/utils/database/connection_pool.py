@@ -1,9 +1,16 @@
+import itertools
+import json
 import logging
+import math
+import os
+import time
 from abc import ABCMeta, abstractmethod
 
 import sqlalchemy
 from psycopg2 import pool
-from sqlalchemy import pool
+from sqlalchemy import exc, pool
+
+from base_project.utils.database import pool_stats
 
 logger = logging.getLogger(__name__)
 
@@ -73,12 +80,86 @@ class SqlAlchemyConnectionPool(DatabaseConnectionPool):
     def engine(self):
         return self._engine
 
+    # 組み込みデータベースのプールサイズの既定値
+    EMBEDDED_POOL_SIZE = 5
+    EMBEDDED_MAX_OVERFLOW = 10
+    # SQLiteで他のコネクションの書き込みを待つ時間(秒)
+    SQLITE_BUSY_TIMEOUT = 30
+
     def __init__(self, url, max_overflow, pool_size):
-        self._engine = sqlalchemy.create_engine(url, pool_size=int(pool_size), max_overflow=int(max_overflow),
-                                                poolclass=pool.QueuePool)
+        self._engine = sqlalchemy.create_engine(url, **self._engine_kwargs(url, max_overflow, pool_size))
+        self._discarded_pools = []
+        self._pool_stats = pool_stats.PoolStats(self._engine.pool)
+        self._pool_stats.listen(self._engine)
+
+        sqlalchemy.event.listen(self._engine, 'connect', self._on_connect)
+        sqlalchemy.event.listen(self._engine, 'checkout', self._on_checkout)
+        if self._engine.dialect.name == 'sqlite' and self._engine.url.database not in (None, '', ':memory:'):
+            sqlalchemy.event.listen(self._engine, 'connect', self._on_sqlite_connect)
+
+    @classmethod
+    def _engine_kwargs(cls, url, max_overflow, pool_size) -> dict:
+        """エンジン作成時の引数を返却する
+
+        SQLite、DuckDBのインメモリデータベースはコネクションごとに別のデータベースになるため、
+        1つのコネクションを共有するStaticPoolを利用する
+
+        Args:
+            url: sqlalchemy形式の接続URL
+            max_overflow: pool_sizeを超えて作成できるコネクション数
+            pool_size: 常時保持するコネクション数
+
+        Returns:
+            create_engineの引数
+        """
+        url = sqlalchemy.engine.url.make_url(url)
+        backend = url.drivername.split('+')[0]
+        if backend not in ('sqlite', 'duckdb'):
+            return {'pool_size': int(pool_size), 'max_overflow': int(max_overflow), 'poolclass': pool.QueuePool}
+
+        engine_kwargs = {}
+        if backend == 'sqlite':
+            # プールのコネクションは取得したスレッドと異なるスレッドで利用される
+            engine_kwargs['connect_args'] = {'check_same_thread': False, 'timeout': cls.SQLITE_BUSY_TIMEOUT}
+
+        if url.database in (None, '', ':memory:'):
+            engine_kwargs['poolclass'] = pool.StaticPool
+        else:
+            engine_kwargs.update(pool_size=int(pool_size or cls.EMBEDDED_POOL_SIZE),
+                                 max_overflow=int(max_overflow or cls.EMBEDDED_MAX_OVERFLOW),
+                                 poolclass=pool.QueuePool)
+        return engine_kwargs
+
+    @staticmethod
+    def _on_connect(dbapi_connection, connection_record):
+        connection_record.info['pid'] = os.getpid()
+
+    @staticmethod
+    def _on_sqlite_connect(dbapi_connection, connection_record):
+        # WALモードでは読み込み中のコネクションがあっても書き込みをコミットできる
+        cur = dbapi_connection.cursor()
+        cur.execute('PRAGMA journal_mode=WAL')
+        cur.close()
+
+    @staticmethod
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        # fork元のプロセスで作成されたコネクションは利用せず、新しく接続し直す
+        pid = os.getpid()
+        if connection_record.info['pid'] != pid:
+            connection_record.connection = connection_proxy.connection = None
+            raise exc.DisconnectionError(
+                'Connection record belongs to pid {}, attempting to check out in pid {}'.format(
+                    connection_record.info['pid'], pid))
 
     def get_connection(self):
-        return self._engine.raw_connection()
+        start_time = time.perf_counter()
+        try:
+            connection = self._engine.raw_connection()
+        except exc.TimeoutError:
+            self._pool_stats.observe_wait_timeout()
+            raise
+        self._pool_stats.observe_checkout((time.perf_counter() - start_time) * 1000)
+        return connection
 
     def return_connection(self, connection):
         connection.close()
@@ -86,12 +167,228 @@ class SqlAlchemyConnectionPool(DatabaseConnectionPool):
     def close_all_connections(self):
         self._engine.dispose()
 
+    def discard_all_connections(self):
+        """fork先のプロセスで、親プロセスのソケットを閉じずにコネクションを破棄する
+
+        sqlalchemy 1.4.33以降のdispose(close=False)と同様に、新しいプールに置き換える。
+        引き継いだプールはGCでソケットが閉じられないよう参照を保持する
+        """
+        self._discarded_pools.append(self._engine.pool)
+        self._engine.pool = self._engine.pool.recreate()
+
+    def stats(self) -> dict:
+        """コネクションプールの統計情報を返却する
+
+        Returns:
+            統計情報の辞書
+        """
+        return self._pool_stats.stats()
+
+    def checked_out(self) -> int:
+        return pool_stats.pool_status(self._engine.pool, 'checkedout')
+
+
+class ReplicaPoolSet(object):
+    """
+    リードレプリカのコネクションプールから読み込み先を選択するクラス
+    """
+
+    SELECTIONS = ('round_robin', 'least_busy')
+
+    def __init__(self, connection_pools: list, selection: str = 'round_robin'):
+        """コンストラクタ
+
+        Args:
+            connection_pools: レプリカごとのSqlAlchemyConnectionPoolのリスト
+            selection: round_robin(順番に選択) または least_busy(利用中のコネクションが最も少ないものを選択)
+        """
+        if not connection_pools:
+            raise ValueError('connection_pools is empty')
+        if selection not in self.SELECTIONS:
+            raise ValueError('{} of replica selection not exists'.format(selection))
+
+        self._connection_pools = list(connection_pools)
+        self._selection = selection
+        self._counter = itertools.count()
+
+    @property
+    def connection_pools(self) -> list:
+        return list(self._connection_pools)
+
+    def select(self) -> SqlAlchemyConnectionPool:
+        """読み込みに利用するコネクションプールを選択する
+
+        least_busyで利用中のコネクション数が同じ場合は順番に選択する
+
+        Returns:
+            SqlAlchemyConnectionPool
+        """
+        offset = next(self._counter) % len(self._connection_pools)
+        connection_pools = self._connection_pools[offset:] + self._connection_pools[:offset]
+
+        if self._selection == 'least_busy':
+            return min(connection_pools, key=lambda connection_pool: connection_pool.checked_out())
+        return connection_pools[0]
+
+
+class AsyncDatabaseConnectionPool(metaclass=ABCMeta):
+    """
+    asyncioでデータベースのコネクションを管理するクラスのインターフェース
+    """
+
+    def __init__(self, url, max_overflow, pool_size):
+        """コンストラクタ
+
+        Args:
+            url: sqlalchemy形式の接続URL
+            max_overflow: pool_sizeを超えて作成できるコネクション数
+            pool_size: 常時保持するコネクション数
+        """
+        self._url = sqlalchemy.engine.url.make_url(url)
+        self._min_size = int(pool_size)
+        self._max_size = int(pool_size) + int(max_overflow)
+        self._pool = None
+
+    @abstractmethod
+    async def open(self):
+        pass
+
+    @abstractmethod
+    async def get_connection(self):
+        pass
+
+    @abstractmethod
+    async def return_connection(self, connection):
+        pass
+
+    @abstractmethod
+    async def close_all_connections(self):
+        pass
+
+
+class AsyncPostgreSQLConnectionPool(AsyncDatabaseConnectionPool):
+    """
+    psycopg(v3)のAsyncConnectionPoolを利用したコネクションプール管理クラス
+    """
+
+    async def open(self):
+        from psycopg_pool import AsyncConnectionPool
+
+        connection_kwargs = {'host': self._url.host,
+                             'port': self._url.port,
+                             'user': self._url.username,
+                             'password': self._url.password,
+                             'dbname': self._url.database}
+        self._pool = AsyncConnectionPool(conninfo='',
+                                         kwargs={k: v for k, v in connection_kwargs.items() if v is not None},
+                                         min_size=self._min_size, max_size=self._max_size, open=False)
+        await self._pool.open()
+
+    async def get_connection(self):
+        return await self._pool.getconn()
+
+    async def return_connection(self, connection):
+        await self._pool.putconn(connection)
+
+    async def close_all_connections(self):
+        await self._pool.close()
+
+
+class AsyncMySQLConnectionPool(AsyncDatabaseConnectionPool):
+    """
+    aiomysqlを利用したコネクションプール管理クラス
+    """
+
+    async def open(self):
+        import aiomysql
+
+        self._pool = await aiomysql.create_pool(minsize=self._min_size,
+                                                maxsize=self._max_size,
+                                                host=self._url.host,
+                                                port=self._url.port or 3306,
+                                                user=self._url.username,
+                                                password=self._url.password or '',
+                                                db=self._url.database,
+                                                autocommit=False,
+                                                local_infile=True)
+
+    async def get_connection(self):
+        return await self._pool.acquire()
+
+    async def return_connection(self, connection):
+        await self._pool.release(connection)
+
+    async def close_all_connections(self):
+        self._pool.close()
+        await self._pool.wait_closed()
+
 
 class ConnectionPoolManager(object):
     connection_pool_dict = {}
+    replica_pool_set_dict = {}
+    async_connection_pool_dict = {}
+
+    # コネクションプールを作成したプロセスのID
+    _pid = os.getpid()
+    # fork元から引き継いだコネクションプール(GCで親プロセスのソケットが閉じられないよう参照を保持する)
+    _inherited_connection_pools = []
+    # ワーカープロセスの数(ワーカーごとのプールサイズの算出に利用する)
+    _worker_num = 1
+
+    @classmethod
+    def _ensure_process(cls):
+        """fork後に初めて利用された場合、引き継いだコネクションプールを破棄する
+        """
+        pid = os.getpid()
+        if cls._pid == pid:
+            return
+
+        for connection_pool in cls.connection_pool_dict.values():
+            connection_pool.discard_all_connections()
+            cls._inherited_connection_pools.append(connection_pool)
+
+        cls.connection_pool_dict = {}
+        cls.replica_pool_set_dict = {}
+        cls.async_connection_pool_dict = {}
+        cls._pid = pid
+
+        logger.debug('discarded inherited connection pools: pid {}'.format(pid))
+
+    @classmethod
+    def initialize_worker(cls, worker_num: int = 1):
+        """ワーカープロセスの初期化処理
+
+        ProcessPoolExecutorのinitializerとして指定し、プールサイズをワーカー数で分割する
+
+        Args:
+            worker_num: ワーカープロセスの数
+
+        """
+        cls._ensure_process()
+        cls._worker_num = max(int(worker_num), 1)
+
+    @classmethod
+    def _worker_pool_size(cls, size, minimum=0):
+        """ワーカーごとのプールサイズを返却する
+
+        Args:
+            size: プロセス全体のサイズ
+            minimum: 0でない場合の最小値
+
+        Returns:
+            ワーカー数で分割したサイズ(0の場合は0)
+        """
+        if size is None or cls._worker_num == 1:
+            return size
+        size = int(size)
+        if size == 0:
+            return 0
+        return max(math.ceil(size / cls._worker_num), minimum)
 
     @classmethod
-    def get_or_create_connection_pool(cls, url, max_overflow, pool_size):
+    def get_or_create_connection_pool(cls, url, max_overflow=None, pool_size=None):
+        cls._ensure_process()
+
         connection_pool = cls.connection_pool_dict.get(url)
 
         if connection_pool:
@@ -99,8 +396,8 @@ class ConnectionPoolManager(object):
             return connection_pool
         else:
             connection_pool = SqlAlchemyConnectionPool(url=url,
-                                                       max_overflow=max_overflow,
-                                                       pool_size=pool_size)
+                                                       max_overflow=cls._worker_pool_size(max_overflow),
+                                                       pool_size=cls._worker_pool_size(pool_size, 1))
 
             cls.connection_pool_dict[url] = connection_pool
 
@@ -108,15 +405,66 @@ class ConnectionPoolManager(object):
 
             return connection_pool
 
+    @classmethod
+    def get_or_create_replica_pool_set(cls, urls, max_overflow, pool_size, selection='round_robin'):
+        """リードレプリカのコネクションプールをまとめたReplicaPoolSetを取得し、存在しない場合は作成する
+
+        Args:
+            urls: レプリカの接続URLのリスト
+            max_overflow: pool_sizeを超えて作成できるコネクション数(レプリカごと)
+            pool_size: 常時保持するコネクション数(レプリカごと)
+            selection: round_robin または least_busy
+
+        Returns:
+            ReplicaPoolSet
+        """
+        cls._ensure_process()
+
+        key = (tuple(urls), selection)
+        replica_pool_set = cls.replica_pool_set_dict.get(key)
+
+        if replica_pool_set:
+            return replica_pool_set
+
+        replica_pool_set = ReplicaPoolSet([cls.get_or_create_connection_pool(url, max_overflow, pool_size)
+                                           for url in urls], selection)
+        cls.replica_pool_set_dict[key] = replica_pool_set
+
+        logger.debug('created replica pool set: {} ({})'.format([cls._mask_url(url) for url in urls], selection))
+
+        return replica_pool_set
+
+    @staticmethod
+    def _mask_url(url):
+        return repr(sqlalchemy.engine.url.make_url(url))
+
+    @classmethod
+    def stats(cls) -> dict:
+        """コネクションプールごとの統計情報を返却する
+
+        Returns:
+            {接続URL(パスワードはマスク): 統計情報の辞書}
+        """
+        return {cls._mask_url(k): v.stats() for k, v in cls.connection_pool_dict.items()}
+
     @classmethod
     def close_connection_pools(cls):
+        cls._ensure_process()
+
         if cls.connection_pool_dict:
+            for k, v in cls.stats().items():
+                logger.info('connection pool stats: {} {}'.format(k, json.dumps(v)))
+
             for k, v in cls.connection_pool_dict.items():
                 v.close_all_connections()
                 logger.debug('closed connection pool: {}'.format(k))
 
     @classmethod
     def close_connection_pool(cls, connection_pool):
+        cls._ensure_process()
+
+        if connection_pool in cls._inherited_connection_pools:
+            return
 
         connection_pool.close_all_connections()
 
@@ -127,3 +475,72 @@ class ConnectionPoolManager(object):
 
                 logger.debug('closed connection pool: {}'.format(k))
                 break
+
+        for k, v in list(cls.replica_pool_set_dict.items()):
+            if connection_pool in v.connection_pools:
+                cls.replica_pool_set_dict.pop(k)
+
+    @classmethod
+    async def get_or_create_async_connection_pool(cls, rdbms, url, max_overflow, pool_size):
+        """asyncio用のコネクションプールを取得し、存在しない場合は作成する
+
+        Args:
+            rdbms: postgresql または mysql
+            url: sqlalchemy形式の接続URL
+            max_overflow: pool_sizeを超えて作成できるコネクション数
+            pool_size: 常時保持するコネクション数
+
+        Returns:
+            AsyncDatabaseConnectionPool
+        """
+        cls._ensure_process()
+
+        connection_pool = cls.async_connection_pool_dict.get(url)
+
+        if connection_pool:
+            logger.debug('got async connection pool: {}'.format(url))
+            return connection_pool
+
+        if rdbms == 'postgresql':
+            connection_pool = AsyncPostgreSQLConnectionPool(url=url, max_overflow=max_overflow, pool_size=pool_size)
+        elif rdbms == 'mysql':
+            connection_pool = AsyncMySQLConnectionPool(url=url, max_overflow=max_overflow, pool_size=pool_size)
+        else:
+            raise ValueError('{} of async connection pool not exists'.format(rdbms))
+
+        await connection_pool.open()
+
+        # open中に他のタスクが作成した場合はそちらを利用する
+        if url in cls.async_connection_pool_dict:
+            await connection_pool.close_all_connections()
+            return cls.async_connection_pool_dict[url]
+
+        cls.async_connection_pool_dict[url] = connection_pool
+
+        logger.debug('created async connection pool: {}'.format(url))
+
+        return connection_pool
+
+    @classmethod
+    async def close_async_connection_pools(cls):
+        while cls.async_connection_pool_dict:
+            k, v = cls.async_connection_pool_dict.popitem()
+            await v.close_all_connections()
+            logger.debug('closed async connection pool: {}'.format(k))
+
+    @classmethod
+    async def close_async_connection_pool(cls, connection_pool):
+
+        await connection_pool.close_all_connections()
+
+        for k, v in cls.async_connection_pool_dict.items():
+
+            if v is connection_pool:
+                cls.async_connection_pool_dict.pop(k)
+
+                logger.debug('closed async connection pool: {}'.format(k))
+                break
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=ConnectionPoolManager._ensure_process)
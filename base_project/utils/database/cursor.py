@@ -1,17 +1,22 @@
+import inspect
+
+
 class CursorFromConnectionFromPool(object):
     """
     コネクションプールからカーソルを取得するクラス
     """
 
-    def __init__(self, database_connection_pool, dict_cursor=None):
+    def __init__(self, database_connection_pool, dict_cursor=None, connection=None):
         """コンストラクタ
 
         Args:
             database_connection_pool: connection_pool.DatabaseConnectionPoolで定義されたコネクションプール
             dict_cursor: 辞書形式のでの結果の返却の有無(デフォルト: False)
+            connection: トランザクションで固定されたコネクション(指定した場合はコミット、返却を行わない)
         """
         self._database_connection_pool = database_connection_pool
         self._dict_cursor = dict_cursor
+        self._pinned_connection = connection
         self.connection = None
         self.cursor = None
 
@@ -21,7 +26,10 @@ class CursorFromConnectionFromPool(object):
         Returns:
             カーソル
         """
-        self.connection = self._database_connection_pool.get_connection()
+        if self._pinned_connection is not None:
+            self.connection = self._pinned_connection
+        else:
+            self.connection = self._database_connection_pool.get_connection()
         if self._dict_cursor:
             self.cursor = self.connection.cursor(**self._dict_cursor)
         else:
@@ -37,6 +45,12 @@ class CursorFromConnectionFromPool(object):
             exception_traceback: エラーのトレースバック
 
         """
+        if self._pinned_connection is not None:
+            # コミット、ロールバックはトランザクションの終了時に行う
+            if exception_type is None:
+                self.cursor.close()
+            return
+
         if exception_type is None:
             self.cursor.close()
             self.connection.commit()
@@ -44,3 +58,57 @@ class CursorFromConnectionFromPool(object):
             self.connection.rollback()
 
         self._database_connection_pool.return_connection(self.connection)
+
+
+class AsyncCursorFromConnectionFromPool(object):
+    """
+    asyncio用のコネクションプールからカーソルを取得するクラス
+    """
+
+    def __init__(self, database_connection_pool, dict_cursor=None):
+        """コンストラクタ
+
+        Args:
+            database_connection_pool: connection_pool.AsyncDatabaseConnectionPoolで定義されたコネクションプール
+            dict_cursor: カーソル作成時の引数
+        """
+        self._database_connection_pool = database_connection_pool
+        self._dict_cursor = dict_cursor
+        self.connection = None
+        self.cursor = None
+
+    async def __aenter__(self):
+        """コネクションプールからコネクション、カーソルを取得する
+
+        Returns:
+            カーソル
+        """
+        self.connection = await self._database_connection_pool.get_connection()
+        if self._dict_cursor:
+            cur = self.connection.cursor(**self._dict_cursor)
+        else:
+            cur = self.connection.cursor()
+
+        # aiomysqlのcursorはコルーチン、psycopgのcursorは同期的に返却される
+        if inspect.isawaitable(cur):
+            cur = await cur
+        self.cursor = cur
+        return self.cursor
+
+    async def __aexit__(self, exception_type, exception_value, exception_traceback):
+        """カーソルを閉じ、コネクションをコネクションプールに返却する
+
+        Args:
+            exception_type: 例外
+            exception_value: エラーメッセージ
+            exception_traceback: エラーのトレースバック
+
+        """
+        try:
+            if exception_type is None:
+                await self.cursor.close()
+                await self.connection.commit()
+            else:
+                await self.connection.rollback()
+        finally:
+            await self._database_connection_pool.return_connection(self.connection)
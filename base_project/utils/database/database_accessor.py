@@ -1,12 +1,18 @@
+import contextlib
 import logging
+import os
+import re
+import tempfile
 import threading
+import time
+import uuid
 from abc import ABCMeta, abstractmethod
-from typing import Union
-from jinja2 import Environment, BaseLoader
+from typing import Iterable, Union
 
 import pandas as pd
 
-from base_project.utils.database import connection_pool, cursor
+from base_project.utils.database import (bulk_loader, cache, connection_pool, cursor, partition, query_tracer,
+                                         result_format)
 
 logger = logging.getLogger(__name__)
 
@@ -16,18 +22,37 @@ class DatabaseAccessor(metaclass=ABCMeta):
     データベースアクセスの行う基底のクラス
     """
 
-    _dict_cursor = None
+    # 行の形式ごとのカーソル作成時の引数({row_format: dict})
+    _row_cursors = {}
 
-    def __init__(self, sqlalchemy_connection_pool):
+    DEFAULT_ITERSIZE = 2000
+    DEFAULT_PAGE_SIZE = 1000
+    # COPY TO STDOUTの結果をメモリに保持する上限(超えた分は一時ファイルに書き出す)
+    COPY_SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+    # 全インスタンスで共有するテンプレートのキャッシュ
+    _template_cache = cache.QueryTemplateCache()
+    # 全インスタンスで共有するテーブルの存在有無のキャッシュ({(接続先, スキーマ, テーブル名): bool})
+    CATALOG_CACHE_TTL = 300
+    _catalog_cache = cache.LRUCache(maxsize=65536, ttl=CATALOG_CACHE_TTL)
+
+    def __init__(self, sqlalchemy_connection_pool,
+                 replica_pool_set: connection_pool.ReplicaPoolSet = None, read_your_writes: bool = False):
         """コンストラクタ
 
         Args:
-            sqlalchemy_connection_pool: コネクションプール
+            sqlalchemy_connection_pool: プライマリのコネクションプール
+            replica_pool_set: リードレプリカのコネクションプール(指定した場合はselect_*、read_table_*をレプリカで実行する)
+            read_your_writes: このアクセサで更新した後の読み込みをプライマリで実行する
 
         """
         self._connection_pool = sqlalchemy_connection_pool
-
-        self._env = Environment(loader=BaseLoader())
+        self._replica_pool_set = replica_pool_set
+        self._read_your_writes = read_your_writes
+        self._written = False
+        self._local = threading.local()
+        self._result_cache = None
+        self._catalog_database = str(sqlalchemy_connection_pool.engine.url)
 
     @staticmethod
     def read_query_from_file(file_path: str, encoding: str = None) -> str:
@@ -44,11 +69,315 @@ class DatabaseAccessor(metaclass=ABCMeta):
             query = fin.read()
         return query
 
-    @staticmethod
+    def _read_pool(self) -> connection_pool.SqlAlchemyConnectionPool:
+        """読み込みに利用するコネクションプールを選択する
+
+        レプリカが未設定、トランザクション中、use_primaryのブロック内、
+        read_your_writesが有効で更新済みの場合はプライマリを利用する
+
+        Returns:
+            SqlAlchemyConnectionPool
+        """
+        if (self._replica_pool_set is None
+                or self.in_transaction()
+                or getattr(self._local, 'use_primary', False)
+                or (self._read_your_writes and self._written)):
+            return self._connection_pool
+        return self._replica_pool_set.select()
+
+    def _cursor(self, dict_cursor: dict = None, read: bool = False) -> cursor.CursorFromConnectionFromPool:
+        """カーソルを取得する。トランザクション中の場合は固定されたコネクションを利用する
+
+        Args:
+            dict_cursor: カーソル作成時の引数
+            read: 読み込みのみのクエリの場合はレプリカのコネクションを利用する
+
+        Returns:
+            CursorFromConnectionFromPool
+        """
+        database_connection_pool = self._read_pool() if read else self._connection_pool
+        return cursor.CursorFromConnectionFromPool(database_connection_pool, dict_cursor,
+                                                   connection=getattr(self._local, 'connection', None))
+
+    @contextlib.contextmanager
+    def use_primary(self):
+        """ブロック内の読み込みをプライマリで実行する
+
+        Returns:
+            DatabaseAccessor
+        """
+        use_primary = getattr(self._local, 'use_primary', False)
+        self._local.use_primary = True
+        try:
+            yield self
+        finally:
+            self._local.use_primary = use_primary
+
+    def in_transaction(self) -> bool:
+        return getattr(self._local, 'connection', None) is not None
+
+    def _begin(self, connection):
+        """トランザクションを開始する(DBAPIのコネクションが暗黙に開始しない場合にオーバーライドする)
+
+        Args:
+            connection: トランザクションで固定するコネクション
+
+        """
+        pass
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """1つのコネクションを固定し、ブロック内のクエリを1つのトランザクションで実行する
+
+        ネストした場合はSAVEPOINTを作成し、内側のブロックのみをロールバックできる。
+        pandasを利用するread_table_*、write_tableはトランザクションの対象外となる
+
+        Returns:
+            DatabaseAccessor
+        """
+        if not self.in_transaction():
+            connection = self._connection_pool.get_connection()
+            self._local.connection = connection
+            self._local.savepoint_depth = 0
+            try:
+                self._begin(connection)
+                yield self
+            except BaseException:
+                connection.rollback()
+                raise
+            else:
+                connection.commit()
+            finally:
+                self._local.connection = None
+                self._connection_pool.return_connection(connection)
+            return
+
+        self._local.savepoint_depth += 1
+        savepoint = 'savepoint_{}'.format(self._local.savepoint_depth)
+        with self._cursor() as cur:
+            cur.execute('SAVEPOINT {}'.format(savepoint))
+        try:
+            yield self
+        except BaseException:
+            with self._cursor() as cur:
+                cur.execute('ROLLBACK TO SAVEPOINT {}'.format(savepoint))
+            raise
+        else:
+            with self._cursor() as cur:
+                cur.execute('RELEASE SAVEPOINT {}'.format(savepoint))
+        finally:
+            self._local.savepoint_depth -= 1
+
+    @classmethod
+    def render_query(cls, query: str, raw_params: dict = None) -> str:
+        """キャッシュ済みのテンプレートでクエリをレンダリングする
+
+        Args:
+            query: クエリ
+            raw_params: formatで設定するパラメタ
+
+        Returns:
+            レンダリング後のクエリ
+        """
+        if not raw_params:
+            return query
+        return cls._template_cache.render(query, raw_params)
+
+    @classmethod
+    def compile_query(cls, query: str):
+        """クエリのテンプレートをコンパイルし、キャッシュに登録する
+
+        Args:
+            query: クエリ
+
+        Returns:
+            jinja2.Template
+        """
+        return cls._template_cache.get_template(query)
+
+    @classmethod
+    def template_cache_stats(cls) -> dict:
+        """テンプレートのキャッシュの統計情報を返却する
+
+        Returns:
+            {'templates': CacheStats, 'rendered': CacheStats}
+        """
+        return cls._template_cache.stats()
+
+    def enable_result_cache(self, maxsize: int = 1024, ttl: float = 60):
+        """select_*、read_table_by_queryの結果のキャッシュを有効にする
+
+        同じアクセサでexecute、executemany、write_table、bulk_loadを実行すると、
+        更新したテーブルを参照している結果は無効化される
+
+        Args:
+            maxsize: 最大のエントリ数
+            ttl: エントリの有効期間(秒)
+
+        """
+        self._result_cache = cache.ResultCache(maxsize, ttl)
+
+    def disable_result_cache(self):
+        self._result_cache = None
+
+    def result_cache_stats(self) -> Union[cache.CacheStats, None]:
+        """結果のキャッシュの統計情報を返却する
+
+        Returns:
+            CacheStats(キャッシュが無効の場合はNone)
+        """
+        if self._result_cache is None:
+            return None
+        return self._result_cache.stats()
+
+    def _cached(self, key: tuple, query: str, factory):
+        """結果のキャッシュが有効な場合はキャッシュから結果を取得する
+
+        トランザクション中はコミット前のデータを共有しないようにキャッシュを利用しない
+
+        Args:
+            key: キャッシュのキー
+            query: レンダリング後のクエリ
+            factory: 結果を取得する関数
+
+        Returns:
+            クエリの結果
+        """
+        if self._result_cache is None or self.in_transaction():
+            return factory()
+
+        try:
+            key = cache.freeze(key)
+        except TypeError:
+            return factory()
+
+        result = self._result_cache.get_or_set(key, query, factory)
+        if isinstance(result, list):
+            return list(result)
+        if isinstance(result, dict):
+            return {key: list(value) if isinstance(value, list) else value for key, value in result.items()}
+        if isinstance(result, pd.DataFrame):
+            return result.copy()
+        return result
+
+    def _after_write(self, query: str = None, table_names: list = None):
+        """更新を記録し、更新されたテーブルを参照している結果のキャッシュ、カタログのキャッシュを無効化する
+
+        Args:
+            query: 更新クエリ
+            table_names: 更新したテーブル名のリスト
+
+        """
+        written_tables = cache.written_tables(query) if query is not None else frozenset()
+        if table_names or written_tables != frozenset():
+            self._written = True
+
+        # DDLの場合は対象テーブルの存在有無のキャッシュを無効化する(対象を特定できない場合はすべて)
+        if written_tables is None:
+            self._invalidate_catalog_cache()
+        elif written_tables >= cache.normalize_table_name(cache.CATALOG_TABLE):
+            self._invalidate_catalog_cache(written_tables)
+
+        if self._result_cache is None:
+            return
+
+        if written_tables is None or written_tables:
+            self._result_cache.invalidate(written_tables)
+        if table_names:
+            tables = set()
+            for table_name in table_names:
+                tables |= cache.normalize_table_name(table_name)
+            self._result_cache.invalidate(tables)
+
+    def _invalidate_catalog_cache(self, tables: frozenset = None):
+        """このデータベースのテーブルの存在有無のキャッシュを無効化する
+
+        Args:
+            tables: 正規化したテーブル名の集合。Noneの場合はすべて無効化する
+
+        """
+        for key in self._catalog_cache.keys():
+            database, schema, table_name = key
+            if database != self._catalog_database:
+                continue
+            if tables is None or cache.normalize_table_name(self._qualified_table_name(table_name, schema)) & tables:
+                self._catalog_cache.pop(key)
+
+    def _to_driver_query(self, query: str, params=None) -> tuple:
+        """クエリとパラメタをドライバのパラメタ形式に変換する
+
+        Args:
+            query: レンダリング後のクエリ(パラメタは%s、%(name)s形式)
+            params: クエリパラメタ
+
+        Returns:
+            クエリ, クエリパラメタ
+        """
+        return query, params
+
+    def _execute(self, cur, query, params=None, raw_params=None, explain: bool = True):
+        """クエリを実行し、実行時間と行数をトレーサに記録する
+
+        Args:
+            cur: カーソル
+            query: クエリ
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+            explain: スロークエリの場合に実行計画を取得する
+
+        Returns:
+            カーソル
+        """
+        query, params = self._to_driver_query(self.render_query(query, raw_params), params)
+
+        start_time = time.perf_counter()
+        cur.execute(query, params)
+        duration_ms = (time.perf_counter() - start_time) * 1000
+
+        tracer = query_tracer.get_tracer()
+        plan = None
+        if explain and tracer.explain and tracer.is_slow(duration_ms):
+            plan = self._explain(cur.connection, query, params)
+        tracer.record(query, duration_ms, cur.rowcount, plan)
+        return cur
+
     @abstractmethod
-    def _execute(cur, query, params=None, raw_params=None):
+    def _explain_prefix(self, query: str) -> Union[str, None]:
         pass
 
+    def _explain(self, connection, query, params=None) -> Union[str, None]:
+        """スロークエリの実行計画を取得する
+
+        失敗してもトランザクションに影響しないようにSAVEPOINT内で実行する
+
+        Args:
+            connection: クエリを実行したコネクション
+            query: クエリ
+            params: クエリパラメタ
+
+        Returns:
+            実行計画(取得できない場合はNone)
+        """
+        prefix = self._explain_prefix(query)
+        if prefix is None:
+            return None
+
+        explain_cursor = connection.cursor()
+        try:
+            explain_cursor.execute('SAVEPOINT explain_slow_query')
+            try:
+                explain_cursor.execute(prefix + query, params)
+                rows = explain_cursor.fetchall()
+            except Exception as e:
+                explain_cursor.execute('ROLLBACK TO SAVEPOINT explain_slow_query')
+                logger.warning('failed to explain slow query: {}'.format(e))
+                return None
+            explain_cursor.execute('RELEASE SAVEPOINT explain_slow_query')
+        finally:
+            explain_cursor.close()
+
+        return '\n'.join(str(row[0]) if len(row) == 1 else str(row) for row in rows)
+
     def execute(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None):
         """クエリを実行する
 
@@ -58,9 +387,12 @@ class DatabaseAccessor(metaclass=ABCMeta):
             raw_params: formatで設定するパラメタ
 
         """
+        query = self.render_query(query, raw_params)
+
+        with self._cursor() as cur:
+            self._execute(cur, query, params)
 
-        with cursor.CursorFromConnectionFromPool(self._connection_pool, self._dict_cursor) as cur:
-            self._execute(cur, query, params, raw_params)
+        self._after_write(query=query)
 
     def execute_from_file(self, file_path: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
                           encoding: str = None):
@@ -76,25 +408,37 @@ class DatabaseAccessor(metaclass=ABCMeta):
         query = self.read_query_from_file(file_path, encoding)
         self.execute(query, params, raw_params)
 
-    def executemany(self, query: str, params: Union[list, tuple] = None, raw_params: dict = None):
-        """タプル、リストからデータのINSERTを行う
+    @abstractmethod
+    def _executemany(self, cur, query, params, page_size):
+        pass
+
+    def executemany(self, query: str, params: Union[list, tuple] = None, raw_params: dict = None,
+                    page_size: int = DEFAULT_PAGE_SIZE) -> int:
+        """タプル、リストからデータのINSERTをpage_size件ずつまとめて行う
 
         Args:
             query: クエリ
             params: インサートのデータ
             raw_params: formatで設定するパラメタ
+            page_size: 1回のラウンドトリップで送る件数
 
+        Returns:
+            影響を受けた行数(取得できない場合は-1)
         """
-        with cursor.CursorFromConnectionFromPool(self._connection_pool, self._dict_cursor) as cur:
-            if raw_params:
-                template_query = self._env.from_string(query)
-                query = template_query.render(raw_params)
+        query = self.render_query(query, raw_params)
 
-            cur.executemany(query, params)
-            logger.info('SQL: {}'.format(cur.query.decode()))
+        start_time = time.perf_counter()
+        with self._cursor() as cur:
+            rowcount = self._executemany(cur, query, params, page_size)
+        query_tracer.get_tracer().record(query, (time.perf_counter() - start_time) * 1000, rowcount)
+
+        self._after_write(query=query)
+
+        logger.info('SQL(executemany): {} rows affected'.format(rowcount))
+        return rowcount
 
     def executemany_from_file(self, file_path: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
-                              encoding: str = None):
+                              encoding: str = None, page_size: int = DEFAULT_PAGE_SIZE) -> int:
         """ファイルからクエリを読み込み、executemanyを実行する
 
         Args:
@@ -102,43 +446,70 @@ class DatabaseAccessor(metaclass=ABCMeta):
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
             encoding: エンコーディング
+            page_size: 1回のラウンドトリップで送る件数
 
+        Returns:
+            影響を受けた行数(取得できない場合は-1)
         """
         query = self.read_query_from_file(file_path, encoding)
-        self.executemany(query, params, raw_params)
+        return self.executemany(query, params, raw_params, page_size)
 
-    def select_all(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
-                   to_dict: bool = False) -> Union[tuple, list]:
-        """SELECT文を実行し、結果をすべて取得する
+    def _row_cursor(self, row_format: str) -> Union[dict, None]:
+        """行の形式に対応するドライバのカーソル作成時の引数を返却する
+
+        Args:
+            row_format: 行の形式
+
+        Returns:
+            cursorの引数(タプルで取得する場合はNone)
+        """
+        return self._row_cursors.get(row_format)
+
+    def _select(self, key: tuple, query: str, params, raw_params, row_format: str, fetch, fetch_one: bool = False):
+        """SELECT文を実行し、fetchで結果を取得してrow_formatの形式に変換する
 
         Args:
+            key: キャッシュのキー(メソッド名と取得方法の引数)
             query: クエリ
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
-            to_dict: 結果を辞書で返却する
+            row_format: 行の形式
+            fetch: カーソルから結果を取得する関数
+            fetch_one: fetchが1行を返却する
 
         Returns:
             クエリの実行結果
         """
+        query = self.render_query(query, raw_params)
+        convert = result_format.convert_row if fetch_one else result_format.convert_rows
 
-        if to_dict:
-            dict_cursor = self._dict_cursor
-        else:
-            dict_cursor = None
+        def _fetch():
+            with self._cursor(self._row_cursor(row_format), read=True) as cur:
+                self._execute(cur, query, params)
+                return convert(fetch(cur), cur.description, row_format)
 
-        with cursor.CursorFromConnectionFromPool(self._connection_pool, dict_cursor) as cur:
-            self._execute(cur, query, params, raw_params)
-            rows = cur.fetchall()
+        return self._cached(key + (row_format, query, params), query, _fetch)
 
-        if not to_dict:
-            return rows
-        elif to_dict and type(rows[0]) is dict:
-            return rows
-        else:
-            return [dict(row) for row in rows]
+    def select_all(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
+                   to_dict: bool = False, row_format: str = None) -> Union[list, dict]:
+        """SELECT文を実行し、結果をすべて取得する
+
+        Args:
+            query: クエリ
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+            to_dict: 結果を辞書で返却する(row_formatのdictと同じ)
+            row_format: tuple、namedtuple、dict、columns({カラム名: 値のリスト})のいずれか
+
+        Returns:
+            クエリの実行結果
+        """
+        return self._select(('select_all',), query, params, raw_params, result_format.resolve(row_format, to_dict),
+                            lambda cur: cur.fetchall())
 
     def select_all_from_file(self, file_path: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
-                             to_dict: bool = False, encoding: str = None) -> Union[tuple, list]:
+                             to_dict: bool = False, encoding: str = None,
+                             row_format: str = None) -> Union[list, dict]:
         """ファイルからクエリを読み込み、select_allを実行する
 
         Args:
@@ -147,48 +518,37 @@ class DatabaseAccessor(metaclass=ABCMeta):
             raw_params: formatで設定するパラメタ
             to_dict: 結果を辞書で返却する
             encoding: エンコーディング
+            row_format: 行の形式
 
         Returns:
             クエリの実行結果
         """
         query = self.read_query_from_file(file_path, encoding)
-        return self.select_all(query, params, raw_params, to_dict)
+        return self.select_all(query, params, raw_params, to_dict, row_format)
 
     def select_many(self, query: str, fetch_size: int, params: Union[dict, list, tuple] = None,
-                    raw_params: dict = None, to_dict: bool = False) -> Union[tuple, list]:
-        """SELECT文を実行し、結果をすべて取得する
+                    raw_params: dict = None, to_dict: bool = False, row_format: str = None) -> Union[list, dict]:
+        """SELECT文を実行し、結果をfetch_size件取得する
 
         Args:
             query: クエリ
             fetch_size: 取得行の数
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
-            to_dict: 結果を辞書で返却する
+            to_dict: 結果を辞書で返却する(row_formatのdictと同じ)
+            row_format: tuple、namedtuple、dict、columns({カラム名: 値のリスト})のいずれか
 
         Returns:
             クエリの実行結果
         """
-
-        if to_dict:
-            dict_cursor = self._dict_cursor
-        else:
-            dict_cursor = None
-
-        with cursor.CursorFromConnectionFromPool(self._connection_pool, dict_cursor) as cur:
-            self._execute(cur, query, params, raw_params)
-            rows = cur.fetchmany(fetch_size)
-
-        if not to_dict:
-            return rows
-        elif to_dict and type(rows[0]) is dict:
-            return rows
-        else:
-            return [dict(row) for row in rows]
+        return self._select(('select_many', fetch_size), query, params, raw_params,
+                            result_format.resolve(row_format, to_dict), lambda cur: cur.fetchmany(fetch_size))
 
     def select_many_from_file(self, file_path: str, fetch_size: int,
                               params: Union[dict, list, tuple] = None, raw_params: dict = None,
-                              to_dict: bool = False, encoding: str = None) -> Union[tuple, list]:
-        """ファイルからクエリを読み込み、select_allを実行する
+                              to_dict: bool = False, encoding: str = None,
+                              row_format: str = None) -> Union[list, dict]:
+        """ファイルからクエリを読み込み、select_manyを実行する
 
         Args:
             file_path: ファイルのパス
@@ -197,59 +557,109 @@ class DatabaseAccessor(metaclass=ABCMeta):
             raw_params: formatで設定するパラメタ
             to_dict: 結果を辞書で返却する
             encoding: エンコーディング
+            row_format: 行の形式
 
         Returns:
             クエリの実行結果
         """
         query = self.read_query_from_file(file_path, encoding)
-        return self.select_many(query, fetch_size, params, raw_params, to_dict)
+        return self.select_many(query, fetch_size, params, raw_params, to_dict, row_format)
 
     def select_one(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
-                   to_dict: bool = False) -> Union[tuple, dict]:
+                   to_dict: bool = False, row_format: str = None):
         """SELECT文を実行し、結果の先頭を取得する
 
         Args:
             query: クエリ
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
+            to_dict: 結果を辞書で返却する(row_formatのdictと同じ)
+            row_format: tuple、namedtuple、dict、columns({カラム名: 値のリスト})のいずれか
+
+        Returns:
+            クエリの実行結果(行が存在しない場合はNone)
+        """
+        return self._select(('select_one',), query, params, raw_params, result_format.resolve(row_format, to_dict),
+                            lambda cur: cur.fetchone(), fetch_one=True)
+
+    def select_one_from_file(self, file_path: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
+                             to_dict: bool = False, encoding: str = None, row_format: str = None):
+        """ファイルからクエリを読み込み、select_oneを実行する
+
+        Args:
+            file_path: ファイルのパス
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
             to_dict: 結果を辞書で返却する
+            encoding: エンコーディング
+            row_format: 行の形式
 
         Returns:
             クエリの実行結果
         """
+        query = self.read_query_from_file(file_path, encoding)
+        return self.select_one(query, params, raw_params, to_dict, row_format)
 
-        if to_dict:
-            dict_cursor = self._dict_cursor
-        else:
-            dict_cursor = None
+    @abstractmethod
+    def _server_side_cursor(self, row_format: str = result_format.TUPLE) -> dict:
+        pass
 
-        with cursor.CursorFromConnectionFromPool(self._connection_pool, dict_cursor) as cur:
-            self._execute(cur, query, params, raw_params)
-            row = cur.fetchone()
+    def select_iter(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
+                    to_dict: bool = False, itersize: int = DEFAULT_ITERSIZE, as_batches: bool = False,
+                    row_format: str = None):
+        """サーバサイドカーソルでSELECT文を実行し、結果を逐次取得する
 
-        if not to_dict:
-            return row
-        elif to_dict and type(row) is dict:
-            return row
-        else:
-            return dict(row)
+        ジェネレータを最後まで読み込むか、closeするまでコネクションをプールから借りたままにする
 
-    def select_one_from_file(self, file_path: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
-                             to_dict: bool = False, encoding: str = None) -> Union[tuple, dict]:
-        """ファイルからクエリを読み込み、select_oneを実行する
+        Args:
+            query: クエリ
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+            to_dict: 結果を辞書で返却する(row_formatのdictと同じ)
+            itersize: 1回のフェッチで取得する行数
+            as_batches: 行ではなくitersize件ごとのリストで返却する
+            row_format: tuple、namedtuple、dict、columnsのいずれか(columnsの場合はitersize件ごとの辞書で返却する)
+
+        Returns:
+            クエリの実行結果のジェネレータ
+        """
+        row_format = result_format.resolve(row_format, to_dict)
+
+        with self._cursor(self._server_side_cursor(row_format), read=True) as cur:
+            self._execute(cur, query, params, raw_params, explain=False)
+
+            while True:
+                rows = cur.fetchmany(itersize)
+                if not rows:
+                    break
+
+                rows = result_format.convert_rows(rows, cur.description, row_format)
+
+                if as_batches or row_format == result_format.COLUMNS:
+                    yield rows
+                else:
+                    yield from rows
+
+    def select_iter_from_file(self, file_path: str, params: Union[dict, list, tuple] = None,
+                              raw_params: dict = None, to_dict: bool = False, itersize: int = DEFAULT_ITERSIZE,
+                              as_batches: bool = False, encoding: str = None, row_format: str = None):
+        """ファイルからクエリを読み込み、select_iterを実行する
 
         Args:
             file_path: ファイルのパス
             params: クエリパラメタ
             raw_params: formatで設定するパラメタ
             to_dict: 結果を辞書で返却する
+            itersize: 1回のフェッチで取得する行数
+            as_batches: 行ではなくitersize件ごとのリストで返却する
             encoding: エンコーディング
+            row_format: 行の形式
 
         Returns:
-            クエリの実行結果
+            クエリの実行結果のジェネレータ
         """
         query = self.read_query_from_file(file_path, encoding)
-        return self.select_one(query, params, raw_params, to_dict)
+        return self.select_iter(query, params, raw_params, to_dict, itersize, as_batches, row_format)
 
     def read_table_by_name(self, table_name,
                            schema=None,
@@ -262,7 +672,7 @@ class DatabaseAccessor(metaclass=ABCMeta):
         logger.info('read {}'.format(table_name))
 
         return pd.read_sql_table(table_name=table_name,
-                                 con=self._connection_pool.engine,
+                                 con=self._read_pool().engine,
                                  schema=schema,
                                  index_col=index_col,
                                  coerce_float=coerce_float,
@@ -277,15 +687,195 @@ class DatabaseAccessor(metaclass=ABCMeta):
                             parse_dates=None,
                             chunksize=None):
 
-        logger.info('read table from SQL: {}'.format(query))
+        def _read():
+            logger.info('read table from SQL: {}'.format(query))
+
+            driver_query, driver_params = self._to_driver_query(query, params)
+            start_time = time.perf_counter()
+            result = pd.read_sql_query(sql=driver_query,
+                                       con=self._read_pool().engine,
+                                       index_col=index_col,
+                                       coerce_float=coerce_float,
+                                       params=driver_params,
+                                       parse_dates=parse_dates,
+                                       chunksize=chunksize)
+            if not chunksize:
+                query_tracer.get_tracer().record(query, (time.perf_counter() - start_time) * 1000, len(result))
+            return result
+
+        if chunksize:
+            return _read()
+
+        return self._cached(('read_table_by_query', query, params, index_col, coerce_float, parse_dates),
+                            query, _read)
+
+    def read_table_by_copy(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
+                           index_col=None, dtype=None, parse_dates=None, chunksize: int = None,
+                           as_numpy: bool = False):
+        """COPY TO STDOUTでクエリの結果を列指向に読み込む
 
-        return pd.read_sql_query(sql=query,
-                                 con=self._connection_pool.engine,
-                                 index_col=index_col,
-                                 coerce_float=coerce_float,
-                                 params=params,
-                                 parse_dates=parse_dates,
-                                 chunksize=chunksize)
+        Args:
+            query: クエリ
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+            index_col: インデックスにするカラム
+            dtype: カラムごとの型のヒント
+            parse_dates: 日付として読み込むカラム
+            chunksize: 指定した場合はchunksize行ごとのイテレータで返却する
+            as_numpy: DataFrameではなく{カラム名: numpy.ndarray}で返却する
+
+        Returns:
+            DataFrame、{カラム名: numpy.ndarray}、またはそれらのイテレータ
+        """
+        raise NotImplementedError('{} does not support read_table_by_copy'.format(type(self).__name__))
+
+    def _partition_source(self, table_name: str = None, query: str = None, schema: str = None,
+                          columns: list = None) -> str:
+        if query is not None:
+            return query
+        if table_name is None:
+            raise ValueError('table_name or query must be set')
+
+        column_list = ', '.join(map(self._quote_identifier, columns)) if columns else '*'
+        return 'SELECT {} FROM {}'.format(column_list, self._qualified_table_name(table_name, schema))
+
+    def partition_bounds(self, key_column: str, table_name: str = None, query: str = None, params: dict = None,
+                         schema: str = None, partitions: int = partition.DEFAULT_PARTITIONS,
+                         bounds: str = partition.BOUNDS_MINMAX) -> tuple:
+        """キーのカラムでテーブル(クエリの結果)を分割する範囲を算出する
+
+        Args:
+            key_column: 分割に利用するカラム(日付、数値の主キーなど)
+            table_name: テーブル名
+            query: テーブルの代わりに分割するクエリ
+            params: クエリパラメタ(辞書)
+            schema: スキーマ
+            partitions: 分割数
+            bounds: minmax(最小値から最大値を等間隔に分割) または quantile(行数が均等になるように分割)
+
+        Returns:
+            (下限, 上限)のリスト, キーがNULLの行の有無
+        """
+        source = self._partition_source(table_name, query, schema)
+        key = self._quote_identifier(key_column)
+
+        lower, upper, null_count = self.select_one(
+            'SELECT MIN({key}), MAX({key}), COUNT(*) - COUNT({key}) FROM ({source}) AS partition_source'.format(
+                key=key, source=source), params)
+
+        if bounds == partition.BOUNDS_MINMAX:
+            lower_bounds = partition.split_range(lower, upper, partitions)
+        elif bounds == partition.BOUNDS_QUANTILE:
+            # 行数が均等になるようにNTILEで分割し、各グループの最小値を下限とする
+            rows = self.select_all(
+                'SELECT MIN({key}) FROM (SELECT {key}, NTILE({partitions}) OVER (ORDER BY {key}) AS tile '
+                'FROM ({source}) AS partition_source WHERE {key} IS NOT NULL) AS tiles '
+                'GROUP BY tile ORDER BY 1'.format(key=key, partitions=int(partitions), source=source), params)
+            lower_bounds = sorted({row[0] for row in rows})
+        else:
+            raise ValueError('{} of partition bounds not exists'.format(bounds))
+
+        return partition.to_ranges(lower_bounds), bool(null_count)
+
+    def iter_table_parallel(self, key_column: str, table_name: str = None, query: str = None, params: dict = None,
+                            schema: str = None, columns: list = None, partitions: int = partition.DEFAULT_PARTITIONS,
+                            bounds: str = partition.BOUNDS_MINMAX, max_workers: int = None,
+                            max_in_flight: int = None, index_col=None, coerce_float=True, parse_dates=None):
+        """テーブル(クエリの結果)をキーの範囲で分割して並列に読み込み、キーの順にDataFrameを返却する
+
+        範囲ごとにプールから別のコネクション(レプリカがある場合はレプリカ)を取得する。
+        read_table_*と同様にtransactionの対象外となる
+
+        Args:
+            key_column: 分割に利用するカラム(日付、数値の主キーなど)
+            table_name: テーブル名
+            query: テーブルの代わりに分割するクエリ
+            params: クエリパラメタ(辞書)
+            schema: スキーマ
+            columns: 読み込むカラム(table_nameを指定した場合)
+            partitions: 分割数
+            bounds: minmax または quantile
+            max_workers: 並列に読み込むスレッド数(コネクションプールの最大数以下にする)
+            max_in_flight: 読み込み中、未取得のDataFrameの最大数(デフォルト: max_workers)
+            index_col: インデックスにするカラム
+            coerce_float: decimalをfloatに変換する
+            parse_dates: 日付として読み込むカラム
+
+        Returns:
+            範囲ごとのDataFrameのジェネレータ
+        """
+        source = self._partition_source(table_name, query, schema, columns)
+        key = self._quote_identifier(key_column)
+        ranges, has_null = self.partition_bounds(key_column, table_name, query, params, schema, partitions, bounds)
+
+        args_list = [(lower, upper) for lower, upper in ranges]
+        if has_null:
+            args_list.append((None, None))
+        if not args_list:
+            return
+
+        def _read(lower, upper):
+            if lower is None:
+                condition = '{key} IS NULL'
+            elif upper is None:
+                condition = '{key} >= %(partition_lower)s'
+            else:
+                condition = '{key} >= %(partition_lower)s AND {key} < %(partition_upper)s'
+
+            range_query = ('SELECT * FROM ({source}) AS partition_source WHERE ' + condition +
+                           ' ORDER BY {key}').format(key=key, source=source)
+            range_params = dict(params or {}, partition_lower=lower, partition_upper=upper)
+            driver_query, driver_params = self._to_driver_query(range_query, range_params)
+
+            start_time = time.perf_counter()
+            dataframe = pd.read_sql_query(sql=driver_query,
+                                          con=self._read_pool().engine,
+                                          index_col=index_col,
+                                          coerce_float=coerce_float,
+                                          params=driver_params,
+                                          parse_dates=parse_dates)
+            query_tracer.get_tracer().record(range_query, (time.perf_counter() - start_time) * 1000, len(dataframe))
+            return dataframe
+
+        logger.info('read table in {} ranges by {}: {}'.format(len(args_list), key_column, table_name or query))
+
+        max_workers = max_workers or min(len(args_list), os.cpu_count() or 1)
+        yield from partition.iter_ordered(_read, args_list, max_workers, max_in_flight)
+
+    def read_table_parallel(self, key_column: str, table_name: str = None, query: str = None, params: dict = None,
+                            schema: str = None, columns: list = None, partitions: int = partition.DEFAULT_PARTITIONS,
+                            bounds: str = partition.BOUNDS_MINMAX, max_workers: int = None,
+                            max_in_flight: int = None, index_col=None, coerce_float=True,
+                            parse_dates=None) -> pd.DataFrame:
+        """iter_table_parallelで読み込んだDataFrameをキーの順に結合する
+
+        Args:
+            key_column: 分割に利用するカラム(日付、数値の主キーなど)
+            table_name: テーブル名
+            query: テーブルの代わりに分割するクエリ
+            params: クエリパラメタ(辞書)
+            schema: スキーマ
+            columns: 読み込むカラム(table_nameを指定した場合)
+            partitions: 分割数
+            bounds: minmax または quantile
+            max_workers: 並列に読み込むスレッド数
+            max_in_flight: 読み込み中、未取得のDataFrameの最大数
+            index_col: インデックスにするカラム
+            coerce_float: decimalをfloatに変換する
+            parse_dates: 日付として読み込むカラム
+
+        Returns:
+            DataFrame
+        """
+        dataframes = list(self.iter_table_parallel(key_column, table_name, query, params, schema, columns,
+                                                   partitions, bounds, max_workers, max_in_flight, index_col,
+                                                   coerce_float, parse_dates))
+        if not dataframes:
+            # 空の結果でもカラムを揃えるため、分割せずに読み込む
+            source = self._partition_source(table_name, query, schema, columns)
+            return self.read_table_by_query(source, index_col=index_col, coerce_float=coerce_float, params=params,
+                                            parse_dates=parse_dates)
+        return pd.concat(dataframes)
 
     def write_table(self, dataframe: pd.DataFrame,
                     table_name: str,
@@ -310,86 +900,958 @@ class DatabaseAccessor(metaclass=ABCMeta):
                          method=method
                          )
 
+        self._after_write(table_names=[table_name])
+
+    @staticmethod
+    def _to_bulk_rows(data: Union[pd.DataFrame, Iterable], columns: list = None, index: bool = True):
+        """バルクロードの対象データをカラム名と行のイテレータに変換する
+
+        Args:
+            data: DataFrameまたは行のイテレータ
+            columns: カラム名のリスト
+            index: DataFrameのインデックスをカラムとして含める
+
+        Returns:
+            カラム名のリスト, 行のイテレータ
+        """
+        if isinstance(data, pd.DataFrame):
+            dataframe_columns, rows = bulk_loader.dataframe_to_rows(data, index)
+            return columns or dataframe_columns, rows
+
+        return columns, iter(data)
+
+    @abstractmethod
+    def bulk_load(self, data: Union[pd.DataFrame, Iterable], table_name: str, columns: list = None,
+                  schema: str = None, index: bool = True,
+                  chunk_size: int = bulk_loader.DEFAULT_CHUNK_SIZE) -> bulk_loader.BulkLoadResult:
+        """データベースのネイティブなバルクロードでデータを投入する
+
+        Args:
+            data: DataFrameまたは行のイテレータ
+            table_name: テーブル名
+            columns: カラム名のリスト
+            schema: スキーマ
+            index: DataFrameのインデックスをカラムとして含める
+            chunk_size: 1チャンクの行数
+
+        Returns:
+            投入行数と処理時間
+        """
+        pass
+
+    @staticmethod
+    def _quote_identifier(identifier: str) -> str:
+        return '"{}"'.format(identifier.replace('"', '""'))
+
+    @classmethod
+    def _qualified_table_name(cls, table_name: str, schema: str = None) -> str:
+        table = cls._quote_identifier(table_name)
+        if schema:
+            table = '{}.{}'.format(cls._quote_identifier(schema), table)
+        return table
+
+    @abstractmethod
+    def _create_staging_table_query(self, staging_table_name: str, table_name: str, schema: str = None) -> str:
+        pass
+
+    @abstractmethod
+    def _drop_staging_table_query(self, staging_table_name: str) -> str:
+        pass
+
+    @abstractmethod
+    def _upsert_query(self, table_name: str, staging_table_name: str, columns: list, key_columns: list,
+                      update_columns: list, schema: str = None) -> str:
+        pass
+
+    def upsert_dataframe(self, data: Union[pd.DataFrame, Iterable], table_name: str, key_columns: list,
+                         columns: list = None, schema: str = None, index: bool = True, update_columns: list = None,
+                         chunk_size: int = bulk_loader.DEFAULT_CHUNK_SIZE) -> bulk_loader.BulkLoadResult:
+        """一時テーブルにバルクロードし、1回のINSERT ... SELECTでキーが重複する行を更新する
+
+        同じデータを再投入しても失敗しない。一時テーブルはコネクションに紐づくため、
+        作成から削除までを1つのトランザクション(ネストした場合はSAVEPOINT)で実行する。
+        DataFrame内でキーが重複する行は後の行を残す(1回のINSERTで同じ行を2回更新できないため)
+
+        Args:
+            data: DataFrameまたは行のイテレータ
+            table_name: テーブル名
+            key_columns: 主キー(一意制約)のカラム名のリスト
+            columns: カラム名のリスト(行のイテレータの場合は必須)
+            schema: スキーマ
+            index: DataFrameのインデックスをカラムとして含める
+            update_columns: キーが重複した場合に更新するカラム名のリスト(デフォルト: key_columns以外のすべて)
+            chunk_size: 1チャンクの行数
+
+        Returns:
+            投入行数と処理時間
+
+        Raises:
+            ValueError: カラム名が特定できない場合、行のイテレータのキーが重複する場合
+        """
+        start_time = time.perf_counter()
+
+        columns, rows = self._to_bulk_rows(data, columns, index)
+        if not columns:
+            raise ValueError('columns must be set to upsert {}'.format(table_name))
+        missing_key_columns = [column for column in key_columns if column not in columns]
+        if missing_key_columns:
+            raise ValueError('{} of key columns not exists in {}'.format(', '.join(missing_key_columns), columns))
+
+        key_positions = [columns.index(column) for column in key_columns]
+        if isinstance(data, pd.DataFrame):
+            data = self._drop_duplicate_keys(data, key_positions, index)
+            _, rows = self._to_bulk_rows(data, columns, index)
+        else:
+            rows = self._unique_key_rows(rows, key_positions, table_name)
+
+        if update_columns is None:
+            update_columns = [column for column in columns if column not in key_columns]
+
+        staging_table_name = 'staging_{}'.format(uuid.uuid4().hex)
+
+        with self.transaction():
+            self.execute(self._create_staging_table_query(staging_table_name, table_name, schema))
+            load_result = self.bulk_load(rows, staging_table_name, columns, chunk_size=chunk_size)
+
+            with self._cursor() as cur:
+                self._execute(cur, self._upsert_query(table_name, staging_table_name, columns, key_columns,
+                                                      update_columns, schema))
+
+            # エラー時はロールバックで一時テーブルも破棄される(MySQLはコネクションのクローズ時に破棄される)
+            self.execute(self._drop_staging_table_query(staging_table_name))
+
+        self._after_write(table_names=[table_name])
+
+        result = bulk_loader.BulkLoadResult(table_name=table_name,
+                                            row_count=load_result.row_count,
+                                            elapsed_seconds=time.perf_counter() - start_time)
+        logger.info('upsert {}: {} rows ({:.3f}s)'.format(table_name, result.row_count, result.elapsed_seconds))
+        return result
+
+    @staticmethod
+    def _drop_duplicate_keys(dataframe: pd.DataFrame, key_positions: list, index: bool = True) -> pd.DataFrame:
+        """キーが重複する行を後の行を残して削除する
+
+        Args:
+            dataframe: DataFrame
+            key_positions: バルクロードのカラムでのキーの位置のリスト
+            index: インデックスをカラムとして含める
+
+        Returns:
+            キーが一意のDataFrame
+        """
+        index_levels = dataframe.index.nlevels if index else 0
+        keys = pd.DataFrame({i: dataframe.index.get_level_values(position).to_numpy() if position < index_levels
+                             else dataframe.iloc[:, position - index_levels].to_numpy()
+                             for i, position in enumerate(key_positions)})
+        duplicated = keys.duplicated(keep='last').to_numpy()
+        if not duplicated.any():
+            return dataframe
+
+        logger.warning('dropped {} rows with duplicate keys'.format(int(duplicated.sum())))
+        return dataframe[~duplicated]
+
+    @staticmethod
+    def _unique_key_rows(rows, key_positions: list, table_name: str):
+        """行のイテレータのキーが重複していないことを確認しながら返却する
+
+        Args:
+            rows: 行のイテレータ
+            key_positions: キーの位置のリスト
+            table_name: テーブル名(エラーメッセージに利用する)
+
+        Returns:
+            行のジェネレータ
+
+        Raises:
+            ValueError: キーが重複する場合
+        """
+        keys = set()
+        for row in rows:
+            key = tuple(row[position] for position in key_positions)
+            if key in keys:
+                raise ValueError('duplicate key {} in rows to upsert {}'.format(key, table_name))
+            keys.add(key)
+            yield row
+
+    @abstractmethod
+    def _tables_exist_query(self, schema: str = None) -> str:
+        pass
+
+    def tables_exist(self, table_names: Iterable[str], schema: str = None) -> set:
+        """1回のクエリでテーブルの存在を確認する
+
+        結果はプロセス内で共有するカタログのキャッシュに保持し、create_tables、drop_tables、
+        DDLのexecuteで無効化する。トランザクション中はキャッシュを利用しない
+
+        Args:
+            table_names: テーブル名のリスト
+            schema: スキーマ(指定しない場合はすべてのスキーマ)
+
+        Returns:
+            存在するテーブル名の集合
+        """
+        table_names = list(dict.fromkeys(table_names))
+        use_cache = not self.in_transaction()
+
+        existing_tables = set()
+        missing_table_names = []
+        for table_name in table_names:
+            exists = self._catalog_cache.get((self._catalog_database, schema, table_name)) if use_cache else None
+            if exists is None:
+                missing_table_names.append(table_name)
+            elif exists:
+                existing_tables.add(table_name)
+
+        if not missing_table_names:
+            return existing_tables
+
+        params = {'table_names': missing_table_names, 'schema': schema}
+        # 読み込み先のレプリカに反映される前に作成、削除した場合に備えてプライマリで確認する
+        with self.use_primary():
+            rows = self.select_all(self._tables_exist_query(schema), params)
+        found_table_names = {row[0] for row in rows}
+
+        for table_name in missing_table_names:
+            exists = table_name in found_table_names
+            if use_cache:
+                self._catalog_cache.set((self._catalog_database, schema, table_name), exists)
+            if exists:
+                existing_tables.add(table_name)
+
+        return existing_tables
+
+    def table_exists(self, table_name: str, schema: str = None) -> bool:
+        return table_name in self.tables_exist([table_name], schema)
+
+    def create_tables(self, query: str, table_names: Iterable[str], raw_params: dict = None, schema: str = None):
+        """table_nameを設定したクエリで複数のテーブルを1つのトランザクションで作成する
+
+        Args:
+            query: CREATE TABLEのクエリ({{ table_name }}にテーブル名を設定する)
+            table_names: テーブル名のリスト
+            raw_params: table_name以外のformatで設定するパラメタ
+            schema: スキーマ(カタログのキャッシュの更新に利用する)
+
+        """
+        table_names = list(dict.fromkeys(table_names))
+
+        with self.transaction():
+            for table_name in table_names:
+                self.execute(query, raw_params=dict(raw_params or {}, table_name=table_name))
+
+        self._invalidate_catalog_cache(self._normalized_table_names(table_names, schema))
+
+    def drop_tables(self, table_names: Iterable[str], schema: str = None):
+        """DROP TABLE IF EXISTSで複数のテーブルを1つの文で削除する
+
+        Args:
+            table_names: テーブル名のリスト
+            schema: スキーマ
+
+        """
+        table_names = list(dict.fromkeys(table_names))
+        if not table_names:
+            return
+
+        with self.transaction():
+            self.execute('DROP TABLE IF EXISTS {}'.format(
+                ', '.join(self._qualified_table_name(table_name, schema) for table_name in table_names)))
+
+        self._invalidate_catalog_cache(self._normalized_table_names(table_names, schema))
+
+    def drop_table(self, table_names: Union[str, Iterable[str]], schema: str = None):
+        if type(table_names) is str:
+            table_names = [table_names]
+
+        self.drop_tables(table_names, schema)
+
+    def _normalized_table_names(self, table_names: list, schema: str = None) -> frozenset:
+        tables = set()
+        for table_name in table_names:
+            tables |= cache.normalize_table_name(self._qualified_table_name(table_name, schema))
+        return frozenset(tables)
+
     def close(self):
         """コネクションをクロースする
 
         """
         connection_pool.ConnectionPoolManager.close_connection_pool(self._connection_pool)
 
+        if self._replica_pool_set is not None:
+            for replica_connection_pool in self._replica_pool_set.connection_pools:
+                connection_pool.ConnectionPoolManager.close_connection_pool(replica_connection_pool)
+
 
 class PostgreSQLAccessor(DatabaseAccessor):
     """
     PostgreSQLのアクセスを行うクラス
     """
 
-    def __init__(self, sqlalchemy_connection_pool):
+    def __init__(self, sqlalchemy_connection_pool, **kwargs):
 
-        super().__init__(sqlalchemy_connection_pool)
+        super().__init__(sqlalchemy_connection_pool, **kwargs)
 
-        from psycopg2.extras import DictCursor
-        self._dict_cursor = {'cursor_factory': DictCursor}
+        from psycopg2.extras import NamedTupleCursor, RealDictCursor
+        # 行ごとにdictやnamedtupleを1回だけ作成するカーソルを利用する
+        self._row_cursors = {result_format.DICT: {'cursor_factory': RealDictCursor},
+                             result_format.NAMEDTUPLE: {'cursor_factory': NamedTupleCursor}}
 
-    def _execute(self, cur, query, params=None, raw_params=None):
-        if raw_params:
-            template_query = self._env.from_string(query)
-            query = template_query.render(raw_params)
+    def _server_side_cursor(self, row_format: str = result_format.TUPLE) -> dict:
+        """名前付きカーソル(サーバサイドカーソル)の引数を返却する
 
-        cur.execute(query, params)
-        logger.info('SQL: {}'.format(cur.query.decode()))
-        return cur
+        Args:
+            row_format: 行の形式
 
-    def drop_table(self, table_names):
+        Returns:
+            cursorの引数
+        """
+        server_side_cursor = {'name': 'select_iter_{}'.format(uuid.uuid4().hex)}
+        server_side_cursor.update(self._row_cursor(row_format) or {})
+        return server_side_cursor
 
-        if type(table_names) is str:
-            table_names = [table_names]
+    def _explain_prefix(self, query: str) -> Union[str, None]:
+        """SELECTはEXPLAIN (ANALYZE, BUFFERS)、更新系は実行しないEXPLAINで実行計画を取得する
 
-        for table_name in table_names:
-            self.execute('DROP TABLE IF EXISTS {table_name}', raw_params={'table_name': table_name})
+        Args:
+            query: クエリ
+
+        Returns:
+            EXPLAINの接頭辞(実行計画を取得しない場合はNone)
+        """
+        statement = query.lstrip()[:6].upper()
+        if statement == 'SELECT' or (statement.startswith('WITH') and cache.written_tables(query) == frozenset()):
+            return 'EXPLAIN (ANALYZE, BUFFERS) '
+        if statement in ('INSERT', 'UPDATE', 'DELETE'):
+            return 'EXPLAIN '
+        return None
+
+    # VALUES %s の形式、または VALUES (%s, %(name)s, ...) の形式のINSERT文
+    _VALUES_PLACEHOLDER_PATTERN = re.compile(r'VALUES\s*%s', re.IGNORECASE)
+    _VALUES_TEMPLATE_PATTERN = re.compile(r'VALUES\s*(\([^()]*\))', re.IGNORECASE)
+
+    def _executemany(self, cur, query, params, page_size):
+        """INSERT ... VALUESはexecute_valuesで複数行のVALUESにまとめ、それ以外はexecute_batchで実行する
+
+        execute_batchでは最後の文の行数しか取得できないため、行数は-1を返却する
+
+        Args:
+            cur: カーソル
+            query: クエリ
+            params: インサートのデータ
+            page_size: 1回のラウンドトリップで送る件数
+
+        Returns:
+            影響を受けた行数
+        """
+        from psycopg2.extras import execute_batch, execute_values
+
+        template = None
+        if not self._VALUES_PLACEHOLDER_PATTERN.search(query):
+            match = self._VALUES_TEMPLATE_PATTERN.search(query)
+            if match is None:
+                execute_batch(cur, query, params, page_size=page_size)
+                return -1
+
+            template = match.group(1)
+            query = query[:match.start(1)] + '%s' + query[match.end(1):]
+
+        rowcount = 0
+        for page in bulk_loader.iter_chunks(params, page_size):
+            execute_values(cur, query, page, template=template, page_size=len(page))
+            rowcount += cur.rowcount
+        return rowcount
+
+    def _create_staging_table_query(self, staging_table_name: str, table_name: str, schema: str = None) -> str:
+        # 制約はコピーしないため、一時テーブル内でキーが重複しても投入できる
+        return 'CREATE TEMPORARY TABLE {} (LIKE {} INCLUDING DEFAULTS)'.format(
+            self._quote_identifier(staging_table_name), self._qualified_table_name(table_name, schema))
+
+    def _drop_staging_table_query(self, staging_table_name: str) -> str:
+        return 'DROP TABLE {}'.format(self._quote_identifier(staging_table_name))
+
+    def _upsert_query(self, table_name: str, staging_table_name: str, columns: list, key_columns: list,
+                      update_columns: list, schema: str = None) -> str:
+        """INSERT ... ON CONFLICT DO UPDATEで一時テーブルの行を投入するクエリを作成する
+
+        Args:
+            table_name: テーブル名
+            staging_table_name: 一時テーブル名
+            columns: カラム名のリスト
+            key_columns: 主キー(一意制約)のカラム名のリスト
+            update_columns: キーが重複した場合に更新するカラム名のリスト
+            schema: スキーマ
+
+        Returns:
+            クエリ
+        """
+        column_list = ', '.join(map(self._quote_identifier, columns))
+        if update_columns:
+            action = 'DO UPDATE SET {}'.format(', '.join(
+                '{column} = EXCLUDED.{column}'.format(column=self._quote_identifier(column))
+                for column in update_columns))
+        else:
+            action = 'DO NOTHING'
+
+        return 'INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} ON CONFLICT ({keys}) {action}'.format(
+            table=self._qualified_table_name(table_name, schema),
+            columns=column_list,
+            staging=self._quote_identifier(staging_table_name),
+            keys=', '.join(map(self._quote_identifier, key_columns)),
+            action=action)
+
+    def bulk_load(self, data: Union[pd.DataFrame, Iterable], table_name: str, columns: list = None,
+                  schema: str = None, index: bool = True, chunk_size: int = bulk_loader.DEFAULT_CHUNK_SIZE,
+                  copy_format: str = 'text') -> bulk_loader.BulkLoadResult:
+        """COPY ... FROM STDINでデータを投入する
+
+        Args:
+            data: DataFrameまたは行のイテレータ
+            table_name: テーブル名
+            columns: カラム名のリスト
+            schema: スキーマ
+            index: DataFrameのインデックスをカラムとして含める
+            chunk_size: 1チャンクの行数
+            copy_format: COPYの形式(text または binary)
+
+        Returns:
+            投入行数と処理時間
+        """
+        from psycopg2 import sql
+
+        start_time = time.perf_counter()
+
+        columns, rows = self._to_bulk_rows(data, columns, index)
+        row_counter = bulk_loader.RowCounter(rows)
 
-    def table_exists(self, table_name):
+        if copy_format == 'text':
+            chunks = bulk_loader.encode_text_rows(row_counter, chunk_size)
+        elif copy_format == 'binary':
+            chunks = bulk_loader.encode_binary_rows(row_counter, chunk_size)
+        else:
+            raise ValueError('{} of copy format not exists'.format(copy_format))
 
-        row = self.select_one('SELECT * FROM information_schema.tables WHERE table_name = %(table_name)s',
-                              params={'table_name': table_name})
+        if schema:
+            table = sql.Identifier(schema, table_name)
+        else:
+            table = sql.Identifier(table_name)
 
-        if row:
-            return True
+        if columns:
+            column_list = sql.SQL('({})').format(sql.SQL(', ').join(map(sql.Identifier, columns)))
         else:
-            return False
+            column_list = sql.SQL('')
+
+        query = sql.SQL('COPY {} {} FROM STDIN WITH (FORMAT {})').format(table, column_list, sql.SQL(copy_format))
+
+        with self._cursor() as cur:
+            cur.copy_expert(query, bulk_loader.IteratorStream(chunks))
+
+        self._after_write(table_names=[table_name])
+
+        result = bulk_loader.BulkLoadResult(table_name=table_name,
+                                            row_count=row_counter.count,
+                                            elapsed_seconds=time.perf_counter() - start_time)
+        query_tracer.get_tracer().record('COPY "{}" FROM STDIN'.format(table_name), result.elapsed_seconds * 1000,
+                                         result.row_count)
+        logger.info('bulk load {}: {} rows ({:.3f}s)'.format(table_name, result.row_count, result.elapsed_seconds))
+        return result
+
+    def read_table_by_copy(self, query: str, params: Union[dict, list, tuple] = None, raw_params: dict = None,
+                           index_col=None, dtype=None, parse_dates=None, chunksize: int = None,
+                           as_numpy: bool = False):
+        """COPY (query) TO STDOUTのCSVをpandasのCパーサで型付きの列に変換する
+
+        pd.read_sql_queryのように行ごとのタプルを作らないため、大きなテーブルの読み込みが速い。
+        CSVではNULLと空文字を区別できないため、どちらも欠損値として読み込む
+
+        Args:
+            query: クエリ
+            params: クエリパラメタ
+            raw_params: formatで設定するパラメタ
+            index_col: インデックスにするカラム
+            dtype: カラムごとの型のヒント
+            parse_dates: 日付として読み込むカラム
+            chunksize: 指定した場合はchunksize行ごとのイテレータで返却する
+            as_numpy: DataFrameではなく{カラム名: numpy.ndarray}で返却する
+
+        Returns:
+            DataFrame、{カラム名: numpy.ndarray}、またはそれらのイテレータ
+        """
+        query = self.render_query(query, raw_params)
+        spool = tempfile.SpooledTemporaryFile(max_size=self.COPY_SPOOL_MAX_SIZE, mode='w+b')
+
+        try:
+            start_time = time.perf_counter()
+            with self._cursor(read=True) as cur:
+                if params:
+                    query = cur.mogrify(query, params).decode()
+                cur.copy_expert('COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER true)'.format(query), spool)
+            elapsed_seconds = time.perf_counter() - start_time
+            query_tracer.get_tracer().record('COPY ({}) TO STDOUT'.format(query), elapsed_seconds * 1000)
+            logger.info('read table by copy: {} bytes ({:.3f}s)'.format(spool.tell(), elapsed_seconds))
+            spool.seek(0)
+
+            result = pd.read_csv(spool, index_col=index_col, dtype=dtype, parse_dates=parse_dates or False,
+                                 chunksize=chunksize)
+        except BaseException:
+            spool.close()
+            raise
+
+        if chunksize:
+            return self._iter_copy_chunks(result, spool, as_numpy)
+
+        spool.close()
+        return self._to_numpy(result) if as_numpy else result
+
+    @classmethod
+    def _iter_copy_chunks(cls, reader, spool, as_numpy):
+        try:
+            for chunk in reader:
+                yield cls._to_numpy(chunk) if as_numpy else chunk
+        finally:
+            spool.close()
+
+    @staticmethod
+    def _to_numpy(dataframe: pd.DataFrame) -> dict:
+        return {column: dataframe[column].to_numpy() for column in dataframe.columns}
+
+    def _tables_exist_query(self, schema: str = None) -> str:
+        query = 'SELECT table_name FROM information_schema.tables WHERE table_name = ANY(%(table_names)s)'
+        if schema:
+            query += ' AND table_schema = %(schema)s'
+        return query
 
 
 class MySQLAccessor(DatabaseAccessor):
 
-    def __init__(self, sqlalchemy_connection_pool):
+    def __init__(self, sqlalchemy_connection_pool, **kwargs):
 
-        super().__init__(sqlalchemy_connection_pool)
+        super().__init__(sqlalchemy_connection_pool, **kwargs)
         from pymysql.cursors import DictCursor
-        self._dict_cursor = {'cursor': DictCursor}
+        # namedtupleのカーソルはないため、タプルで取得してキャッシュした行のクラスに変換する
+        self._row_cursors = {result_format.DICT: {'cursor': DictCursor}}
 
-    def _execute(self, cur, query, params=None, raw_params=None):
-        if raw_params:
-            template_query = self._env.from_string(query)
-            query = template_query.render(raw_params)
+    def _server_side_cursor(self, row_format: str = result_format.TUPLE) -> dict:
+        """SSCursor(アンバッファードカーソル)の引数を返却する
 
-        cur.execute(query, params)
-        logger.info('SQL: {}'.format(cur._executed))
-        return cur
+        途中でジェネレータをcloseした場合、残りの結果はコネクション返却時に読み捨てられる
 
-    def drop_table(self, table_names):
+        Args:
+            row_format: 行の形式
 
-        if type(table_names) is str:
-            table_names = [table_names]
+        Returns:
+            cursorの引数
+        """
+        from pymysql.cursors import SSCursor, SSDictCursor
+        if row_format == result_format.DICT:
+            return {'cursor': SSDictCursor}
+        return {'cursor': SSCursor}
 
-        for table_name in table_names:
-            self.execute('DROP TABLE IF EXISTS {table_name}', raw_params={'table_name': table_name})
+    def _explain_prefix(self, query: str) -> Union[str, None]:
+        """SELECT、更新系のクエリはEXPLAINで実行計画を取得する
+
+        Args:
+            query: クエリ
+
+        Returns:
+            EXPLAINの接頭辞(実行計画を取得しない場合はNone)
+        """
+        if query.lstrip()[:7].upper().rstrip() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE'):
+            return 'EXPLAIN '
+        return None
+
+    def _executemany(self, cur, query, params, page_size):
+        """page_size件ずつexecutemanyを実行する
+
+        PyMySQLはINSERT ... VALUESを複数行のVALUESにまとめて送信する
+
+        Args:
+            cur: カーソル
+            query: クエリ
+            params: インサートのデータ
+            page_size: 1回のラウンドトリップで送る件数
+
+        Returns:
+            影響を受けた行数
+        """
+        rowcount = 0
+        for page in bulk_loader.iter_chunks(params, page_size):
+            rowcount += cur.executemany(query, page) or 0
+        return rowcount
+
+    @staticmethod
+    def _quote_identifier(identifier):
+        return '`{}`'.format(identifier.replace('`', '``'))
+
+    @classmethod
+    def load_data_query(cls, table_name: str, columns: list = None, schema: str = None) -> str:
+        """タブ区切りのファイルを読み込むLOAD DATA LOCAL INFILE文を作成する
+
+        Args:
+            table_name: テーブル名
+            columns: カラム名のリスト
+            schema: スキーマ
+
+        Returns:
+            ファイル名をパラメタとするクエリ
+        """
+        table = cls._qualified_table_name(table_name, schema)
+
+        if columns:
+            column_list = '({})'.format(', '.join(map(cls._quote_identifier, columns)))
+        else:
+            column_list = ''
+
+        return ("LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' {columns}"
+                ).format(table=table, columns=column_list)
+
+    def _create_staging_table_query(self, staging_table_name: str, table_name: str, schema: str = None) -> str:
+        # 主キーもコピーされるため、一時テーブル内で重複したキーはLOAD DATA LOCALで読み飛ばされる
+        return 'CREATE TEMPORARY TABLE {} LIKE {}'.format(
+            self._quote_identifier(staging_table_name), self._qualified_table_name(table_name, schema))
+
+    def _drop_staging_table_query(self, staging_table_name: str) -> str:
+        return 'DROP TEMPORARY TABLE {}'.format(self._quote_identifier(staging_table_name))
+
+    def _upsert_query(self, table_name: str, staging_table_name: str, columns: list, key_columns: list,
+                      update_columns: list, schema: str = None) -> str:
+        """INSERT ... ON DUPLICATE KEY UPDATEで一時テーブルの行を投入するクエリを作成する
+
+        MySQLでは一意キーで重複を判定するため、key_columnsはクエリに含めない
+
+        Args:
+            table_name: テーブル名
+            staging_table_name: 一時テーブル名
+            columns: カラム名のリスト
+            key_columns: 主キー(一意制約)のカラム名のリスト
+            update_columns: キーが重複した場合に更新するカラム名のリスト
+            schema: スキーマ
+
+        Returns:
+            クエリ
+        """
+        column_list = ', '.join(map(self._quote_identifier, columns))
+        # 更新するカラムがない場合はキーを自身で更新し、重複した行を変更しない
+        assignments = ', '.join('{column} = VALUES({column})'.format(column=self._quote_identifier(column))
+                                for column in update_columns or key_columns[:1])
+
+        return ('INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} '
+                'ON DUPLICATE KEY UPDATE {assignments}').format(table=self._qualified_table_name(table_name, schema),
+                                                                columns=column_list,
+                                                                staging=self._quote_identifier(staging_table_name),
+                                                                assignments=assignments)
+
+    def bulk_load(self, data: Union[pd.DataFrame, Iterable], table_name: str, columns: list = None,
+                  schema: str = None, index: bool = True,
+                  chunk_size: int = bulk_loader.DEFAULT_CHUNK_SIZE) -> bulk_loader.BulkLoadResult:
+        """LOAD DATA LOCAL INFILEでデータを投入する
+
+        PyMySQLはLOCAL INFILEをファイルパスからしか読み込めないため、チャンクごとに一時ファイルへ書き出して投入する。
+        接続URLに local_infile=1 を設定する必要がある
+
+        Args:
+            data: DataFrameまたは行のイテレータ
+            table_name: テーブル名
+            columns: カラム名のリスト
+            schema: スキーマ
+            index: DataFrameのインデックスをカラムとして含める
+            chunk_size: 1チャンクの行数
+
+        Returns:
+            投入行数と処理時間
+        """
+        start_time = time.perf_counter()
+
+        columns, rows = self._to_bulk_rows(data, columns, index)
+        row_counter = bulk_loader.RowCounter(rows)
+        query = self.load_data_query(table_name, columns, schema)
+
+        with self._cursor() as cur:
+            for chunk in bulk_loader.encode_text_rows(row_counter, chunk_size):
+                with tempfile.NamedTemporaryFile(mode='wb', suffix='.tsv', delete=False) as fout:
+                    fout.write(chunk)
+                try:
+                    cur.execute(query, (fout.name,))
+                finally:
+                    os.remove(fout.name)
+
+        self._after_write(table_names=[table_name])
+
+        result = bulk_loader.BulkLoadResult(table_name=table_name,
+                                            row_count=row_counter.count,
+                                            elapsed_seconds=time.perf_counter() - start_time)
+        query_tracer.get_tracer().record(query, result.elapsed_seconds * 1000, result.row_count)
+        logger.info('bulk load {}: {} rows ({:.3f}s)'.format(table_name, result.row_count, result.elapsed_seconds))
+        return result
+
+    def _tables_exist_query(self, schema: str = None) -> str:
+        # PyMySQLはリストを(a, b, ...)に展開する
+        query = 'SELECT TABLE_NAME FROM information_schema.tables WHERE table_name IN %(table_names)s'
+        if schema:
+            query += ' AND table_schema = %(schema)s'
+        return query
+
+
+class SQLiteAccessor(DatabaseAccessor):
+    """
+    組み込みのSQLiteのアクセスを行うクラス
 
-    def table_exists(self, table_name):
-        row = self.select_one('SELECT TABLE_NAME FROM information_schema.tables WHERE table_name= %(table_name)s',
-                              params={'table_name': table_name})
+    クエリはPostgreSQL、MySQLと同じ%s、%(name)s形式のパラメタで記述し、sqlite3の形式に変換して実行する
+    """
+
+    # %(name)s、%s、%%(パラメタを指定した場合は%をエスケープする)
+    _PARAM_PATTERN = re.compile(r'%\((\w+)\)s|%s|%%')
+    _NAMED_PLACEHOLDER = ':{}'
+
+    def _to_driver_query(self, query: str, params=None) -> tuple:
+        """%s、%(name)s形式のパラメタを?、:name形式に変換する
+
+        PyMySQLと同様に、リスト、タプルの値は(?, ?, ...)に展開する
+
+        Args:
+            query: レンダリング後のクエリ
+            params: クエリパラメタ
+
+        Returns:
+            クエリ, クエリパラメタ
+        """
+        if params is None:
+            return query, ()
+
+        if isinstance(params, dict):
+            driver_params = {}
+
+            def _replace(match):
+                if match.group(0) == '%%':
+                    return '%'
+                if match.group(0) == '%s':
+                    raise ValueError('%s can not be used with dict params')
+                name = match.group(1)
+                value = params[name]
+                if isinstance(value, (list, tuple, set, frozenset)):
+                    names = ['{}_{}'.format(name, i) for i in range(len(value))]
+                    driver_params.update(zip(names, value))
+                    return '({})'.format(', '.join(self._NAMED_PLACEHOLDER.format(n) for n in names))
+                driver_params[name] = value
+                return self._NAMED_PLACEHOLDER.format(name)
+
+            return self._PARAM_PATTERN.sub(_replace, query), driver_params
+
+        return self._PARAM_PATTERN.sub(lambda match: '%' if match.group(0) == '%%' else '?', query), tuple(params)
+
+    def _server_side_cursor(self, row_format: str = result_format.TUPLE) -> dict:
+        # sqlite3のカーソルはfetchmanyで逐次読み込むため、通常のカーソルを利用する
+        return {}
+
+    def _explain_prefix(self, query: str) -> Union[str, None]:
+        if query.lstrip()[:7].upper().rstrip() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE'):
+            return 'EXPLAIN QUERY PLAN '
+        return None
+
+    def _executemany(self, cur, query, params, page_size):
+        """page_size件ずつexecutemanyを実行する
+
+        Args:
+            cur: カーソル
+            query: クエリ
+            params: インサートのデータ
+            page_size: 1回に実行する件数
+
+        Returns:
+            影響を受けた行数
+        """
+        rowcount = 0
+        for page in bulk_loader.iter_chunks(params, page_size):
+            driver_query, _ = self._to_driver_query(query, page[0])
+            cur.executemany(driver_query, [self._to_driver_query(query, row)[1] for row in page])
+            rowcount += max(cur.rowcount, 0)
+        return rowcount
+
+    def _insert_query(self, table_name: str, columns: list, schema: str = None) -> str:
+        return 'INSERT INTO {} ({}) VALUES ({})'.format(self._qualified_table_name(table_name, schema),
+                                                        ', '.join(map(self._quote_identifier, columns)),
+                                                        ', '.join(['?'] * len(columns)))
+
+    def bulk_load(self, data: Union[pd.DataFrame, Iterable], table_name: str, columns: list = None,
+                  schema: str = None, index: bool = True,
+                  chunk_size: int = bulk_loader.DEFAULT_CHUNK_SIZE) -> bulk_loader.BulkLoadResult:
+        """1つのトランザクションでchunk_size件ずつexecutemanyを実行してデータを投入する
+
+        Args:
+            data: DataFrameまたは行のイテレータ
+            table_name: テーブル名
+            columns: カラム名のリスト(行のイテレータの場合は必須)
+            schema: スキーマ(ATTACHしたデータベース名)
+            index: DataFrameのインデックスをカラムとして含める
+            chunk_size: 1チャンクの行数
+
+        Returns:
+            投入行数と処理時間
+        """
+        start_time = time.perf_counter()
+
+        columns, rows = self._to_bulk_rows(data, columns, index)
+        if not columns:
+            raise ValueError('columns must be set to bulk load {}'.format(table_name))
+        row_counter = bulk_loader.RowCounter(bulk_loader.to_python_rows(rows))
+        query = self._insert_query(table_name, columns, schema)
+
+        with self._cursor() as cur:
+            for chunk in bulk_loader.iter_chunks(row_counter, chunk_size):
+                cur.executemany(query, chunk)
+
+        self._after_write(table_names=[table_name])
+
+        result = bulk_loader.BulkLoadResult(table_name=table_name,
+                                            row_count=row_counter.count,
+                                            elapsed_seconds=time.perf_counter() - start_time)
+        query_tracer.get_tracer().record(query, result.elapsed_seconds * 1000, result.row_count)
+        logger.info('bulk load {}: {} rows ({:.3f}s)'.format(table_name, result.row_count, result.elapsed_seconds))
+        return result
+
+    def _create_staging_table_query(self, staging_table_name: str, table_name: str, schema: str = None) -> str:
+        # 制約はコピーしないため、一時テーブル内でキーが重複しても投入できる
+        return 'CREATE TEMPORARY TABLE {} AS SELECT * FROM {} LIMIT 0'.format(
+            self._quote_identifier(staging_table_name), self._qualified_table_name(table_name, schema))
+
+    def _drop_staging_table_query(self, staging_table_name: str) -> str:
+        return 'DROP TABLE {}'.format(self._quote_identifier(staging_table_name))
+
+    def _upsert_query(self, table_name: str, staging_table_name: str, columns: list, key_columns: list,
+                      update_columns: list, schema: str = None) -> str:
+        """INSERT ... ON CONFLICT DO UPDATEで一時テーブルの行を投入するクエリを作成する
+
+        Args:
+            table_name: テーブル名
+            staging_table_name: 一時テーブル名
+            columns: カラム名のリスト
+            key_columns: 主キー(一意制約)のカラム名のリスト
+            update_columns: キーが重複した場合に更新するカラム名のリスト
+            schema: スキーマ
 
-        if row:
-            return True
+        Returns:
+            クエリ
+        """
+        column_list = ', '.join(map(self._quote_identifier, columns))
+        if update_columns:
+            action = 'DO UPDATE SET {}'.format(', '.join(
+                '{column} = excluded.{column}'.format(column=self._quote_identifier(column))
+                for column in update_columns))
         else:
-            return False
+            action = 'DO NOTHING'
+
+        # SQLiteではSELECTの後のONを結合条件と区別するためにWHEREが必要
+        return ('INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} WHERE true '
+                'ON CONFLICT ({keys}) {action}').format(table=self._qualified_table_name(table_name, schema),
+                                                        columns=column_list,
+                                                        staging=self._quote_identifier(staging_table_name),
+                                                        keys=', '.join(map(self._quote_identifier, key_columns)),
+                                                        action=action)
+
+    def _tables_exist_query(self, schema: str = None) -> str:
+        master = '{}.sqlite_master'.format(self._quote_identifier(schema)) if schema else 'sqlite_master'
+        return "SELECT name FROM {} WHERE type = 'table' AND name IN %(table_names)s".format(master)
+
+    def drop_tables(self, table_names: Iterable[str], schema: str = None):
+        """テーブルを1つのトランザクションで削除する
+
+        SQLite、DuckDBのDROP TABLEは1つのテーブルしか指定できないため、テーブルごとに実行する
+
+        Args:
+            table_names: テーブル名のリスト
+            schema: スキーマ
+
+        """
+        table_names = list(dict.fromkeys(table_names))
+
+        with self.transaction():
+            for table_name in table_names:
+                self.execute('DROP TABLE IF EXISTS {}'.format(self._qualified_table_name(table_name, schema)))
+
+        self._invalidate_catalog_cache(self._normalized_table_names(table_names, schema))
+
+
+class DuckDBAccessor(SQLiteAccessor):
+    """
+    組み込みのDuckDBのアクセスを行うクラス(duckdb、duckdb_engineが必要)
+
+    パラメタの変換、一時テーブル経由のupsertはSQLiteAccessorと共通で、DataFrameのバルクロードは
+    DataFrameを直接参照するINSERT ... SELECTで行う
+    """
+
+    _NAMED_PLACEHOLDER = '${}'
+
+    def __init__(self, sqlalchemy_connection_pool, **kwargs):
+
+        super().__init__(sqlalchemy_connection_pool, **kwargs)
+
+        import duckdb  # noqa: F401
+
+    def _explain_prefix(self, query: str) -> Union[str, None]:
+        # DuckDBはSAVEPOINTに対応していないため、実行計画の取得は行わない
+        return None
+
+    def _begin(self, connection):
+        # DuckDBのDBAPIのコネクションは自動コミットのため、明示的にトランザクションを開始する
+        cur = connection.cursor()
+        cur.execute('BEGIN TRANSACTION')
+        cur.close()
+
+    def bulk_load(self, data: Union[pd.DataFrame, Iterable], table_name: str, columns: list = None,
+                  schema: str = None, index: bool = True,
+                  chunk_size: int = bulk_loader.DEFAULT_CHUNK_SIZE) -> bulk_loader.BulkLoadResult:
+        """DataFrameはDuckDBに登録して列指向のまま1回のINSERT ... SELECTで投入する
+
+        行のイテレータの場合はSQLiteAccessorと同様にexecutemanyで投入する
+
+        Args:
+            data: DataFrameまたは行のイテレータ
+            table_name: テーブル名
+            columns: カラム名のリスト
+            schema: スキーマ
+            index: DataFrameのインデックスをカラムとして含める
+            chunk_size: 1チャンクの行数(行のイテレータの場合)
+
+        Returns:
+            投入行数と処理時間
+        """
+        if not isinstance(data, pd.DataFrame):
+            return super().bulk_load(data, table_name, columns, schema, index, chunk_size)
+
+        start_time = time.perf_counter()
+
+        dataframe = data.reset_index() if index else data
+        dataframe_columns = [str(column) for column in dataframe.columns]
+        columns = columns or dataframe_columns
+        view_name = 'bulk_load_{}'.format(uuid.uuid4().hex)
+        query = 'INSERT INTO {} ({}) SELECT {} FROM {}'.format(
+            self._qualified_table_name(table_name, schema),
+            ', '.join(map(self._quote_identifier, columns)),
+            ', '.join(map(self._quote_identifier, dataframe_columns)),
+            self._quote_identifier(view_name))
+
+        with self._cursor() as cur:
+            cur.register(view_name, dataframe)
+            try:
+                cur.execute(query)
+            finally:
+                cur.unregister(view_name)
+
+        self._after_write(table_names=[table_name])
+
+        result = bulk_loader.BulkLoadResult(table_name=table_name,
+                                            row_count=len(dataframe),
+                                            elapsed_seconds=time.perf_counter() - start_time)
+        query_tracer.get_tracer().record(query, result.elapsed_seconds * 1000, result.row_count)
+        logger.info('bulk load {}: {} rows ({:.3f}s)'.format(table_name, result.row_count, result.elapsed_seconds))
+        return result
+
+    def _tables_exist_query(self, schema: str = None) -> str:
+        query = 'SELECT table_name FROM information_schema.tables WHERE table_name IN %(table_names)s'
+        if schema:
+            query += ' AND table_schema = %(schema)s'
+        return query
 
 
 class DatabaseAccessorFactory(object):
@@ -399,13 +1861,25 @@ class DatabaseAccessorFactory(object):
     def create(cls, **kwargs):
         rdbms = kwargs.pop('rdbms')
         rdbms = rdbms.lower()
-        cls._lock.acquire()
-        pool = connection_pool.ConnectionPoolManager.get_or_create_connection_pool(**kwargs)
-        cls._lock.release()
+        replica_urls = kwargs.pop('replica_urls', None)
+        replica_selection = kwargs.pop('replica_selection', None) or 'round_robin'
+        read_your_writes = kwargs.pop('read_your_writes', False)
+        with cls._lock:
+            pool = connection_pool.ConnectionPoolManager.get_or_create_connection_pool(**kwargs)
+            if replica_urls:
+                replica_pool_set = connection_pool.ConnectionPoolManager.get_or_create_replica_pool_set(
+                    replica_urls, kwargs.get('max_overflow'), kwargs.get('pool_size'), replica_selection)
+            else:
+                replica_pool_set = None
+        accessor_kwargs = {'replica_pool_set': replica_pool_set, 'read_your_writes': read_your_writes}
         if rdbms == 'postgresql':
-            return PostgreSQLAccessor(pool)
+            return PostgreSQLAccessor(pool, **accessor_kwargs)
         elif rdbms == 'mysql':
-            return MySQLAccessor(pool)
+            return MySQLAccessor(pool, **accessor_kwargs)
+        elif rdbms == 'sqlite':
+            return SQLiteAccessor(pool, **accessor_kwargs)
+        elif rdbms == 'duckdb':
+            return DuckDBAccessor(pool, **accessor_kwargs)
         elif rdbms is None:
             raise KeyError('rdbms does not set')
         else:
@@ -0,0 +1,87 @@
+import collections
+import datetime
+import decimal
+import numbers
+from concurrent import futures
+
+BOUNDS_MINMAX = 'minmax'
+BOUNDS_QUANTILE = 'quantile'
+
+DEFAULT_PARTITIONS = 4
+
+
+def split_range(lower, upper, partitions: int) -> list:
+    """最小値と最大値の間をpartitions個の等間隔の範囲に分割する
+
+    Args:
+        lower: 最小値(数値、日付、日時)
+        upper: 最大値
+        partitions: 分割数
+
+    Returns:
+        各範囲の下限値のリスト(重複は除く)
+
+    Raises:
+        TypeError: 分割できない型の場合
+    """
+    if lower is None or upper is None:
+        return []
+    if lower == upper or partitions <= 1:
+        return [lower]
+
+    if isinstance(lower, bool):
+        raise TypeError('{} can not be split into ranges'.format(type(lower).__name__))
+    if isinstance(lower, numbers.Integral):
+        bounds = [lower + (upper - lower) * i // partitions for i in range(partitions)]
+    elif isinstance(lower, (numbers.Real, decimal.Decimal, datetime.datetime)):
+        bounds = [lower + (upper - lower) * i / partitions for i in range(partitions)]
+    elif isinstance(lower, datetime.date):
+        days = (upper - lower).days
+        bounds = [lower + datetime.timedelta(days=days * i // partitions) for i in range(partitions)]
+    else:
+        raise TypeError('{} can not be split into ranges, use quantile bounds'.format(type(lower).__name__))
+
+    return sorted(set(bounds))
+
+
+def to_ranges(bounds: list) -> list:
+    """下限値のリストを(下限, 上限)のリストに変換する。最後の範囲の上限はNone
+
+    Args:
+        bounds: 昇順の下限値のリスト
+
+    Returns:
+        (下限, 上限)のリスト
+    """
+    return list(zip(bounds, bounds[1:] + [None]))
+
+
+def iter_ordered(function, args_list: list, max_workers: int, max_in_flight: int = None):
+    """スレッドプールで並列に実行し、結果を引数の順に返却する
+
+    未取得の結果はmax_in_flight件までとし、呼び出し元が読み進めるまで次の実行を待たせる
+
+    Args:
+        function: 実行する関数
+        args_list: 関数の引数のリスト
+        max_workers: スレッド数
+        max_in_flight: 実行中、未取得の結果の最大数(デフォルト: max_workers)
+
+    Returns:
+        結果のジェネレータ
+    """
+    max_in_flight = max(max_in_flight or max_workers, 1)
+
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = collections.deque()
+        try:
+            for args in args_list:
+                if len(pending) >= max_in_flight:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(function, *args))
+
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
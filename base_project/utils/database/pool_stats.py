@@ -0,0 +1,143 @@
+import bisect
+import threading
+import time
+import weakref
+
+# チェックアウト待ち時間のヒストグラムの境界(ミリ秒)
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class LatencyHistogram(object):
+    """
+    待ち時間のヒストグラム
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        """コンストラクタ
+
+        Args:
+            buckets: バケットの上限値(ミリ秒)のリスト
+        """
+        self._buckets = tuple(buckets)
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def observe(self, milliseconds: float):
+        self._counts[bisect.bisect_left(self._buckets, milliseconds)] += 1
+        self._count += 1
+        self._total += milliseconds
+        self._max = max(self._max, milliseconds)
+
+    def to_dict(self) -> dict:
+        labels = ['<={}ms'.format(bucket) for bucket in self._buckets] + ['>{}ms'.format(self._buckets[-1])]
+        return {
+            'count': self._count,
+            'mean_ms': self._total / self._count if self._count else 0.0,
+            'max_ms': self._max,
+            'buckets': dict(zip(labels, self._counts))
+        }
+
+
+def pool_status(pool, name: str) -> int:
+    """プールの状態を取得する。StaticPoolなど状態を持たないプールの場合は0を返却する
+
+    Args:
+        pool: sqlalchemy.pool.Pool
+        name: size、checkedout、overflow、checkedin のいずれか
+
+    Returns:
+        状態の値
+    """
+    method = getattr(pool, name, None)
+    return method() if method is not None else 0
+
+
+class PoolStats(object):
+    """
+    sqlalchemyのプールイベントからコネクションプールの利用状況を集計するクラス
+    """
+
+    def __init__(self, pool):
+        """コンストラクタ
+
+        Args:
+            pool: sqlalchemy.pool.QueuePool
+        """
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._checkout_latency = LatencyHistogram()
+        self._records = weakref.WeakSet()
+        self._connections_created = 0
+        self._checkouts = 0
+        self._wait_timeouts = 0
+        self._peak_checked_out = 0
+
+    def listen(self, engine):
+        """エンジンのプールイベントに集計処理を登録する
+
+        Args:
+            engine: sqlalchemy.engine.Engine
+
+        """
+        from sqlalchemy import event
+
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'close', self._on_close)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        connection_record.info['created_at'] = time.monotonic()
+        with self._lock:
+            self._connections_created += 1
+            self._records.add(connection_record)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self._checkouts += 1
+            self._peak_checked_out = max(self._peak_checked_out, pool_status(self._pool, 'checkedout'))
+
+    def _on_close(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._records.discard(connection_record)
+
+    def observe_checkout(self, milliseconds: float):
+        """コネクション取得までの待ち時間を記録する
+
+        Args:
+            milliseconds: 待ち時間(ミリ秒)
+
+        """
+        with self._lock:
+            self._checkout_latency.observe(milliseconds)
+
+    def observe_wait_timeout(self):
+        with self._lock:
+            self._wait_timeouts += 1
+
+    def stats(self) -> dict:
+        """コネクションプールの統計情報を返却する
+
+        Returns:
+            統計情報の辞書
+        """
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - record.info['created_at'] for record in self._records if 'created_at' in record.info]
+            return {
+                'pool_size': pool_status(self._pool, 'size'),
+                'checked_out': pool_status(self._pool, 'checkedout'),
+                'peak_checked_out': self._peak_checked_out,
+                'overflow': max(pool_status(self._pool, 'overflow'), 0),
+                'checked_in': pool_status(self._pool, 'checkedin'),
+                'connections_created': self._connections_created,
+                'checkouts': self._checkouts,
+                'wait_timeouts': self._wait_timeouts,
+                'checkout_latency': self._checkout_latency.to_dict(),
+                'connection_age': {
+                    'count': len(ages),
+                    'mean_seconds': sum(ages) / len(ages) if ages else 0.0,
+                    'max_seconds': max(ages) if ages else 0.0
+                }
+            }
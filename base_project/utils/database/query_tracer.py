@@ -0,0 +1,188 @@
+import logging
+import random
+import re
+import threading
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+_COMMENT_PATTERN = re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL)
+_STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+_QUOTED_IDENTIFIER_PATTERN = re.compile(r'"(?:[^"]|"")*"|`[^`]*`')
+_NUMBER_PATTERN = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_PATTERN = re.compile(r'%\(\w+\)s|%s|\$\d+')
+_LIST_PATTERN = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def fingerprint(query: str) -> str:
+    """クエリのリテラル、パラメタ、引用符付きの識別子を?に置き換えて正規化する
+
+    銘柄ごとのテーブル("AAPL"など)に対する同じクエリは同じフィンガープリントになる
+
+    Args:
+        query: クエリ
+
+    Returns:
+        正規化したクエリ
+    """
+    query = _COMMENT_PATTERN.sub(' ', query)
+    query = _STRING_PATTERN.sub('?', query)
+    query = _QUOTED_IDENTIFIER_PATTERN.sub('?', query)
+    query = _PLACEHOLDER_PATTERN.sub('?', query)
+    query = _NUMBER_PATTERN.sub('?', query)
+    query = _LIST_PATTERN.sub('(?)', query)
+    return _WHITESPACE_PATTERN.sub(' ', query).strip().lower()
+
+
+@dataclass
+class StatementStats:
+    """
+    フィンガープリントごとの実行統計
+    """
+    count: int = 0
+    rows: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    samples: list = field(default_factory=list)
+
+    def add(self, duration_ms: float, rowcount: int, max_samples: int):
+        self.count += 1
+        self.rows += max(rowcount or 0, 0)
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+        # パーセンタイル算出用の実行時間はリザーバサンプリングで上限件数だけ保持する
+        if len(self.samples) < max_samples:
+            self.samples.append(duration_ms)
+        else:
+            index = random.randrange(self.count)
+            if index < max_samples:
+                self.samples[index] = duration_ms
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        return samples[min(int(round(q * (len(samples) - 1))), len(samples) - 1)]
+
+
+class QueryTracer(object):
+    """
+    クエリの実行時間、行数をフィンガープリントごとに集計し、スロークエリを記録するクラス
+    """
+
+    def __init__(self, sample_rate: float = 1.0, slow_query_ms: float = 1000.0, explain: bool = False,
+                 max_samples: int = 1024):
+        """コンストラクタ
+
+        Args:
+            sample_rate: 集計するクエリの割合(スロークエリは常に集計する)
+            slow_query_ms: スロークエリとみなす実行時間(ミリ秒)
+            explain: スロークエリの実行計画を取得する
+            max_samples: パーセンタイル算出に保持する実行時間の件数
+        """
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.configure(sample_rate, slow_query_ms, explain, max_samples)
+
+    def configure(self, sample_rate: float = None, slow_query_ms: float = None, explain: bool = None,
+                  max_samples: int = None):
+        """設定を変更する
+
+        Args:
+            sample_rate: 集計するクエリの割合(スロークエリは常に集計する)
+            slow_query_ms: スロークエリとみなす実行時間(ミリ秒)
+            explain: スロークエリの実行計画を取得する
+            max_samples: パーセンタイル算出に保持する実行時間の件数
+
+        """
+        if sample_rate is not None:
+            self.sample_rate = float(sample_rate)
+        if slow_query_ms is not None:
+            self.slow_query_ms = float(slow_query_ms)
+        if explain is not None:
+            self.explain = bool(explain)
+        if max_samples is not None:
+            self.max_samples = int(max_samples)
+
+    def is_slow(self, duration_ms: float) -> bool:
+        return duration_ms >= self.slow_query_ms
+
+    def record(self, query: str, duration_ms: float, rowcount: int = None, plan: str = None):
+        """クエリの実行結果を記録する
+
+        Args:
+            query: クエリ
+            duration_ms: 実行時間(ミリ秒)
+            rowcount: 行数
+            plan: 実行計画
+
+        """
+        slow = self.is_slow(duration_ms)
+        if not slow and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+
+        key = fingerprint(query)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats()
+            stats.add(duration_ms, rowcount, self.max_samples)
+
+        logger.debug('SQL({:.1f}ms, {} rows): {}'.format(duration_ms, rowcount, query))
+        if slow:
+            if plan:
+                logger.warning('slow query({:.1f}ms): {}\n{}'.format(duration_ms, query, plan))
+            else:
+                logger.warning('slow query({:.1f}ms): {}'.format(duration_ms, query))
+
+    def summary(self) -> list:
+        """フィンガープリントごとの集計結果を合計時間の降順で返却する
+
+        Returns:
+            集計結果の辞書のリスト
+        """
+        with self._lock:
+            items = list(self._stats.items())
+
+        summary = [{'fingerprint': key,
+                    'count': stats.count,
+                    'rows': stats.rows,
+                    'total_ms': stats.total_ms,
+                    'p50_ms': stats.percentile(0.5),
+                    'p95_ms': stats.percentile(0.95),
+                    'max_ms': stats.max_ms} for key, stats in items]
+        return sorted(summary, key=lambda x: x['total_ms'], reverse=True)
+
+    def log_summary(self, reset: bool = True):
+        """集計結果をログに出力する
+
+        Args:
+            reset: 出力後に集計結果をクリアする
+
+        """
+        summary = self.summary()
+        if summary:
+            logger.info('SQL summary (sample rate: {})'.format(self.sample_rate))
+            for stats in summary:
+                logger.info('count={count} rows={rows} total={total_ms:.1f}ms p50={p50_ms:.1f}ms '
+                            'p95={p95_ms:.1f}ms max={max_ms:.1f}ms : {fingerprint}'.format(**stats))
+        if reset:
+            self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+_tracer = QueryTracer()
+
+
+def get_tracer() -> QueryTracer:
+    """プロセス内で共有するトレーサを取得する
+
+    Returns:
+        QueryTracer
+    """
+    return _tracer
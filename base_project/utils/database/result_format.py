@@ -0,0 +1,96 @@
+import collections
+import functools
+
+TUPLE = 'tuple'
+NAMEDTUPLE = 'namedtuple'
+DICT = 'dict'
+COLUMNS = 'columns'
+
+ROW_FORMATS = (TUPLE, NAMEDTUPLE, DICT, COLUMNS)
+
+
+def resolve(row_format: str = None, to_dict: bool = False) -> str:
+    """行の形式を決定する
+
+    Args:
+        row_format: tuple、namedtuple、dict、columns のいずれか
+        to_dict: row_formatを指定しない場合にdictとする(後方互換のための引数)
+
+    Returns:
+        行の形式
+
+    Raises:
+        ValueError: 存在しない形式の場合
+    """
+    if row_format is None:
+        return DICT if to_dict else TUPLE
+    if row_format not in ROW_FORMATS:
+        raise ValueError('{} of row format not exists'.format(row_format))
+    return row_format
+
+
+def column_names(description) -> tuple:
+    return tuple(column[0] for column in description or ())
+
+
+@functools.lru_cache(maxsize=1024)
+def record_class(columns: tuple):
+    """カラム名の組み合わせごとにキャッシュした行のクラス(__slots__のみを持つnamedtuple)を返却する
+
+    Args:
+        columns: カラム名のタプル
+
+    Returns:
+        namedtupleのクラス
+    """
+    return collections.namedtuple('Record', columns, rename=True)
+
+
+def convert_rows(rows: list, description, row_format: str):
+    """カーソルから取得した行をrow_formatの形式に変換する
+
+    ドライバのカーソルで既に変換済みの行はそのまま返却する
+
+    Args:
+        rows: 行のリスト
+        description: cursor.description
+        row_format: 行の形式
+
+    Returns:
+        行のリスト、またはcolumnsの場合は{カラム名: 値のリスト}
+    """
+    if row_format == COLUMNS:
+        columns = column_names(description)
+        if not rows:
+            return {column: [] for column in columns}
+        return {column: list(values) for column, values in zip(columns, zip(*rows))}
+
+    if not rows:
+        return rows
+
+    if row_format == NAMEDTUPLE and not hasattr(rows[0], '_fields'):
+        make = record_class(column_names(description))._make
+        return [make(row) for row in rows]
+    if row_format == DICT and not isinstance(rows[0], dict):
+        columns = column_names(description)
+        return [dict(zip(columns, row)) for row in rows]
+    return rows
+
+
+def convert_row(row, description, row_format: str):
+    """カーソルから取得した1行をrow_formatの形式に変換する
+
+    Args:
+        row: 行(存在しない場合はNone)
+        description: cursor.description
+        row_format: 行の形式
+
+    Returns:
+        行、またはcolumnsの場合は{カラム名: 値のリスト}
+    """
+    rows = [] if row is None else [row]
+    if row_format == COLUMNS:
+        return convert_rows(rows, description, row_format)
+    if row is None:
+        return None
+    return convert_rows(rows, description, row_format)[0]
@@ -1,7 +1,296 @@
+import collections
+import logging
+import random
+import threading
+import time
+from urllib import parse
+
+import pandas as pd
 import pandas_datareader as pdr
+import requests
+from requests import adapters
+
+from base_project import config
+from base_project.utils import market_data_cache
+
+logger = logging.getLogger(__name__)
+
+# 複数銘柄を1回のリクエストで取得できるデータソース
+BATCH_DATA_SOURCES = ('yahoo',)
+DEFAULT_BATCH_SIZE = 50
+# 共有するHTTPセッションのホストごとのコネクション数
+HTTP_POOL_SIZE = 16
+# リトライするHTTPステータス
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+_cache = None
+_cache_unavailable = False
+_cache_lock = threading.Lock()
+
+
+class TokenBucket(object):
+    """
+    トークンバケットによるスレッドセーフなレート制限
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """コンストラクタ
+
+        Args:
+            rate: 1秒あたりに補充するトークン数(リクエスト数)
+            capacity: バケットの容量(連続して送れるリクエスト数)
+        """
+        self._rate = float(rate)
+        self._capacity = max(float(capacity), 1.0)
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """トークンを1つ取得する。不足している場合は補充されるまで待つ
+
+        Returns:
+            待った時間(秒)
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+            waited += wait
+
+
+class LatencyStats(object):
+    """
+    ホストごとのリクエストの件数、エラー数、リトライ数、レイテンシを集計するクラス
+    """
+
+    def __init__(self, max_samples: int = 1024):
+        self._max_samples = max_samples
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, host: str, seconds: float, status=None, retried: bool = False):
+        with self._lock:
+            stats = self._stats.setdefault(host, {'count': 0, 'errors': 0, 'retries': 0, 'total': 0.0,
+                                                  'max': 0.0, 'samples': collections.deque(maxlen=self._max_samples)})
+            stats['count'] += 1
+            stats['errors'] += 0 if isinstance(status, int) and status < 400 else 1
+            stats['retries'] += 1 if retried else 0
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            stats['samples'].append(seconds)
+
+    def summary(self) -> dict:
+        """ホストごとの集計結果を返却する
+
+        Returns:
+            {ホスト: {'count', 'errors', 'retries', 'mean', 'p50', 'p95', 'max'}}(時間は秒)
+        """
+        with self._lock:
+            items = [(host, dict(stats, samples=sorted(stats['samples']))) for host, stats in self._stats.items()]
+
+        summary = {}
+        for host, stats in items:
+            samples = stats['samples']
+            summary[host] = {'count': stats['count'], 'errors': stats['errors'], 'retries': stats['retries'],
+                             'mean': stats['total'] / stats['count'],
+                             'p50': samples[int(round(0.5 * (len(samples) - 1)))],
+                             'p95': samples[int(round(0.95 * (len(samples) - 1)))],
+                             'max': stats['max']}
+        return summary
+
+    def log_summary(self):
+        for host, stats in self.summary().items():
+            logger.info('{host}: count={count} errors={errors} retries={retries} mean={mean:.3f}s p50={p50:.3f}s '
+                        'p95={p95:.3f}s max={max:.3f}s'.format(host=host, **stats))
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class ScheduledHTTPAdapter(adapters.HTTPAdapter):
+    """
+    FetchSchedulerのレート制限、同時接続数の上限、リトライを適用するHTTPAdapter
+
+    pandas_datareaderなど、セッションを利用するライブラリのリクエストにも適用される
+    """
+
+    def __init__(self, scheduler, **kwargs):
+        self._scheduler = scheduler
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        return self._scheduler.send(request, lambda: super(ScheduledHTTPAdapter, self).send(request, **kwargs))
+
+
+class FetchScheduler(object):
+    """
+    データソースへのリクエストをホストごとのトークンバケットで制限し、同時接続数の上限と
+    429、5xxの場合のジッタ付き指数バックオフによるリトライを行うクラス
+    """
+
+    def __init__(self, rate: float = 2.0, burst: float = 5.0, max_connections: int = 4, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, rate_limits: dict = None):
+        """コンストラクタ
+
+        Args:
+            rate: ホストごとの1秒あたりのリクエスト数
+            burst: ホストごとに連続して送れるリクエスト数
+            max_connections: 同時に送信中のリクエスト数の上限(セッションのコネクションプールの大きさ)
+            max_retries: 429、5xx、接続エラーの場合のリトライ回数
+            backoff_base: バックオフの基準の待ち時間(秒)
+            backoff_max: バックオフの待ち時間の上限(秒)
+            rate_limits: {ホスト: (rate, burst)}。ホストごとに異なる制限を設定する
+        """
+        self._rate = rate
+        self._burst = burst
+        self._rate_limits = dict(rate_limits or {})
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self.max_connections = max(int(max_connections), 1)
+        self._semaphore = threading.BoundedSemaphore(self.max_connections)
+        self._max_retries = int(max_retries)
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self.latency = LatencyStats()
+
+        self.session = requests.Session()
+        adapter = ScheduledHTTPAdapter(self, pool_connections=HTTP_POOL_SIZE, pool_maxsize=self.max_connections)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _bucket(self, host: str) -> TokenBucket:
+        with self._buckets_lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(*self._rate_limits.get(host, (self._rate, self._burst)))
+            return bucket
+
+    def backoff(self, attempt: int, retry_after=None) -> float:
+        """リトライまでの待ち時間を返却する(full jitter)
+
+        Args:
+            attempt: 何回目のリトライか(0始まり)
+            retry_after: Retry-Afterヘッダの値
+
+        Returns:
+            待ち時間(秒)
+        """
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self._backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self._backoff_max, self._backoff_base * 2 ** attempt))
+
+    def send(self, request, send):
+        """レート制限と同時接続数の上限を適用してリクエストを送信し、失敗した場合はリトライする
+
+        Args:
+            request: requests.PreparedRequest
+            send: リクエストを送信する関数
+
+        Returns:
+            requests.Response。リトライ回数を超えた場合は最後のレスポンス
+
+        Raises:
+            requests.ConnectionError, requests.Timeout: リトライ回数を超えても接続できない場合
+        """
+        host = parse.urlsplit(request.url).netloc
+        bucket = self._bucket(host)
+
+        for attempt in range(self._max_retries + 1):
+            bucket.acquire()
+            with self._semaphore:
+                start_time = time.perf_counter()
+                try:
+                    response = send()
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    self.latency.record(host, time.perf_counter() - start_time, type(e).__name__, attempt > 0)
+                    if attempt >= self._max_retries:
+                        raise
+                    response = None
+                else:
+                    self.latency.record(host, time.perf_counter() - start_time, response.status_code, attempt > 0)
+
+            logger.debug('{} {} {} ({:.3f}s)'.format(request.method, request.url,
+                                                     response.status_code if response is not None else 'error',
+                                                     time.perf_counter() - start_time))
+            if response is not None and (response.status_code not in RETRY_STATUSES or attempt >= self._max_retries):
+                return response
+
+            retry_after = response.headers.get('Retry-After') if response is not None else None
+            wait = self.backoff(attempt, retry_after)
+            logger.warning('retry {} {} after {:.2f}s ({}/{})'.format(
+                request.method, request.url, wait, attempt + 1, self._max_retries))
+            if response is not None:
+                # 本文を読み切ってからコネクションをプールに戻し、キープアライブで再利用する
+                response.content
+                response.close()
+            time.sleep(wait)
+
+
+def get_scheduler() -> FetchScheduler:
+    """コンフィグの設定で作成した、プロセス内で共有するFetchSchedulerを取得する
+
+    Returns:
+        FetchScheduler
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            conf = config.Config.get_instance()
+            _scheduler = FetchScheduler(rate=conf.MARKET_DATA_RATE_LIMIT,
+                                        burst=conf.MARKET_DATA_BURST,
+                                        max_connections=conf.MARKET_DATA_MAX_CONNECTIONS,
+                                        max_retries=conf.MARKET_DATA_MAX_RETRIES)
+        return _scheduler
+
+
+def get_session() -> requests.Session:
+    """プロセス内で共有する、レート制限とリトライを適用したキープアライブのHTTPセッションを取得する
+
+    Returns:
+        requests.Session
+    """
+    return get_scheduler().session
+
 
+def get_cache():
+    """コンフィグの設定で作成した、プロセス内で共有する株価のキャッシュを取得する
 
-def fetch_stock_data(ticker_symbol, data_source, start_date, end_date=None, drop_na=True):
+    Returns:
+        MarketDataCache。無効な場合、ファイル形式のライブラリが存在しない場合はNone
+    """
+    global _cache, _cache_unavailable
+    conf = config.Config.get_instance()
+    if not conf.MARKET_DATA_CACHE_ENABLED:
+        return None
+
+    with _cache_lock:
+        if _cache is None and not _cache_unavailable:
+            try:
+                _cache = market_data_cache.MarketDataCache(conf.MARKET_DATA_CACHE_DIR,
+                                                           conf.MARKET_DATA_CACHE_FORMAT,
+                                                           conf.MARKET_DATA_CACHE_MAX_SYMBOLS)
+            except ImportError as e:
+                logger.warning('market data cache is disabled: {}'.format(e))
+                _cache_unavailable = True
+        return _cache
+
+
+def fetch_stock_data(ticker_symbol, data_source, start_date, end_date=None, drop_na=True, session=None):
     """データソースから株価のデータを取得する
 
     Args:
@@ -10,6 +299,7 @@ def fetch_stock_data(ticker_symbol, data_source, start_date, end_date=None, drop
         start_date: 取得開始日時
         end_date: 終了日
         drop_na: 欠損データを削除可否(デフォルト: True)
+        session: HTTPセッション(デフォルト: 共有のセッション)
 
     Returns:
         pandas.DataFrame
@@ -20,7 +310,7 @@ def fetch_stock_data(ticker_symbol, data_source, start_date, end_date=None, drop
                 Volume
                 Adj Close
     """
-    stock_data_df = pdr.DataReader(ticker_symbol, data_source, start_date, end_date)
+    stock_data_df = pdr.DataReader(ticker_symbol, data_source, start_date, end_date, session=session or get_session())
 
     if drop_na:
         stock_data_df = stock_data_df.dropna()
@@ -31,6 +321,8 @@ def fetch_stock_data(ticker_symbol, data_source, start_date, end_date=None, drop
 def fetch_stock_data_from_yf(ticker_symbol, start_date, end_date=None, drop_na=True):
     """yahoo financeから株価のデータを取得する
 
+    キャッシュが有効な場合は、キャッシュ済みの期間をデータソースから取得しない
+
     Args:
         ticker_symbol: 取得する企業のシンボル
         start_date: 取得開始日時
@@ -48,5 +340,144 @@ def fetch_stock_data_from_yf(ticker_symbol, start_date, end_date=None, drop_na=T
 
     """
 
-    df = fetch_stock_data(ticker_symbol, 'yahoo', start_date, end_date, drop_na)
-    return df[df.index >= start_date]
+    cache = get_cache()
+    if cache is None:
+        df = fetch_stock_data(ticker_symbol, 'yahoo', start_date, end_date, drop_na)
+        return df[df.index >= start_date]
+
+    # キャッシュには欠損も含めて保持し、未取得の期間のみデータソースから取得する
+    df = cache.fetch('yahoo', ticker_symbol, start_date, end_date,
+                     lambda range_start, range_end: fetch_stock_data(ticker_symbol, 'yahoo', range_start, range_end,
+                                                                     drop_na=False))
+    if drop_na:
+        df = df.dropna()
+    return df
+
+
+def _read_data_reader(symbols, data_source, start_date, end_date, session):
+    return pdr.DataReader(symbols if len(symbols) > 1 else symbols[0], data_source, start_date, end_date,
+                          session=session)
+
+
+def split_symbols(stock_data_df, symbols) -> dict:
+    """複数銘柄の結果(カラムが(項目, 銘柄)のMultiIndex)を銘柄ごとのDataFrameに分割する
+
+    Args:
+        stock_data_df: データソースの結果
+        symbols: 要求した銘柄のリスト
+
+    Returns:
+        {銘柄: DataFrame}。結果に含まれない銘柄は除く
+    """
+    if not isinstance(stock_data_df.columns, pd.MultiIndex):
+        return {symbols[0]: stock_data_df} if len(symbols) == 1 else {}
+
+    fetched_symbols = set(stock_data_df.columns.get_level_values(-1))
+    return {symbol: stock_data_df.xs(symbol, axis=1, level=-1).rename_axis(columns=None)
+            for symbol in symbols if symbol in fetched_symbols}
+
+
+def _fetch_batches(requests, data_source, batch_size, session, reader) -> dict:
+    """(銘柄, 開始日, 終了日)の要求を開始日順に並べ、batch_size件ずつまとめたリクエストで取得する
+
+    バッチ内の最も早い開始日から最も遅い終了日までを取得した後に、要求ごとの期間で絞り込む
+
+    Args:
+        requests: (銘柄, 開始日, 終了日)のリスト。終了日がNoneの場合は当日まで
+        data_source: データソース
+        batch_size: 1回のリクエストで取得する要求数
+        session: HTTPセッション
+        reader: reader(symbols, data_source, start_date, end_date, session)でDataFrameを返却する関数
+
+    Returns:
+        {(銘柄, 開始日, 終了日): pandas.DataFrame}。欠損は削除しない。データを取得できなかった要求は含まない
+    """
+    requests = sorted(requests, key=lambda x: (x[1], x[0]))
+    result = {}
+    for i in range(0, len(requests), batch_size):
+        batch = requests[i:i + batch_size]
+        batch_symbols = list(dict.fromkeys(symbol for symbol, _, _ in batch))
+        batch_start_date = min(start for _, start, _ in batch)
+        end_dates = [end for _, _, end in batch]
+        batch_end_date = None if any(end is None for end in end_dates) else max(end_dates)
+
+        symbol_dfs = split_symbols(reader(batch_symbols, data_source, batch_start_date, batch_end_date, session),
+                                   batch_symbols)
+
+        for symbol, start, end in batch:
+            if symbol not in symbol_dfs:
+                continue
+            # 他の銘柄のみ存在する日付はすべて欠損になるため、分割後に削除する
+            symbol_df = symbol_dfs[symbol].dropna(how='all')
+            symbol_df = symbol_df[symbol_df.index >= start]
+            if end is not None:
+                symbol_df = symbol_df[symbol_df.index < end + pd.Timedelta(days=1)]
+            result[(symbol, start, end)] = symbol_df
+
+        missing_symbols = [symbol for symbol in batch_symbols if symbol not in symbol_dfs]
+        if missing_symbols:
+            logger.warning('{} data could not be fetched'.format(', '.join(missing_symbols)))
+
+    return result
+
+
+def fetch_stock_data_batch(symbols, start_date, end_date=None, data_source='yahoo', batch_size=DEFAULT_BATCH_SIZE,
+                           drop_na=True, session=None, reader=None) -> dict:
+    """複数銘柄の株価をbatch_size銘柄ずつまとめたリクエストで取得し、銘柄ごとに分割する
+
+    開始日が銘柄ごとに異なる場合は開始日順に並べてまとめ、バッチ内の最も早い開始日から取得した後に
+    銘柄ごとの開始日で絞り込む。キャッシュが有効な場合は、銘柄ごとのキャッシュ済みの期間を除いた
+    未取得の期間のみをまとめて取得する
+
+    Args:
+        symbols: 銘柄のリスト
+        start_date: 取得開始日、または{銘柄: 取得開始日}
+        end_date: 終了日
+        data_source: データソース(BATCH_DATA_SOURCES以外は1銘柄ずつ取得する)
+        batch_size: 1回のリクエストで取得する銘柄数
+        drop_na: 欠損データを削除可否(デフォルト: True)
+        session: HTTPセッション(デフォルト: 共有のセッション)
+        reader: reader(symbols, data_source, start_date, end_date, session)でDataFrameを返却する関数
+            (デフォルト: pandas_datareader.DataReader)
+
+    Returns:
+        {銘柄: pandas.DataFrame}。データを取得できなかった銘柄は含まない
+    """
+    symbols = list(dict.fromkeys(symbols))
+    start_dates = start_date if isinstance(start_date, dict) else {symbol: start_date for symbol in symbols}
+    start_dates = {symbol: pd.Timestamp(start_dates[symbol]) for symbol in symbols}
+    if data_source not in BATCH_DATA_SOURCES:
+        batch_size = 1
+    session = session or get_session()
+    reader = reader or _read_data_reader
+
+    cache = get_cache()
+    if cache is None:
+        end = pd.Timestamp(end_date) if end_date is not None else None
+        fetched = _fetch_batches([(symbol, start_dates[symbol], end) for symbol in symbols], data_source,
+                                 batch_size, session, reader)
+        result = {symbol: symbol_df for (symbol, _, _), symbol_df in fetched.items()}
+    else:
+        # キャッシュには欠損も含めて保持し、未取得の期間のみデータソースから取得する
+        missing = {symbol: cache.missing(data_source, symbol, start_dates[symbol], end_date) for symbol in symbols}
+        fetched = _fetch_batches([(symbol, range_start, range_end) for symbol in symbols
+                                  for range_start, range_end in missing[symbol]],
+                                 data_source, batch_size, session, reader)
+
+        result = {}
+        for symbol in symbols:
+            if any((symbol, range_start, range_end) not in fetched for range_start, range_end in missing[symbol]):
+                continue
+
+            def _fetcher(range_start, range_end, symbol=symbol):
+                symbol_df = fetched.get((symbol, range_start, range_end))
+                if symbol_df is None:
+                    # 別のスレッドがキャッシュを更新し、未取得の期間が変わった場合
+                    symbol_df = reader([symbol], data_source, range_start, range_end, session).dropna(how='all')
+                return symbol_df
+
+            result[symbol] = cache.fetch(data_source, symbol, start_dates[symbol], end_date, _fetcher)
+
+    if drop_na:
+        result = {symbol: symbol_df.dropna() for symbol, symbol_df in result.items()}
+    return result
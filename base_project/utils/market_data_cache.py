@@ -0,0 +1,301 @@
+"""
+データソースから取得した株価を(データソース, 銘柄)ごとにローカルのファイルへ保持するキャッシュ
+
+銘柄ごとのディレクトリに取得のたびの差分をパートファイルとして追記し、取得済みの期間をcoverage.jsonに記録する。
+パートファイルが増えた場合は1つのファイルにまとめ(コンパクション)、銘柄数が上限を超えた場合は
+最後に参照されてから最も時間が経った銘柄から削除する
+"""
+import datetime
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from urllib import parse
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FORMAT_PARQUET = 'parquet'
+FORMAT_FEATHER = 'feather'
+FORMAT_PICKLE = 'pickle'
+
+FORMATS = (FORMAT_PARQUET, FORMAT_FEATHER, FORMAT_PICKLE)
+
+COVERAGE_FILE_NAME = 'coverage.json'
+PART_FILE_PREFIX = 'part-'
+
+DEFAULT_MAX_PARTS = 8
+# 直近の期間を取得する場合に再取得する日数(休場日のみの期間を要求しないため)
+DEFAULT_REFRESH_DAYS = 7
+
+
+class MarketDataCache(object):
+    """
+    株価のDataFrameを(データソース, 銘柄)ごとにファイルで保持し、未取得の期間のみを取得するクラス
+    """
+
+    def __init__(self, root_dir: str, file_format: str = FORMAT_PARQUET, max_symbols: int = None,
+                 max_parts: int = DEFAULT_MAX_PARTS, refresh_days: int = DEFAULT_REFRESH_DAYS):
+        """コンストラクタ
+
+        Args:
+            root_dir: キャッシュのルートディレクトリ
+            file_format: parquet、feather(pyarrowが必要)、pickleのいずれか
+            max_symbols: 保持する銘柄数の上限。Noneの場合は削除しない
+            max_parts: 1銘柄のパートファイル数の上限。超えた場合にコンパクションする
+            refresh_days: 取得済みの期間の後を取得する場合に、取得済みの直近の日数分も再取得する
+
+        Raises:
+            ValueError: 存在しない形式の場合
+        """
+        if file_format not in FORMATS:
+            raise ValueError('{} of cache format not exists'.format(file_format))
+        if file_format in (FORMAT_PARQUET, FORMAT_FEATHER):
+            import pyarrow  # noqa: F401
+
+        self._root_dir = root_dir
+        self._file_format = file_format
+        self._max_symbols = max_symbols
+        self._max_parts = max(int(max_parts), 1)
+        self._refresh_days = int(refresh_days)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, source: str, symbol: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault((source, symbol), threading.Lock())
+
+    def _symbol_dir(self, source: str, symbol: str) -> str:
+        # ^N225、BRK/Bなどをファイル名に使える文字に変換する
+        return os.path.join(self._root_dir, parse.quote(source, safe=''), parse.quote(symbol, safe=''))
+
+    def _part_paths(self, symbol_dir: str) -> list:
+        if not os.path.isdir(symbol_dir):
+            return []
+        return sorted(os.path.join(symbol_dir, file_name) for file_name in os.listdir(symbol_dir)
+                      if file_name.startswith(PART_FILE_PREFIX))
+
+    def _read_part(self, path: str) -> pd.DataFrame:
+        if self._file_format == FORMAT_PARQUET:
+            return pd.read_parquet(path)
+        if self._file_format == FORMAT_FEATHER:
+            return pd.read_feather(path).set_index('Date')
+        return pd.read_pickle(path)
+
+    def _write_part(self, symbol_dir: str, dataframe: pd.DataFrame):
+        """パートファイルを一時ファイルに書き込んでからリネームする
+
+        Args:
+            symbol_dir: 銘柄のディレクトリ
+            dataframe: 書き込むDataFrame
+
+        """
+        file_name = '{}{:020d}-{}.{}'.format(PART_FILE_PREFIX, time.time_ns(), uuid.uuid4().hex[:8],
+                                             self._file_format)
+        tmp_path = os.path.join(symbol_dir, '.' + file_name)
+
+        if self._file_format == FORMAT_PARQUET:
+            dataframe.to_parquet(tmp_path)
+        elif self._file_format == FORMAT_FEATHER:
+            # featherはインデックスを保持できないため、カラムとして書き込む
+            dataframe.rename_axis('Date').reset_index().to_feather(tmp_path)
+        else:
+            dataframe.to_pickle(tmp_path)
+
+        os.replace(tmp_path, os.path.join(symbol_dir, file_name))
+
+    @staticmethod
+    def _read_coverage(symbol_dir: str):
+        path = os.path.join(symbol_dir, COVERAGE_FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            coverage = json.load(f)
+        return pd.Timestamp(coverage['start']), pd.Timestamp(coverage['end'])
+
+    @staticmethod
+    def _write_coverage(symbol_dir: str, start: pd.Timestamp, end: pd.Timestamp):
+        path = os.path.join(symbol_dir, COVERAGE_FILE_NAME)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'start': start.strftime('%Y-%m-%d'), 'end': end.strftime('%Y-%m-%d')}, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def missing_ranges(coverage, start: pd.Timestamp, end: pd.Timestamp, refresh_days: int = 0) -> list:
+        """取得済みの期間に含まれない期間を返却する
+
+        取得済みの期間が連続するように、取得済みの期間と隣接する範囲を返却する
+
+        Args:
+            coverage: 取得済みの(開始日, 終了日)。未取得の場合はNone
+            start: 要求の開始日
+            end: 要求の終了日
+            refresh_days: 取得済みの期間の後を取得する場合に、終了日から遡って取得する日数の最小値
+
+        Returns:
+            (開始日, 終了日)のリスト
+        """
+        if coverage is None:
+            return [(start, end)] if start <= end else []
+
+        covered_start, covered_end = coverage
+        one_day = pd.Timedelta(days=1)
+        ranges = []
+        if start < covered_start:
+            ranges.append((start, covered_start - one_day))
+        if end > covered_end:
+            ranges.append((max(min(covered_end + one_day, end - pd.Timedelta(days=refresh_days)), covered_start), end))
+        return ranges
+
+    @staticmethod
+    def _request_range(start_date, end_date) -> tuple:
+        today = pd.Timestamp(datetime.date.today())
+        start = pd.Timestamp(start_date).normalize()
+        end = min(pd.Timestamp(end_date).normalize(), today) if end_date is not None else today
+        return start, end
+
+    def missing(self, source: str, symbol: str, start_date, end_date) -> list:
+        """要求された期間のうち、fetchでデータソースから取得する期間を返却する
+
+        Args:
+            source: データソース
+            symbol: 銘柄
+            start_date: 開始日
+            end_date: 終了日(Noneの場合は当日)
+
+        Returns:
+            (開始日, 終了日)のリスト
+        """
+        start, end = self._request_range(start_date, end_date)
+        with self._lock(source, symbol):
+            coverage = self._read_coverage(self._symbol_dir(source, symbol))
+        return self.missing_ranges(coverage, start, end, self._refresh_days)
+
+    def read(self, source: str, symbol: str) -> pd.DataFrame:
+        """キャッシュ済みのデータをすべて読み込む
+
+        Args:
+            source: データソース
+            symbol: 銘柄
+
+        Returns:
+            日付順のDataFrame。キャッシュが存在しない場合はNone
+        """
+        part_paths = self._part_paths(self._symbol_dir(source, symbol))
+        if not part_paths:
+            return None
+
+        dataframe = pd.concat([self._read_part(path) for path in part_paths])
+        # 後から取得したパートの値を優先する
+        return dataframe[~dataframe.index.duplicated(keep='last')].sort_index()
+
+    def fetch(self, source: str, symbol: str, start_date, end_date, fetcher) -> pd.DataFrame:
+        """未取得の期間のみfetcherで取得してキャッシュに追加し、要求された期間のデータを返却する
+
+        当日分は取引時間中に変わるため、取得済みの期間には含めず毎回取得する
+
+        Args:
+            source: データソース
+            symbol: 銘柄
+            start_date: 開始日
+            end_date: 終了日(Noneの場合は当日)
+            fetcher: fetcher(開始日, 終了日)でDataFrameを返却する関数
+
+        Returns:
+            開始日から終了日までのDataFrame
+        """
+        today = pd.Timestamp(datetime.date.today())
+        start, end = self._request_range(start_date, end_date)
+        symbol_dir = self._symbol_dir(source, symbol)
+
+        with self._lock(source, symbol):
+            coverage = self._read_coverage(symbol_dir)
+            ranges = self.missing_ranges(coverage, start, end, self._refresh_days)
+
+            if ranges:
+                os.makedirs(symbol_dir, exist_ok=True)
+                for range_start, range_end in ranges:
+                    logger.info('fetch {} {} from {:%Y-%m-%d} to {:%Y-%m-%d}'.format(
+                        source, symbol, range_start, range_end))
+                    dataframe = fetcher(range_start, range_end)
+                    if len(dataframe):
+                        self._write_part(symbol_dir, dataframe)
+
+                covered_start, covered_end = start, min(end, today - pd.Timedelta(days=1))
+                if coverage is not None:
+                    covered_start, covered_end = min(start, coverage[0]), max(covered_end, coverage[1])
+                if covered_start <= covered_end:
+                    self._write_coverage(symbol_dir, covered_start, covered_end)
+
+                if len(self._part_paths(symbol_dir)) > self._max_parts:
+                    self._compact(symbol_dir)
+            else:
+                logger.debug('{} {} is cached'.format(source, symbol))
+
+            if os.path.isdir(symbol_dir):
+                # 最後に参照された日時を更新する(削除の順序に利用する)
+                os.utime(symbol_dir)
+            dataframe = self.read(source, symbol)
+
+        if self._max_symbols is not None:
+            self.evict()
+
+        if dataframe is None:
+            return pd.DataFrame()
+        return dataframe[(dataframe.index >= start) & (dataframe.index < end + pd.Timedelta(days=1))]
+
+    def _compact(self, symbol_dir: str):
+        """パートファイルを1つのファイルにまとめる
+
+        Args:
+            symbol_dir: 銘柄のディレクトリ
+
+        """
+        part_paths = self._part_paths(symbol_dir)
+        if len(part_paths) <= 1:
+            return
+
+        dataframe = pd.concat([self._read_part(path) for path in part_paths])
+        self._write_part(symbol_dir, dataframe[~dataframe.index.duplicated(keep='last')].sort_index())
+        for path in part_paths:
+            os.remove(path)
+        logger.debug('compacted {} parts: {}'.format(len(part_paths), symbol_dir))
+
+    def compact(self, source: str, symbol: str):
+        """銘柄のパートファイルを1つのファイルにまとめる
+
+        Args:
+            source: データソース
+            symbol: 銘柄
+
+        """
+        with self._lock(source, symbol):
+            self._compact(self._symbol_dir(source, symbol))
+
+    def evict(self):
+        """銘柄数がmax_symbolsを超えている場合、最後に参照されてから最も時間が経った銘柄から削除する
+        """
+        if self._max_symbols is None or not os.path.isdir(self._root_dir):
+            return
+
+        symbol_dirs = [os.path.join(self._root_dir, source_dir, symbol_dir)
+                       for source_dir in os.listdir(self._root_dir)
+                       if os.path.isdir(os.path.join(self._root_dir, source_dir))
+                       for symbol_dir in os.listdir(os.path.join(self._root_dir, source_dir))]
+        if len(symbol_dirs) <= self._max_symbols:
+            return
+
+        symbol_dirs.sort(key=os.path.getmtime)
+        for symbol_dir in symbol_dirs[:len(symbol_dirs) - self._max_symbols]:
+            source, symbol = (parse.unquote(name) for name in symbol_dir.split(os.sep)[-2:])
+            with self._lock(source, symbol):
+                shutil.rmtree(symbol_dir, ignore_errors=True)
+            logger.info('evicted {} {} from market data cache'.format(source, symbol))
+
+    def clear(self):
+        shutil.rmtree(self._root_dir, ignore_errors=True)
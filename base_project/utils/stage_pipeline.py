@@ -0,0 +1,182 @@
+"""
+複数のステージをスレッドで並行に実行し、ステージ間を上限付きのキューで接続するパイプライン
+
+前のステージが後のステージより速い場合はキューが一杯になって待つため、処理中のデータ量はキューの大きさで制限される
+"""
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """
+    パイプラインのステージ
+
+    functionの戻り値を次のステージに渡す。Noneを返却した場合は以降のステージに渡さない。
+    expandがTrueの場合はfunctionが返却したリストの要素ごとに次のステージに渡す
+    """
+    name: str
+    function: object
+    workers: int = 1
+    queue_size: int = 8
+    expand: bool = False
+
+
+@dataclass
+class StageStats:
+    """
+    ステージごとの処理件数と処理時間
+    """
+    name: str
+    workers: int
+    items: int = 0
+    skipped: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, seconds: float, skipped: bool = False, error: bool = False):
+        with self._lock:
+            self.items += 1
+            self.skipped += 1 if skipped else 0
+            self.errors += 1 if error else 0
+            self.busy_seconds += seconds
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def utilization(self) -> float:
+        return self.busy_seconds / (self.elapsed_seconds * self.workers) if self.elapsed_seconds else 0.0
+
+
+class StagePipeline(object):
+    """
+    ステージごとに指定した数のスレッドで処理し、上限付きのキューで次のステージに渡すクラス
+    """
+
+    def __init__(self, stages: list):
+        """コンストラクタ
+
+        Args:
+            stages: Stageのリスト(先頭から順に実行する)
+        """
+        self._stages = stages
+
+    def run(self, items, key=None) -> tuple:
+        """すべてのデータをパイプラインで処理する
+
+        1件の失敗で他のデータの処理を止めず、失敗したデータは以降のステージに渡さない
+
+        Args:
+            items: 先頭のステージに渡すデータのイテラブル
+            key: エラーの報告に利用するデータの識別子を返却する関数(デフォルト: データそのもの)
+
+        Returns:
+            (StageStatsのリスト, (ステージ名, 識別子, 例外)のリスト)
+
+        Raises:
+            BaseException: ステージの関数がException以外(KeyboardInterruptなど)を送出した場合、
+                すべてのスレッドの終了後に送出する
+        """
+        key = key or (lambda x: x)
+        queues = [queue.Queue(maxsize=max(stage.queue_size, 1)) for stage in self._stages]
+        stats = [StageStats(stage.name, max(stage.workers, 1)) for stage in self._stages]
+        errors = []
+        errors_lock = threading.Lock()
+        remaining = [max(stage.workers, 1) for stage in self._stages]
+        remaining_lock = threading.Lock()
+        # 処理を中断させたBaseException
+        aborted = []
+        start_time = time.perf_counter()
+
+        def _worker(index):
+            stage = self._stages[index]
+            next_queue = queues[index + 1] if index + 1 < len(queues) else None
+            try:
+                while True:
+                    element = queues[index].get()
+                    if element is _DONE:
+                        break
+                    if aborted:
+                        # 中断後は残りのデータを読み捨て、前のステージがキューで待たないようにする
+                        continue
+
+                    item_key, value = element
+                    function_start_time = time.perf_counter()
+                    try:
+                        result = stage.function(value)
+                    except Exception as e:
+                        stats[index].add(time.perf_counter() - function_start_time, error=True)
+                        logger.debug('{} failed in {} stage'.format(item_key, stage.name), exc_info=True)
+                        with errors_lock:
+                            errors.append((stage.name, item_key, e))
+                        continue
+                    except BaseException as e:
+                        # KeyboardInterrupt、SystemExitなどはすべてのデータの処理を中断し、runの呼び出し元で送出する
+                        stats[index].add(time.perf_counter() - function_start_time, error=True)
+                        logger.warning('{} stage aborted by {!r} ({})'.format(stage.name, e, item_key))
+                        aborted.append(e)
+                        continue
+
+                    if stage.expand:
+                        # 要素ごとの識別子でエラーを報告する
+                        elements = [(key(element), element) for element in result or []]
+                    else:
+                        elements = [(item_key, result)] if result is not None else []
+                    stats[index].add(time.perf_counter() - function_start_time, skipped=not elements)
+                    if next_queue is not None:
+                        for element in elements:
+                            next_queue.put(element)
+            finally:
+                # 最後に終了したスレッドがステージの処理時間を確定し、次のステージを終了させる
+                with remaining_lock:
+                    remaining[index] -= 1
+                    last = remaining[index] == 0
+                if last:
+                    stats[index].elapsed_seconds = time.perf_counter() - start_time
+                    if next_queue is not None:
+                        for _ in range(stats[index + 1].workers):
+                            next_queue.put(_DONE)
+
+        threads = [threading.Thread(target=_worker, args=(index,), name='{}-{}'.format(stage.name, i), daemon=True)
+                   for index, stage in enumerate(self._stages) for i in range(stats[index].workers)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for item in items:
+                if aborted:
+                    break
+                queues[0].put((key(item), item))
+        finally:
+            for _ in range(stats[0].workers):
+                queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+
+        if aborted:
+            raise aborted[0]
+        return stats, errors
+
+    @staticmethod
+    def log_stats(stats: list):
+        """ステージごとのスループットをログに出力する
+
+        Args:
+            stats: StageStatsのリスト
+
+        """
+        for stage_stats in stats:
+            logger.info('stage {s.name}: workers={s.workers} items={s.items} skipped={s.skipped} errors={s.errors} '
+                        'elapsed={s.elapsed_seconds:.3f}s throughput={s.throughput:.2f}/s '
+                        'utilization={utilization:.0%}'.format(s=stage_stats, utilization=stage_stats.utilization))
@@ -0,0 +1,2 @@
+ALTER TABLE {{ table_name }} ATTACH PARTITION {{ table_name }}_{{ year }}
+    FOR VALUES FROM ('{{ year }}-01-01') TO ('{{ year + 1 }}-01-01')
\ No newline at end of file
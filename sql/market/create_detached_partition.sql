@@ -0,0 +1 @@
+CREATE TABLE IF NOT EXISTS {{ table_name }}_{{ year }} (LIKE {{ table_name }} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
\ No newline at end of file
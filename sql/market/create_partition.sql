@@ -0,0 +1,9 @@
+{% if partition_by == 'hash' -%}
+CREATE TABLE IF NOT EXISTS {{ table_name }}_p{{ remainder }} PARTITION OF {{ table_name }}
+    FOR VALUES WITH (MODULUS {{ modulus }}, REMAINDER {{ remainder }})
+{%- elif year is none -%}
+CREATE TABLE IF NOT EXISTS {{ table_name }}_default PARTITION OF {{ table_name }} DEFAULT
+{%- else -%}
+CREATE TABLE IF NOT EXISTS {{ table_name }}_{{ year }} PARTITION OF {{ table_name }}
+    FOR VALUES FROM ('{{ year }}-01-01') TO ('{{ year + 1 }}-01-01')
+{%- endif %}
\ No newline at end of file
@@ -0,0 +1,11 @@
+CREATE TABLE IF NOT EXISTS {{ table_name }}(
+    symbol VARCHAR(32) NOT NULL,
+    date date NOT NULL,
+    high FLOAT,
+    low FLOAT,
+    open FLOAT,
+    close FLOAT,
+    volume BIGINT,
+    adj_close FLOAT,
+    PRIMARY KEY (symbol, date)
+){% if partition_by == 'hash' %} PARTITION BY HASH (symbol){% elif partition_by == 'range' %} PARTITION BY RANGE (date){% endif %}
\ No newline at end of file
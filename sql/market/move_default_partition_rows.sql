@@ -0,0 +1,14 @@
+WITH moved AS (
+    DELETE FROM
+        {{ table_name }}_default
+    WHERE
+        date >= '{{ year }}-01-01'
+        AND date < '{{ year + 1 }}-01-01'
+    RETURNING
+        symbol, date, high, low, open, close, volume, adj_close
+)
+INSERT INTO {{ table_name }}_{{ year }} (symbol, date, high, low, open, close, volume, adj_close)
+SELECT
+    symbol, date, high, low, open, close, volume, adj_close
+FROM
+    moved
\ No newline at end of file
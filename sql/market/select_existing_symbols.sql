@@ -0,0 +1,6 @@
+SELECT DISTINCT
+    symbol
+FROM
+    {{ table_name }}
+WHERE
+    symbol IN %(symbols)s
\ No newline at end of file
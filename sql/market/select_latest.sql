@@ -0,0 +1,11 @@
+SELECT
+    {{ columns }}
+FROM
+    "{{ table_name }}"
+{%- if partitioned %}
+WHERE
+    symbol = %(symbol)s
+{%- endif %}
+ORDER BY
+    date DESC
+LIMIT %(n)s
\ No newline at end of file
@@ -0,0 +1,6 @@
+SELECT
+    max(date)
+FROM
+    {{ table_name }}
+WHERE
+    symbol = %(symbol)s
\ No newline at end of file
@@ -0,0 +1,20 @@
+{%- if partitioned -%}
+SELECT
+    symbol, max(date) AS latest_date
+FROM
+    "{{ table_name }}"
+WHERE
+    symbol IN %(symbols)s
+GROUP BY
+    symbol
+{%- else -%}
+{%- for table_name in table_names %}
+{%- if not loop.first %}
+UNION ALL
+{%- endif %}
+SELECT
+    %(symbol_{{ loop.index0 }})s AS symbol, max(date) AS latest_date
+FROM
+    "{{ table_name }}"
+{%- endfor %}
+{%- endif %}
\ No newline at end of file
@@ -0,0 +1,22 @@
+{%- for table_name in table_names %}
+{%- if not loop.first %}
+UNION ALL
+{%- endif %}
+SELECT
+    *
+FROM (
+    SELECT
+        %(symbol_{{ loop.index0 }})s AS symbol, {{ columns }}
+    FROM
+        "{{ table_name }}"
+    {%- if partitioned %}
+    WHERE
+        symbol = %(symbol_{{ loop.index0 }})s
+    {%- endif %}
+    ORDER BY
+        date DESC
+    LIMIT %(n)s
+) AS latest_{{ loop.index0 }}
+{%- endfor %}
+ORDER BY
+    symbol, date
\ No newline at end of file
@@ -0,0 +1,6 @@
+SELECT
+    date, high, low, open, close, volume, adj_close
+FROM
+    "{{ table_name }}"
+ORDER BY
+    date
\ No newline at end of file
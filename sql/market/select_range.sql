@@ -0,0 +1,14 @@
+SELECT
+    {{ columns }}
+FROM
+    "{{ table_name }}"
+WHERE
+    {% if partitioned %}symbol = %(symbol)s{% else %}1 = 1{% endif %}
+    {%- if with_start %}
+    AND date >= %(start)s
+    {%- endif %}
+    {%- if with_end %}
+    AND date <= %(end)s
+    {%- endif %}
+ORDER BY
+    date
\ No newline at end of file
@@ -0,0 +1,34 @@
+{%- if partitioned -%}
+SELECT
+    symbol, {{ columns }}
+FROM
+    "{{ table_name }}"
+WHERE
+    symbol IN %(symbols)s
+    {%- if with_start %}
+    AND date >= %(start)s
+    {%- endif %}
+    {%- if with_end %}
+    AND date <= %(end)s
+    {%- endif %}
+{%- else -%}
+{%- for table_name in table_names %}
+{%- if not loop.first %}
+UNION ALL
+{%- endif %}
+SELECT
+    %(symbol_{{ loop.index0 }})s AS symbol, {{ columns }}
+FROM
+    "{{ table_name }}"
+WHERE
+    1 = 1
+    {%- if with_start %}
+    AND date >= %(start)s
+    {%- endif %}
+    {%- if with_end %}
+    AND date <= %(end)s
+    {%- endif %}
+{%- endfor %}
+{%- endif %}
+ORDER BY
+    symbol, date
\ No newline at end of file
@@ -0,0 +1,21 @@
+import pytest
+
+from base_project import config
+from base_project.utils.database import connection_pool
+
+
+@pytest.fixture
+def market_config(tmp_path, monkeypatch):
+    """MARKET_DBをtmp_pathのSQLiteとしたコンフィグ(格納方式はMARKET_STORAGE_LAYOUTの環境変数で指定する)
+    """
+    monkeypatch.setenv('MARKET_DB_RDBMS', 'sqlite')
+    monkeypatch.setenv('MARKET_DB_URL', 'sqlite:///{}'.format(tmp_path / 'market.db'))
+    monkeypatch.delenv('MARKET_DB_REPLICA_URLS', raising=False)
+    monkeypatch.setenv('MARKET_DATA_CACHE_ENABLED', 'false')
+    monkeypatch.setattr(connection_pool.ConnectionPoolManager, 'connection_pool_dict', {})
+    monkeypatch.setattr(connection_pool.ConnectionPoolManager, 'replica_pool_set_dict', {})
+
+    market_config = config.Config.__internal_new__()
+    monkeypatch.setattr(config.Config, '_instance', market_config, raising=False)
+    yield market_config
+    connection_pool.ConnectionPoolManager.close_connection_pools()
@@ -0,0 +1,26 @@
+import datetime
+
+from base_project.main.market import stock_price_migrator
+from base_project.models.market import stock_price
+from tests.models.market.test_stock_price import market_data_df
+
+
+class TestStockPriceMigrator(object):
+
+    def test_run(self, market_config):
+        for symbol, periods in (('AAPL', 5), ('MSFT', 3)):
+            source = stock_price.StockPrice(symbol, stock_price.LAYOUT_PER_TICKER)
+            source.create_table()
+            source.insert_market_data_df(market_data_df('2020-01-01', periods))
+
+        symbols = ['AAPL', 'MSFT', 'GOOG']
+        stock_price_migrator.StockPriceMigrator(symbols, batch_size=2, workers=2).run()
+        # 再実行しても行は重複しない
+        stock_price_migrator.StockPriceMigrator(symbols, batch_size=2, workers=2, drop_source=True).run()
+
+        target = stock_price.StockPrice('AAPL', stock_price.LAYOUT_PARTITIONED)
+        assert target.select_all('SELECT symbol, count(*) FROM stock_price GROUP BY symbol ORDER BY symbol') == [
+            ('AAPL', 5), ('MSFT', 3)]
+        assert stock_price.StockPrice.latest_dates(symbols, stock_price.LAYOUT_PARTITIONED) == {
+            'AAPL': datetime.date(2020, 1, 7), 'MSFT': datetime.date(2020, 1, 3)}
+        assert stock_price.StockPrice.existing_symbols(symbols, stock_price.LAYOUT_PER_TICKER) == set()
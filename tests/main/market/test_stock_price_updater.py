@@ -0,0 +1,95 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from base_project.main.market import stock_price_updater
+from base_project.models.market import stock_price
+from base_project.utils import time_util
+from tests.models.market.test_stock_price import market_data_df
+from tests.utils.test_market_data import StubSource
+
+
+@pytest.fixture(params=stock_price.LAYOUTS)
+def layout(request, monkeypatch):
+    """AAPL(2020/01/07まで)、MSFT(2020/01/03まで)の株価を格納し、GOOGは格納しない"""
+    monkeypatch.setenv('MARKET_STORAGE_LAYOUT', request.param)
+    request.getfixturevalue('market_config')
+
+    for symbol, periods in (('AAPL', 5), ('MSFT', 3)):
+        stock_price_obj = stock_price.StockPrice(symbol)
+        stock_price_obj.create_table()
+        stock_price_obj.insert_market_data_df(market_data_df('2020-01-01', periods))
+    return request.param
+
+
+def plan(updater, symbols=('AAPL', 'MSFT', 'GOOG')):
+    partitioned = stock_price.StockPrice(symbols[0]).partitioned
+    return {plan.symbol: plan for plan in updater._plan(list(symbols), partitioned)}
+
+
+class TestStockPriceUpdater(object):
+
+    def test_expected_latest_date(self):
+        # 土日は直前の営業日とする
+        assert stock_price_updater.StockPriceUpdater(['AAPL'], end_date='2020/01/05')._expected_latest_date() == \
+            datetime.date(2020, 1, 3)
+        assert stock_price_updater.StockPriceUpdater(['AAPL'], end_date='2020/01/07')._expected_latest_date() == \
+            datetime.date(2020, 1, 7)
+
+        expected_latest_date = stock_price_updater.StockPriceUpdater(['AAPL'])._expected_latest_date()
+        assert expected_latest_date < datetime.date.today() and expected_latest_date.weekday() < 5
+
+    def test_latest_dates(self, layout):
+        assert stock_price.StockPrice.latest_dates(['AAPL', 'MSFT', 'GOOG'], layout) == {
+            'AAPL': datetime.date(2020, 1, 7), 'MSFT': datetime.date(2020, 1, 3)}
+
+    def test_plan(self, layout):
+        plans = plan(stock_price_updater.StockPriceUpdater(['AAPL'], end_date='2020/01/07'))
+
+        assert plans['AAPL'] == stock_price_updater.UpdatePlan('AAPL', stock_price_updater.STATUS_CURRENT, None,
+                                                               datetime.date(2020, 1, 7))
+        assert plans['MSFT'] == stock_price_updater.UpdatePlan('MSFT', stock_price_updater.STATUS_STALE,
+                                                               '2020/01/04', datetime.date(2020, 1, 3))
+        assert plans['GOOG'] == stock_price_updater.UpdatePlan('GOOG', stock_price_updater.STATUS_NEW,
+                                                               time_util.get_past_date_stamp(years=2))
+
+        # 週末を終了日とした場合は直前の営業日のデータがあれば最新とみなす
+        plans = plan(stock_price_updater.StockPriceUpdater(['AAPL'], end_date='2020/01/05'))
+        assert plans['MSFT'].status == stock_price_updater.STATUS_CURRENT
+
+    def test_plan_with_start_date(self, layout):
+        plans = plan(stock_price_updater.StockPriceUpdater(['AAPL'], start_date='2020/01/02', end_date='2020/01/07'))
+
+        assert [(plans[symbol].status, plans[symbol].start_date) for symbol in ('AAPL', 'MSFT')] == [
+            (stock_price_updater.STATUS_STALE, '2020/01/02')] * 2
+        assert plans['GOOG'].status == stock_price_updater.STATUS_NEW
+
+    def test_run_without_symbols(self, market_config):
+        assert stock_price_updater.StockPriceUpdater([]).run() is None
+
+    def test_run(self, layout, monkeypatch):
+        close = market_data_df('2020-01-01', 6)['Close']
+        source = StubSource({symbol: close for symbol in ('AAPL', 'MSFT', 'GOOG', 'AMZN')})
+
+        monkeypatch.setattr(stock_price_updater.market_data, '_read_data_reader', source)
+        monkeypatch.setattr(stock_price_updater.market_data, 'get_session', lambda: None)
+        monkeypatch.setattr(stock_price_updater.slack.SlackNotificator, 'notify_from_file', lambda *args: None)
+
+        stock_price_updater.StockPriceUpdater(['AAPL', 'MSFT', 'GOOG', 'AMZN'], end_date='2020/01/08').run()
+
+        # 取得開始日が同じ銘柄はまとめて取得する
+        assert sorted(source.requests) == [
+            (['AAPL'], pd.Timestamp('2020/01/08')),
+            (['AMZN', 'GOOG'], pd.Timestamp(time_util.get_past_date_stamp(years=2))),
+            (['MSFT'], pd.Timestamp('2020/01/04'))]
+        # GOOG、AMZNは取得開始日(2年前)以降のデータがないため投入しない
+        assert stock_price.StockPrice.latest_dates(['AAPL', 'MSFT', 'GOOG', 'AMZN']) == {
+            symbol: datetime.date(2020, 1, 8) for symbol in ('AAPL', 'MSFT')}
+
+    def test_group(self, market_config):
+        plans = [stock_price_updater.UpdatePlan(symbol, stock_price_updater.STATUS_STALE, start_date)
+                 for symbol, start_date in (('A', '2020/01/02'), ('B', '2020/01/01'), ('C', '2020/01/02'),
+                                            ('D', '2020/01/02'))]
+        groups = stock_price_updater.StockPriceUpdater(['A'], fetch_batch_size=2)._group(plans)
+        assert [[plan.symbol for plan in group] for group in groups] == [['B'], ['A', 'C'], ['D']]
@@ -0,0 +1,168 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from base_project import config
+from base_project.models.market import stock_price
+
+
+class TestStockPrice(object):
+
+    def test_select_columns(self):
+        assert stock_price.StockPrice._select_columns(None) == stock_price.COLUMNS
+        assert stock_price.StockPrice._select_columns(['close', 'date', 'close']) == ['date', 'close']
+        with pytest.raises(ValueError):
+            stock_price.StockPrice._select_columns(['close; DROP TABLE x'])
+
+    def test_to_frame(self):
+        result = {'symbol': ['AAPL', 'AAPL'], 'date': ['2020-01-01', '2020-01-02'], 'volume': [1, 2]}
+        dataframe = stock_price.StockPrice._to_frame(result, ['date', 'volume'], ['symbol', 'date'], False)
+        assert list(dataframe.index.names) == ['symbol', 'date']
+        assert str(dataframe['volume'].dtype) == 'int64'
+
+        arrays = stock_price.StockPrice._to_frame({}, ['date', 'close'], ['date'], True)
+        assert list(arrays) == ['date', 'close']
+        assert arrays['close'].dtype == 'float64'
+
+
+def market_data_df(start, periods, offset=0.0):
+    """データソースと同じカラムの株価のDataFrameを作成する"""
+    index = pd.bdate_range(start, periods=periods, name='Date')
+    values = [float(i) + offset for i in range(periods)]
+    return pd.DataFrame({'High': values, 'Low': values, 'Open': values, 'Close': values,
+                         'Volume': [int(value) for value in values], 'Adj Close': values}, index=index)
+
+
+class TestPartitionedLayout(object):
+
+    def test_upsert_and_latest_dates(self, market_config):
+        aapl = stock_price.StockPrice('AAPL', stock_price.LAYOUT_PARTITIONED)
+        aapl.create_partitioned_table()
+        # 作成済みの場合は何もしない
+        aapl.create_partitioned_table()
+        assert stock_price.StockPrice.existing_symbols(['AAPL', 'MSFT'], stock_price.LAYOUT_PARTITIONED) == set()
+
+        aapl.insert_market_data_df(market_data_df('2020-01-01', 3))
+        rows = [(datetime.date(2020, 1, 3), 9.0, 9.0, 9.0, 9.0, 9, 9.0),
+                (datetime.date(2020, 1, 6), 10.0, 10.0, 10.0, 10.0, 10, 10.0)]
+        assert aapl.upsert_rows(rows).row_count == 2
+        stock_price.StockPrice('MSFT', stock_price.LAYOUT_PARTITIONED).upsert_rows(rows[:1])
+
+        assert stock_price.StockPrice.existing_symbols(['AAPL', 'MSFT', 'GOOG'], stock_price.LAYOUT_PARTITIONED) == {
+            'AAPL', 'MSFT'}
+        assert stock_price.StockPrice.latest_dates(['AAPL', 'MSFT', 'GOOG'], stock_price.LAYOUT_PARTITIONED) == {
+            'AAPL': datetime.date(2020, 1, 6), 'MSFT': datetime.date(2020, 1, 3)}
+        assert aapl.select_one('SELECT count(*), max(close) FROM stock_price WHERE symbol = %(symbol)s',
+                               {'symbol': 'AAPL'}) == (4, 10.0)
+
+    def test_add_year_partitions(self, market_config, monkeypatch):
+        stock_price_obj = stock_price.StockPrice('AAPL', stock_price.LAYOUT_PARTITIONED)
+        monkeypatch.setenv('MARKET_DB_RDBMS', 'PostgreSQL')
+        monkeypatch.setenv('MARKET_PARTITION_BY', stock_price.PARTITION_BY_RANGE)
+        monkeypatch.setattr(stock_price_obj, '_config', config.Config.__internal_new__())
+
+        # 前年までのパーティションのみ作成済み
+        this_year = datetime.date.today().year
+        existing_tables = {'stock_price', 'stock_price_default'} | {
+            'stock_price_{}'.format(year) for year in range(this_year - stock_price.StockPrice.RANGE_PARTITION_YEARS,
+                                                            this_year)}
+        monkeypatch.setattr(stock_price_obj, 'tables_exist', lambda table_names: existing_tables & set(table_names))
+        executed = []
+        monkeypatch.setattr(stock_price_obj, 'execute_from_file',
+                            lambda file_path, raw_params: executed.append((file_path, raw_params.get('year'))))
+
+        stock_price_obj.create_partitioned_table()
+        assert executed == [(file_path, year) for year in (this_year, this_year + 1)
+                            for file_path in ('market/create_detached_partition',
+                                              'market/move_default_partition_rows', 'market/attach_partition')]
+
+    def test_iter_price_batches(self, market_config):
+        aapl = stock_price.StockPrice('AAPL', stock_price.LAYOUT_PER_TICKER)
+        aapl.create_table()
+        aapl.insert_market_data_df(market_data_df('2020-01-01', 5))
+
+        batches = list(aapl.iter_price_batches(2))
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert [pd.Timestamp(row[0]).date() for batch in batches for row in batch] == list(
+            pd.bdate_range('2020-01-01', periods=5).date)
+        assert stock_price.StockPrice.latest_dates(['AAPL', 'MSFT'], stock_price.LAYOUT_PER_TICKER) == {
+            'AAPL': datetime.date(2020, 1, 7)}
+
+
+@pytest.fixture(params=stock_price.LAYOUTS)
+def layout(request, market_config):
+    """AAPL(2020/01/01から5営業日)、MSFT(3営業日)の株価を格納する"""
+    for symbol, periods, offset in (('AAPL', 5, 0.0), ('MSFT', 3, 100.0)):
+        stock_price_obj = stock_price.StockPrice(symbol, request.param)
+        stock_price_obj.create_table()
+        stock_price_obj.insert_market_data_df(market_data_df('2020-01-01', periods, offset))
+    return request.param
+
+
+class TestSelect(object):
+
+    def test_select_range(self, layout):
+        aapl = stock_price.StockPrice('AAPL', layout)
+
+        dataframe = aapl.select_range('2020-01-02', '2020-01-06')
+        assert dataframe.index.name == 'date'
+        assert list(dataframe.index) == list(pd.to_datetime(['2020-01-02', '2020-01-03', '2020-01-06']))
+        assert list(dataframe.columns) == stock_price.COLUMNS[1:]
+        assert list(dataframe['close']) == [1.0, 2.0, 3.0]
+        assert str(dataframe['volume'].dtype) == 'int64'
+
+        assert len(aapl.select_range()) == 5
+        assert list(aapl.select_range(end='2020-01-01', columns=['close']).columns) == ['close']
+        arrays = aapl.select_range('2020-01-07', columns=['close'], as_arrays=True)
+        assert list(arrays) == ['date', 'close'] and list(arrays['close']) == [4.0]
+
+    def test_select_latest(self, layout):
+        dataframe = stock_price.StockPrice('AAPL', layout).select_latest(2, columns=['close'])
+        assert list(dataframe.index) == list(pd.to_datetime(['2020-01-06', '2020-01-07']))
+        assert list(dataframe['close']) == [3.0, 4.0]
+        if layout == stock_price.LAYOUT_PARTITIONED:
+            assert len(stock_price.StockPrice('GOOG', layout).select_latest(2)) == 0
+
+    def test_select_range_many(self, layout):
+        dataframe = stock_price.StockPrice.select_range_many(['AAPL', 'MSFT', 'AAPL'], '2020-01-02', '2020-01-03',
+                                                             layout=layout)
+        assert list(dataframe.index.names) == ['symbol', 'date']
+        assert list(dataframe.index) == [(symbol, pd.Timestamp(date)) for symbol in ('AAPL', 'MSFT')
+                                         for date in ('2020-01-02', '2020-01-03')]
+        assert list(dataframe.columns) == stock_price.COLUMNS[1:]
+        assert list(dataframe['close']) == [1.0, 2.0, 101.0, 102.0]
+
+        assert len(stock_price.StockPrice.select_range_many([], layout=layout)) == 0
+
+    def test_select_latest_many(self, layout):
+        dataframe = stock_price.StockPrice.select_latest_many(['MSFT', 'AAPL'], 2, columns=['close'], layout=layout)
+        assert list(dataframe.index.names) == ['symbol', 'date']
+        assert sorted(dataframe.index) == [('AAPL', pd.Timestamp('2020-01-06')), ('AAPL', pd.Timestamp('2020-01-07')),
+                                           ('MSFT', pd.Timestamp('2020-01-02')), ('MSFT', pd.Timestamp('2020-01-03'))]
+        assert dataframe.loc['AAPL', 'close'].tolist() == [3.0, 4.0]
+        assert dataframe.loc['MSFT', 'close'].tolist() == [101.0, 102.0]
+
+    def test_select_many_chunks(self, layout, monkeypatch):
+        expected_range = stock_price.StockPrice.select_range_many(['MSFT', 'AAPL'], '2020-01-02', layout=layout)
+        expected_latest = stock_price.StockPrice.select_latest_many(['MSFT', 'AAPL'], 2, layout=layout)
+
+        # 1銘柄ずつのクエリの結果を連結しても同じ結果になる
+        monkeypatch.setattr(stock_price.StockPrice, 'LATEST_DATES_CHUNK_SIZE', 1)
+        pd.testing.assert_frame_equal(
+            stock_price.StockPrice.select_range_many(['MSFT', 'AAPL'], '2020-01-02', layout=layout), expected_range)
+        pd.testing.assert_frame_equal(stock_price.StockPrice.select_latest_many(['MSFT', 'AAPL'], 2, layout=layout),
+                                      expected_latest)
+        assert stock_price.StockPrice.latest_dates(['MSFT', 'AAPL'], layout) == {
+            'AAPL': datetime.date(2020, 1, 7), 'MSFT': datetime.date(2020, 1, 3)}
+
+    def test_select_many_compound_select_limit(self, layout):
+        symbols = ['S{}'.format(i) for i in range(stock_price.StockPrice.LATEST_DATES_CHUNK_SIZE + 1)]
+        for symbol in symbols:
+            stock_price_obj = stock_price.StockPrice(symbol, layout)
+            stock_price_obj.create_table()
+            stock_price_obj.insert_market_data_df(market_data_df('2020-01-01', 1))
+
+        assert len(stock_price.StockPrice.select_latest_many(symbols, layout=layout)) == len(symbols)
+        assert len(stock_price.StockPrice.select_range_many(symbols, layout=layout)) == len(symbols)
+        assert len(stock_price.StockPrice.latest_dates(symbols, layout)) == len(symbols)
@@ -0,0 +1 @@
+SELECT * FROM "{{ table_name }}"
\ No newline at end of file
@@ -0,0 +1,45 @@
+import os
+import shutil
+
+import pytest
+
+from base_project import config, sql_file_reader
+
+CONFIG = config.Config.get_instance()
+SQL_ROOT_PATH = os.path.join(CONFIG.PROJECT_ROOT_PATH, 'tests', 'test_files', 'sql')
+
+
+class TestSqlFileReader(object):
+
+    @classmethod
+    def setup_class(cls):
+        cls.sql_file_reader = sql_file_reader.SqlFileReader(SQL_ROOT_PATH)
+
+    def test_names(self):
+        assert self.sql_file_reader.names() == ['market/select_all']
+
+    def test_read_by_name(self):
+        assert self.sql_file_reader.read('market/select_all') == 'SELECT * FROM "{{ table_name }}"'
+
+    def test_read_by_path(self):
+        assert self.sql_file_reader.read(os.path.join('market', 'select_all.sql')) == \
+               'SELECT * FROM "{{ table_name }}"'
+
+    def test_read_unknown_name(self):
+        with pytest.raises(FileNotFoundError):
+            self.sql_file_reader.read('market/unknown')
+
+    def test_validate(self):
+        self.sql_file_reader.validate(['market/select_all'])
+        with pytest.raises(FileNotFoundError):
+            self.sql_file_reader.validate(['market/select_all', 'market/unknown'])
+
+    def test_reload_modified_file(self, tmp_path):
+        shutil.copytree(SQL_ROOT_PATH, tmp_path / 'sql')
+        reader = sql_file_reader.SqlFileReader(str(tmp_path / 'sql'), check_interval=0)
+
+        sql_file_path = tmp_path / 'sql' / 'market' / 'select_all.sql'
+        sql_file_path.write_text('SELECT 1')
+        os.utime(sql_file_path, (0, 0))
+
+        assert reader.read('market/select_all') == 'SELECT 1'
@@ -0,0 +1,43 @@
+import datetime
+import struct
+
+import pandas as pd
+
+from base_project.utils.database import bulk_loader
+
+
+class TestBulkLoader(object):
+
+    def test_dataframe_to_rows_with_index(self):
+        df = pd.DataFrame({'high': [1.5, 2.5], 'volume': [10, 20]},
+                          index=pd.Index([datetime.date(2020, 1, 1), datetime.date(2020, 1, 2)], name='date'))
+        columns, rows = bulk_loader.dataframe_to_rows(df)
+        assert columns == ['date', 'high', 'volume']
+        assert list(rows) == [(datetime.date(2020, 1, 1), 1.5, 10), (datetime.date(2020, 1, 2), 2.5, 20)]
+
+    def test_encode_text_rows(self):
+        rows = [(1, 'a\tb', None), (2, 'c\\d', float('nan')), (3, True, datetime.date(2020, 1, 1))]
+        data = b''.join(bulk_loader.encode_text_rows(rows, chunk_size=2))
+        assert data == b'1\ta\\tb\t\\N\n2\tc\\\\d\t\\N\n3\t1\t2020-01-01\n'
+
+    def test_encode_text_rows_chunked(self):
+        chunks = list(bulk_loader.encode_text_rows(((i,) for i in range(5)), chunk_size=2))
+        assert len(chunks) == 3
+
+    def test_encode_binary_rows(self):
+        data = b''.join(bulk_loader.encode_binary_rows([(1, None)]))
+        assert data.startswith(bulk_loader.PGCOPY_SIGNATURE)
+        assert data.endswith(struct.pack('>h', -1))
+        assert struct.pack('>h', 2) + struct.pack('>iq', 8, 1) + b'\xff\xff\xff\xff' in data
+
+    def test_iterator_stream_read(self):
+        stream = bulk_loader.IteratorStream([b'ab', b'cd\n', b'ef'])
+        assert stream.read(3) == b'abc'
+        assert stream.readline() == b'd\n'
+        assert stream.read() == b'ef'
+        assert stream.read(1) == b''
+
+    def test_row_counter(self):
+        row_counter = bulk_loader.RowCounter(iter([(1,), (2,)]))
+        list(bulk_loader.encode_text_rows(row_counter))
+        assert row_counter.count == 2
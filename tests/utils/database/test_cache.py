@@ -0,0 +1,98 @@
+import pytest
+
+from base_project.utils.database import cache
+
+
+class TestLRUCache(object):
+
+    def test_evict_least_recently_used(self):
+        lru_cache = cache.LRUCache(maxsize=2)
+        lru_cache.set('a', 1)
+        lru_cache.set('b', 2)
+        lru_cache.get('a')
+        lru_cache.set('c', 3)
+        assert lru_cache.keys() == ['a', 'c']
+
+    def test_stats(self):
+        lru_cache = cache.LRUCache(maxsize=2)
+        lru_cache.get_or_set('a', lambda: 1)
+        lru_cache.get_or_set('a', lambda: 2)
+        stats = lru_cache.stats()
+        assert (stats.hits, stats.misses, stats.size) == (1, 1, 1)
+        assert stats.hit_rate == 0.5
+
+    def test_freeze_unhashable(self):
+        assert cache.freeze({'b': [1, 2], 'a': 1}) == (('a', 1), ('b', (1, 2)))
+        with pytest.raises(TypeError):
+            cache.freeze({'a': bytearray()})
+
+
+class TestQueryTemplateCache(object):
+
+    def test_render(self):
+        template_cache = cache.QueryTemplateCache()
+        query = 'SELECT * FROM "{{ table_name }}"'
+        assert template_cache.render(query, {'table_name': 'a'}) == 'SELECT * FROM "a"'
+        assert template_cache.render(query, {'table_name': 'b'}) == 'SELECT * FROM "b"'
+        assert template_cache.render(query, {'table_name': 'a'}) == 'SELECT * FROM "a"'
+
+        stats = template_cache.stats()
+        assert (stats['templates'].hits, stats['templates'].misses) == (1, 1)
+        assert (stats['rendered'].hits, stats['rendered'].misses) == (1, 2)
+
+
+class TestResultCache(object):
+
+    def test_referenced_tables(self):
+        assert cache.referenced_tables('SELECT date FROM "AAPL" JOIN public.b ON 1 = 1') == {'aapl', 'public.b', 'b'}
+        assert cache.referenced_tables('SELECT * FROM a, b WHERE a.x = b.x') == {'a', 'b'}
+        assert cache.referenced_tables('SELECT * FROM a AS x, "B" y (c1, c2), s.c LEFT JOIN d ON 1 = 1') == {
+            'a', 'b', 's.c', 'c', 'd'}
+        assert cache.referenced_tables('SELECT * FROM (SELECT * FROM a, b) AS t, c') == {'a', 'b', 'c'}
+        # テーブル関数などは参照テーブルを特定できない
+        assert cache.referenced_tables('SELECT * FROM generate_series(1, 3)') is None
+        assert cache.referenced_tables('SELECT * FROM a, LATERAL (SELECT 1) t') is None
+        assert cache.referenced_tables('SELECT * FROM a, (SELECT 1') is None
+
+    def test_uncertain_tables(self):
+        result_cache = cache.ResultCache()
+        query = 'SELECT * FROM a, unnest(ARRAY[1, 2]) AS u'
+        assert result_cache.get_or_set('a', query, lambda: 1) == 1
+        assert result_cache.get_or_set('a', query, lambda: 2) == 2
+
+    def test_written_tables(self):
+        assert cache.written_tables('INSERT INTO "AAPL" (date) VALUES (%s)') == {'aapl'}
+        assert cache.written_tables('DROP TABLE IF EXISTS "a", b') >= {'a', 'b', cache.CATALOG_TABLE}
+        assert cache.written_tables('DROP TEMPORARY TABLE `staging`') >= {'staging'}
+        assert cache.written_tables('SELECT 1') == frozenset()
+        assert cache.written_tables('VACUUM') is None
+
+    def test_invalidate_query(self):
+        result_cache = cache.ResultCache()
+        result_cache.get_or_set('a', 'SELECT * FROM a', lambda: 1)
+        result_cache.get_or_set('b', 'SELECT * FROM b', lambda: 2)
+
+        result_cache.invalidate_query('DELETE FROM a')
+        assert result_cache.get_or_set('a', 'SELECT * FROM a', lambda: 3) == 3
+        assert result_cache.get_or_set('b', 'SELECT * FROM b', lambda: 4) == 2
+        assert result_cache.stats().hits == 1
+
+    def test_ttl(self):
+        result_cache = cache.ResultCache(ttl=0)
+        result_cache.get_or_set('a', 'SELECT * FROM a', lambda: 1)
+        assert result_cache.get_or_set('a', 'SELECT * FROM a', lambda: 2) == 2
+
+    def test_invalidate_during_factory(self):
+        result_cache = cache.ResultCache()
+
+        def _factory():
+            # SELECTの実行中に参照テーブルが更新された
+            result_cache.invalidate_query('UPDATE a SET x = 1')
+            return 'stale'
+
+        assert result_cache.get_or_set('a', 'SELECT * FROM a', _factory) == 'stale'
+        assert result_cache.get_or_set('a', 'SELECT * FROM a', lambda: 'fresh') == 'fresh'
+        assert result_cache.get_or_set('a', 'SELECT * FROM a', lambda: 'other') == 'fresh'
+
+        result_cache.get_or_set('b', 'SELECT * FROM b', lambda: result_cache.invalidate_query('VACUUM'))
+        assert result_cache.get_or_set('b', 'SELECT * FROM b', lambda: 2) == 2
@@ -0,0 +1,61 @@
+import pytest
+
+from base_project.utils.database import connection_pool
+
+
+@pytest.fixture
+def replica_pools(tmp_path):
+    pools = [connection_pool.SqlAlchemyConnectionPool('sqlite:///{}'.format(tmp_path / 'replica{}.db'.format(i)),
+                                                      max_overflow=1, pool_size=1) for i in range(2)]
+    yield pools
+    for pool in pools:
+        pool.close_all_connections()
+
+
+class TestReplicaPoolSet(object):
+
+    def test_round_robin(self, replica_pools):
+        replica_pool_set = connection_pool.ReplicaPoolSet(replica_pools, 'round_robin')
+        assert [replica_pool_set.select() for _ in range(4)] == replica_pools * 2
+
+    def test_least_busy(self, replica_pools):
+        replica_pool_set = connection_pool.ReplicaPoolSet(replica_pools, 'least_busy')
+        connection = replica_pools[0].get_connection()
+        assert [replica_pool_set.select() for _ in range(2)] == [replica_pools[1]] * 2
+
+        replica_pools[0].return_connection(connection)
+        assert [replica_pool_set.select() for _ in range(2)] == replica_pools
+
+    def test_invalid_selection(self, replica_pools):
+        with pytest.raises(ValueError):
+            connection_pool.ReplicaPoolSet(replica_pools, 'random')
+
+
+class TestConnectionPoolManager(object):
+
+    def test_worker_pool_size(self, monkeypatch):
+        monkeypatch.setattr(connection_pool.ConnectionPoolManager, '_worker_num', 4)
+        worker_pool_size = connection_pool.ConnectionPoolManager._worker_pool_size
+
+        assert worker_pool_size(None) is None
+        assert [worker_pool_size(size) for size in (0, '0', 3, 10)] == [0, 0, 1, 3]
+        assert [worker_pool_size(size, 1) for size in (0, 1, 10)] == [0, 1, 3]
+
+
+class TestSqlAlchemyConnectionPool(object):
+
+    def test_discard_all_connections(self, tmp_path):
+        sqlalchemy_connection_pool = connection_pool.SqlAlchemyConnectionPool(
+            'sqlite:///{}'.format(tmp_path / 'test.db'), max_overflow=1, pool_size=1)
+        connection = sqlalchemy_connection_pool.get_connection()
+        inherited_pool = sqlalchemy_connection_pool.engine.pool
+
+        sqlalchemy_connection_pool.discard_all_connections()
+
+        # 引き継いだコネクションは閉じず、以降は新しいプールから取得する
+        assert sqlalchemy_connection_pool.engine.pool is not inherited_pool
+        assert connection.cursor().execute('SELECT 1').fetchone() == (1,)
+        new_connection = sqlalchemy_connection_pool.get_connection()
+        assert new_connection.connection is not connection.connection
+        sqlalchemy_connection_pool.return_connection(new_connection)
+        sqlalchemy_connection_pool.close_all_connections()
@@ -0,0 +1,138 @@
+import pandas as pd
+import pytest
+
+from base_project.utils.database import connection_pool, database_accessor
+
+
+@pytest.fixture
+def accessor(tmp_path):
+    sqlalchemy_connection_pool = connection_pool.SqlAlchemyConnectionPool(
+        'sqlite:///{}'.format(tmp_path / 'test.db'), max_overflow=1, pool_size=1)
+    yield database_accessor.PostgreSQLAccessor(sqlalchemy_connection_pool)
+    sqlalchemy_connection_pool.close_all_connections()
+
+
+class TestCatalogCache(object):
+
+    def test_invalidate_by_ddl(self, accessor):
+        catalog_cache = database_accessor.DatabaseAccessor._catalog_cache
+        for table_name in ('AAPL', 'MSFT'):
+            catalog_cache.set((accessor._catalog_database, None, table_name), True)
+
+        accessor._after_write(query='SELECT * FROM "AAPL"')
+        accessor._after_write(query='INSERT INTO "AAPL" VALUES (1)')
+        assert accessor.tables_exist(['AAPL', 'MSFT']) == {'AAPL', 'MSFT'}
+
+        accessor._after_write(query='DROP TABLE IF EXISTS "AAPL"')
+        assert (accessor._catalog_database, None, 'AAPL') not in catalog_cache.keys()
+        assert (accessor._catalog_database, None, 'MSFT') in catalog_cache.keys()
+
+        accessor._after_write(query='VACUUM')
+        assert (accessor._catalog_database, None, 'MSFT') not in catalog_cache.keys()
+
+
+class TestQuery(object):
+
+    def test_upsert_query(self, accessor):
+        assert accessor._upsert_query('AAPL', 'staging', ['date', 'close'], ['date'], ['close']) == (
+            'INSERT INTO "AAPL" ("date", "close") SELECT "date", "close" FROM "staging" '
+            'ON CONFLICT ("date") DO UPDATE SET "close" = EXCLUDED."close"')
+
+
+@pytest.fixture(params=['sqlite', 'duckdb'])
+def embedded_accessor(request, tmp_path):
+    if request.param == 'duckdb':
+        pytest.importorskip('duckdb_engine')
+    sqlalchemy_connection_pool = connection_pool.SqlAlchemyConnectionPool(
+        '{}:///{}'.format(request.param, tmp_path / 'test.db'), max_overflow=None, pool_size=None)
+    accessor_class = {'sqlite': database_accessor.SQLiteAccessor, 'duckdb': database_accessor.DuckDBAccessor}
+    yield accessor_class[request.param](sqlalchemy_connection_pool)
+    sqlalchemy_connection_pool.close_all_connections()
+
+
+class TestEmbeddedAccessor(object):
+
+    def test_to_driver_query(self):
+        accessor = database_accessor.SQLiteAccessor.__new__(database_accessor.SQLiteAccessor)
+        assert accessor._to_driver_query('SELECT 1', None) == ('SELECT 1', ())
+        assert accessor._to_driver_query("SELECT %s LIKE 'a%%'", [1]) == ("SELECT ? LIKE 'a%'", (1,))
+        assert accessor._to_driver_query('SELECT * FROM t WHERE a IN %(a)s AND b = %(b)s',
+                                         {'a': ['x', 'y'], 'b': 1}) == (
+            'SELECT * FROM t WHERE a IN (:a_0, :a_1) AND b = :b', {'a_0': 'x', 'a_1': 'y', 'b': 1})
+
+    def test_bulk_load_and_upsert(self, embedded_accessor):
+        embedded_accessor.create_tables('CREATE TABLE "{{ table_name }}" (date DATE PRIMARY KEY, close DOUBLE)',
+                                        ['AAPL'], raw_params={'table_name': 'AAPL'})
+        assert embedded_accessor.tables_exist(['AAPL', 'MSFT']) == {'AAPL'}
+
+        data = pd.DataFrame({'close': [1.0, 2.0]}, index=pd.Index(pd.to_datetime(['2020-01-01', '2020-01-02']),
+                                                                  name='date'))
+        assert embedded_accessor.bulk_load(data, 'AAPL').row_count == 2
+
+        update = pd.DataFrame({'close': [3.0, 4.0]}, index=pd.Index(pd.to_datetime(['2020-01-02', '2020-01-03']),
+                                                                    name='date'))
+        embedded_accessor.upsert_dataframe(update, 'AAPL', key_columns=['date'])
+
+        rows = embedded_accessor.select_all('SELECT close FROM "AAPL" WHERE close > %(close)s ORDER BY date',
+                                            {'close': 1.0})
+        assert [row[0] for row in rows] == [3.0, 4.0]
+
+        embedded_accessor.drop_tables(['AAPL'])
+        assert embedded_accessor.tables_exist(['AAPL']) == set()
+
+    def test_read_table_parallel_empty(self, embedded_accessor, monkeypatch):
+        embedded_accessor.execute('CREATE TABLE "AAPL" (date DATE, close DOUBLE)')
+        queries = []
+
+        def _read_sql_query(sql, con, params=None, **kwargs):
+            queries.append((sql, params))
+            return pd.DataFrame(columns=['date', 'close'])
+
+        monkeypatch.setattr(pd, 'read_sql_query', _read_sql_query)
+        dataframe = embedded_accessor.read_table_parallel('date', query='SELECT * FROM "AAPL" WHERE close > %(close)s',
+                                                          params={'close': 1.0})
+
+        assert list(dataframe.columns) == ['date', 'close']
+        query, params = queries[-1]
+        assert '%(close)s' not in query and params == {'close': 1.0}
+
+    def test_transaction_rollback(self, embedded_accessor):
+        embedded_accessor.execute('CREATE TABLE "AAPL" (date DATE PRIMARY KEY, close DOUBLE)')
+
+        with pytest.raises(RuntimeError):
+            with embedded_accessor.transaction():
+                embedded_accessor.execute("INSERT INTO \"AAPL\" VALUES ('2020-01-01', 1.0)")
+                raise RuntimeError('rollback')
+        with embedded_accessor.transaction():
+            embedded_accessor.execute("INSERT INTO \"AAPL\" VALUES ('2020-01-02', 2.0)")
+
+        assert embedded_accessor.select_all('SELECT close FROM "AAPL"') == [(2.0,)]
+
+    def test_upsert_duplicate_keys(self, embedded_accessor):
+        embedded_accessor.execute('CREATE TABLE "AAPL" (date DATE PRIMARY KEY, close DOUBLE)')
+
+        data = pd.DataFrame({'close': [1.0, 2.0, 3.0]}, index=pd.Index(pd.to_datetime(
+            ['2020-01-01', '2020-01-02', '2020-01-01']).date, name='date'))
+        assert embedded_accessor.upsert_dataframe(data, 'AAPL', key_columns=['date']).row_count == 2
+        assert [row[0] for row in embedded_accessor.select_all('SELECT close FROM "AAPL" ORDER BY date')] == [3.0, 2.0]
+
+        rows = [('2020-01-03', 4.0), ('2020-01-03', 5.0)]
+        with pytest.raises(ValueError):
+            embedded_accessor.upsert_dataframe(rows, 'AAPL', key_columns=['date'], columns=['date', 'close'])
+        with pytest.raises(ValueError):
+            embedded_accessor.upsert_dataframe(data, 'AAPL', key_columns=['symbol'])
+        assert embedded_accessor.select_one('SELECT count(*) FROM "AAPL"') == (2,)
+
+
+class TestDatabaseAccessorFactory(object):
+
+    def test_release_lock_on_error(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(connection_pool.ConnectionPoolManager, 'connection_pool_dict', {})
+        with pytest.raises(Exception):
+            database_accessor.DatabaseAccessorFactory.create(rdbms='sqlite', url='unknown-driver:///test.db')
+        assert not database_accessor.DatabaseAccessorFactory._lock.locked()
+
+        accessor = database_accessor.DatabaseAccessorFactory.create(
+            rdbms='sqlite', url='sqlite:///{}'.format(tmp_path / 'test.db'))
+        assert isinstance(accessor, database_accessor.SQLiteAccessor)
+        connection_pool.ConnectionPoolManager.close_connection_pools()
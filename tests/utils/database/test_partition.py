@@ -0,0 +1,43 @@
+import datetime
+import threading
+import time
+
+import pytest
+
+from base_project.utils.database import partition
+
+
+def test_split_range():
+    assert partition.split_range(0, 100, 4) == [0, 25, 50, 75]
+    assert partition.split_range(0, 2, 4) == [0, 1]
+    assert partition.split_range(0.0, 1.0, 2) == [0.0, 0.5]
+    assert partition.split_range(datetime.date(2020, 1, 1), datetime.date(2020, 1, 11), 2) == \
+        [datetime.date(2020, 1, 1), datetime.date(2020, 1, 6)]
+    assert partition.split_range(5, 5, 4) == [5]
+    assert partition.split_range(None, None, 4) == []
+
+    with pytest.raises(TypeError):
+        partition.split_range('a', 'z', 2)
+
+
+def test_to_ranges():
+    assert partition.to_ranges([0, 25, 50]) == [(0, 25), (25, 50), (50, None)]
+
+
+def test_iter_ordered():
+    lock = threading.Lock()
+    in_flight = []
+    running = [0]
+
+    def function(index):
+        with lock:
+            running[0] += 1
+            in_flight.append(running[0])
+        time.sleep(0.01 * (5 - index))
+        with lock:
+            running[0] -= 1
+        return index
+
+    results = list(partition.iter_ordered(function, [(i,) for i in range(5)], max_workers=4, max_in_flight=2))
+    assert results == list(range(5))
+    assert max(in_flight) <= 2
@@ -0,0 +1,34 @@
+from base_project.utils.database import connection_pool, pool_stats
+
+
+class TestLatencyHistogram(object):
+
+    def test_observe(self):
+        histogram = pool_stats.LatencyHistogram(buckets=(1, 10))
+        for milliseconds in (0.5, 1, 5, 20):
+            histogram.observe(milliseconds)
+
+        result = histogram.to_dict()
+        assert result['count'] == 4
+        assert result['max_ms'] == 20
+        assert result['buckets'] == {'<=1ms': 2, '<=10ms': 1, '>10ms': 1}
+
+
+class TestSqlAlchemyConnectionPoolStats(object):
+
+    def test_stats(self, tmp_path):
+        sqlalchemy_connection_pool = connection_pool.SqlAlchemyConnectionPool(
+            'sqlite:///{}'.format(tmp_path / 'test.db'), max_overflow=1, pool_size=1)
+
+        connections = [sqlalchemy_connection_pool.get_connection() for _ in range(2)]
+        stats = sqlalchemy_connection_pool.stats()
+        assert stats['checked_out'] == 2
+        assert stats['overflow'] == 1
+        assert stats['checkout_latency']['count'] == 2
+
+        for connection in connections:
+            sqlalchemy_connection_pool.return_connection(connection)
+        stats = sqlalchemy_connection_pool.stats()
+        assert stats['checked_out'] == 0
+        assert stats['peak_checked_out'] == 2
+        sqlalchemy_connection_pool.close_all_connections()
@@ -0,0 +1,36 @@
+from base_project.utils.database import query_tracer
+
+
+def test_fingerprint():
+    assert query_tracer.fingerprint('SELECT * FROM "AAPL" WHERE date >= \'2020-01-01\' LIMIT 10') == \
+        query_tracer.fingerprint('select *\n  from "MSFT" where date >= %(date)s limit 5')
+    assert query_tracer.fingerprint('SELECT * FROM t WHERE id IN (1, 2, 3) -- comment') == \
+        'select * from t where id in (?)'
+
+
+class TestQueryTracer(object):
+
+    def test_summary(self):
+        tracer = query_tracer.QueryTracer(slow_query_ms=100)
+        tracer.record('SELECT * FROM "AAPL"', 10, 5)
+        tracer.record('SELECT * FROM "MSFT"', 30, 7)
+        tracer.record('INSERT INTO t VALUES (%s)', 1, 1)
+
+        summary = tracer.summary()
+        assert [stats['fingerprint'] for stats in summary] == ['select * from ?', 'insert into t values (?)']
+        assert summary[0]['count'] == 2
+        assert summary[0]['rows'] == 12
+        assert summary[0]['total_ms'] == 40
+        assert summary[0]['max_ms'] == 30
+
+        tracer.log_summary()
+        assert tracer.summary() == []
+
+    def test_sample_rate(self):
+        tracer = query_tracer.QueryTracer(sample_rate=0.0, slow_query_ms=100)
+        tracer.record('SELECT 1', 10)
+        tracer.record('SELECT 2', 200)
+
+        summary = tracer.summary()
+        assert len(summary) == 1
+        assert summary[0]['max_ms'] == 200
@@ -0,0 +1,36 @@
+import pytest
+
+from base_project.utils.database import result_format
+
+DESCRIPTION = (('date', None), ('close', None))
+ROWS = [('2020-01-01', 1.0), ('2020-01-02', 2.0)]
+
+
+def test_resolve():
+    assert result_format.resolve() == result_format.TUPLE
+    assert result_format.resolve(to_dict=True) == result_format.DICT
+    assert result_format.resolve(result_format.COLUMNS, to_dict=True) == result_format.COLUMNS
+
+    with pytest.raises(ValueError):
+        result_format.resolve('list')
+
+
+def test_convert_rows():
+    assert result_format.convert_rows(ROWS, DESCRIPTION, result_format.TUPLE) is ROWS
+    assert result_format.convert_rows(ROWS, DESCRIPTION, result_format.DICT)[1] == {
+        'date': '2020-01-02', 'close': 2.0}
+    assert result_format.convert_rows(ROWS, DESCRIPTION, result_format.COLUMNS) == {
+        'date': ['2020-01-01', '2020-01-02'], 'close': [1.0, 2.0]}
+    assert result_format.convert_rows([], DESCRIPTION, result_format.COLUMNS) == {'date': [], 'close': []}
+
+    records = result_format.convert_rows(ROWS, DESCRIPTION, result_format.NAMEDTUPLE)
+    assert records[0].close == 1.0
+    assert type(records[0]) is type(records[1]) is result_format.record_class(('date', 'close'))
+    assert not hasattr(records[0], '__dict__')
+
+
+def test_convert_row():
+    assert result_format.convert_row(ROWS[0], DESCRIPTION, result_format.DICT) == {
+        'date': '2020-01-01', 'close': 1.0}
+    assert result_format.convert_row(None, DESCRIPTION, result_format.DICT) is None
+    assert result_format.convert_row(None, DESCRIPTION, result_format.COLUMNS) == {'date': [], 'close': []}
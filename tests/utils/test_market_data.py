@@ -0,0 +1,160 @@
+import threading
+import time
+from concurrent import futures
+from http import server
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from base_project import config
+from base_project.utils import market_data
+
+ATTRIBUTES = ['High', 'Low', 'Open', 'Close', 'Volume', 'Adj Close']
+
+
+class StubSource(object):
+    """
+    yahooと同じ形式(複数銘柄の場合はカラムが(項目, 銘柄)のMultiIndex)の結果を返却するデータソース
+    """
+
+    def __init__(self, prices):
+        self._prices = prices
+        self.requests = []
+
+    def __call__(self, symbols, data_source, start_date, end_date, session):
+        self.requests.append((list(symbols), start_date))
+        frames = {}
+        for symbol in symbols:
+            if symbol not in self._prices:
+                continue
+            series = self._prices[symbol]
+            series = series[series.index >= start_date]
+            frames[symbol] = pd.DataFrame({attribute: series for attribute in ATTRIBUTES})
+        if len(symbols) == 1:
+            return frames[symbols[0]]
+        return pd.concat(frames, axis=1).swaplevel(axis=1)
+
+
+def _prices(dates, values):
+    return pd.Series(values, index=pd.to_datetime(dates), dtype='float64')
+
+
+class TestFetchStockDataBatch(object):
+
+    def test_batch_and_split(self, market_config):
+        source = StubSource({
+            'AAPL': _prices(['2020-01-01', '2020-01-02', '2020-01-03'], [1, 2, 3]),
+            'MSFT': _prices(['2020-01-02', '2020-01-03'], [4, np.nan]),
+            'GOOG': _prices(['2020-01-01', '2020-01-02'], [5, 6]),
+        })
+
+        result = market_data.fetch_stock_data_batch(
+            ['AAPL', 'MSFT', 'GOOG', 'XXXX'], {'AAPL': '2020/01/02', 'MSFT': '2020/01/01', 'GOOG': '2020/01/01',
+                                               'XXXX': '2020/01/03'},
+            batch_size=2, session=object(), reader=source)
+
+        assert [symbols for symbols, _ in source.requests] == [['GOOG', 'MSFT'], ['AAPL', 'XXXX']]
+        assert source.requests[1][1] == pd.Timestamp('2020-01-02')
+        assert sorted(result) == ['AAPL', 'GOOG', 'MSFT']
+        assert list(result['AAPL']['Close']) == [2, 3]
+        assert list(result['MSFT']['Close']) == [4]
+        assert list(result['GOOG'].columns) == ATTRIBUTES
+
+    def test_unbatched_source(self, market_config):
+        source = StubSource({'AAPL': _prices(['2020-01-01'], [1]), 'MSFT': _prices(['2020-01-01'], [2])})
+
+        result = market_data.fetch_stock_data_batch(['AAPL', 'MSFT'], '2020/01/01', data_source='stooq',
+                                                    session=object(), reader=source)
+
+        assert [symbols for symbols, _ in source.requests] == [['AAPL'], ['MSFT']]
+        assert list(result['MSFT']['Close']) == [2]
+
+    def test_cached(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('MARKET_DATA_CACHE_ENABLED', 'true')
+        monkeypatch.setenv('MARKET_DATA_CACHE_DIR', str(tmp_path))
+        monkeypatch.setenv('MARKET_DATA_CACHE_FORMAT', 'pickle')
+        monkeypatch.setattr(config.Config, '_instance', config.Config.__internal_new__(), raising=False)
+        monkeypatch.setattr(market_data, '_cache', None)
+        monkeypatch.setattr(market_data, '_cache_unavailable', False)
+
+        dates = ['2020-01-01', '2020-01-02', '2020-01-03']
+        source = StubSource({'AAPL': _prices(dates, [1, 2, 3]), 'MSFT': _prices(dates, [4, np.nan, 6]),
+                             'GOOG': _prices(dates, [7, 8, 9])})
+
+        result = market_data.fetch_stock_data_batch(['AAPL', 'MSFT'], '2020/01/01', '2020/01/03', session=object(),
+                                                    reader=source)
+        assert list(result['MSFT']['Close']) == [4, 6]
+
+        # キャッシュ済みの銘柄は取得せず、未取得の銘柄のみまとめて取得する
+        result = market_data.fetch_stock_data_batch(['AAPL', 'MSFT', 'GOOG'], '2020/01/02', '2020/01/03',
+                                                    session=object(), reader=source)
+        assert [symbols for symbols, _ in source.requests] == [['AAPL', 'MSFT'], ['GOOG']]
+        assert source.requests[1][1] == pd.Timestamp('2020-01-02')
+        assert list(result['AAPL']['Close']) == [2, 3]
+        assert list(result['MSFT']['Close']) == [6]
+        assert list(result['GOOG']['Close']) == [8, 9]
+
+
+class StandInHandler(server.BaseHTTPRequestHandler):
+    """
+    /throttled/<n>はn回目まで429、/errorは常に503を返却するデータソースの代わり
+    """
+    protocol_version = 'HTTP/1.1'
+    counts = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            count = self.counts[self.path] = self.counts.get(self.path, 0) + 1
+        if self.path == '/error' or (self.path.startswith('/throttled/') and count <= int(self.path.split('/')[-1])):
+            status, body = (503 if self.path == '/error' else 429), b'retry'
+        else:
+            status, body = 200, b'ok'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def stand_in():
+    httpd = server.ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    httpd.shutdown()
+
+
+class TestFetchScheduler(object):
+
+    def test_retry_throttled(self, stand_in):
+        scheduler = market_data.FetchScheduler(rate=100, burst=100, max_retries=3, backoff_base=0.01)
+
+        response = scheduler.session.get(stand_in + '/throttled/2')
+
+        assert response.status_code == 200
+        stats = scheduler.latency.summary()['127.0.0.1:{}'.format(stand_in.rsplit(':', 1)[1])]
+        assert (stats['count'], stats['errors'], stats['retries']) == (3, 2, 2)
+
+    def test_give_up_after_max_retries(self, stand_in):
+        scheduler = market_data.FetchScheduler(rate=100, burst=100, max_retries=2, backoff_base=0.01)
+
+        assert scheduler.session.get(stand_in + '/error').status_code == 503
+        assert sum(stats['count'] for stats in scheduler.latency.summary().values()) == 3
+
+    def test_rate_limit(self, stand_in):
+        scheduler = market_data.FetchScheduler(rate=20, burst=1, max_connections=4)
+
+        start_time = time.perf_counter()
+        with futures.ThreadPoolExecutor(max_workers=scheduler.max_connections) as executor:
+            results = list(executor.map(lambda _: scheduler.session.get(stand_in + '/ok').status_code, range(5)))
+
+        # 1件目以外は20件/秒で補充されるトークンを待つ
+        assert time.perf_counter() - start_time >= 0.19
+        assert results == [200] * 5
@@ -0,0 +1,61 @@
+import os
+
+import pandas as pd
+import pytest
+
+from base_project.utils import market_data_cache
+
+
+class StubFetcher(object):
+
+    def __init__(self):
+        self.ranges = []
+
+    def __call__(self, start, end):
+        self.ranges.append((start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')))
+        index = pd.bdate_range(start, end)
+        return pd.DataFrame({'Close': [float(date.day) for date in index]}, index=index)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return market_data_cache.MarketDataCache(str(tmp_path), market_data_cache.FORMAT_PICKLE, max_parts=2,
+                                             refresh_days=0)
+
+
+class TestMarketDataCache(object):
+
+    def test_fetch_missing_ranges(self, cache):
+        fetcher = StubFetcher()
+
+        assert len(cache.fetch('yahoo', 'AAPL', '2020/01/06', '2020/01/10', fetcher)) == 5
+        assert len(cache.fetch('yahoo', 'AAPL', '2020/01/07', '2020/01/09', fetcher)) == 3
+        dataframe = cache.fetch('yahoo', 'AAPL', '2020/01/01', '2020/01/14', fetcher)
+
+        assert fetcher.ranges == [('2020-01-06', '2020-01-10'), ('2020-01-01', '2020-01-05'),
+                                  ('2020-01-11', '2020-01-14')]
+        assert list(dataframe.index) == list(pd.bdate_range('2020-01-01', '2020-01-14'))
+
+    def test_compact(self, cache, tmp_path):
+        fetcher = StubFetcher()
+        for day in (6, 7, 8):
+            cache.fetch('yahoo', 'BRK/B', '2020/01/06', '2020/01/{:02d}'.format(day), fetcher)
+
+        symbol_dir = tmp_path / 'yahoo' / 'BRK%2FB'
+        assert len([name for name in os.listdir(symbol_dir) if name.startswith('part-')]) == 1
+        assert len(cache.read('yahoo', 'BRK/B')) == 3
+
+    def test_evict(self, tmp_path):
+        cache = market_data_cache.MarketDataCache(str(tmp_path), market_data_cache.FORMAT_PICKLE, max_symbols=1)
+        cache.fetch('yahoo', 'AAPL', '2020/01/06', '2020/01/07', StubFetcher())
+        os.utime(tmp_path / 'yahoo' / 'AAPL', (0, 0))
+        cache.fetch('yahoo', 'MSFT', '2020/01/06', '2020/01/07', StubFetcher())
+
+        assert cache.read('yahoo', 'AAPL') is None
+        assert len(cache.read('yahoo', 'MSFT')) == 2
+
+    def test_refresh_days(self):
+        covered = (pd.Timestamp('2020-01-01'), pd.Timestamp('2020-01-31'))
+        assert market_data_cache.MarketDataCache.missing_ranges(
+            covered, pd.Timestamp('2020-01-10'), pd.Timestamp('2020-02-01'), refresh_days=7) == [
+            (pd.Timestamp('2020-01-25'), pd.Timestamp('2020-02-01'))]
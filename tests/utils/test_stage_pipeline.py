@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from base_project.utils import stage_pipeline
+
+
+class TestStagePipeline(object):
+
+    def test_run(self):
+        written = []
+        lock = threading.Lock()
+
+        def _write(value):
+            with lock:
+                written.append(value)
+            return value
+
+        pipeline = stage_pipeline.StagePipeline([
+            stage_pipeline.Stage('fetch', lambda x: x if x % 3 else None, workers=3, queue_size=2),
+            stage_pipeline.Stage('transform', lambda x: x * 10, workers=2, queue_size=1),
+            stage_pipeline.Stage('write', _write, workers=2, queue_size=1),
+        ])
+        stats, errors = pipeline.run(range(1, 31))
+
+        assert errors == []
+        assert sorted(written) == [x * 10 for x in range(1, 31) if x % 3]
+        assert [(s.name, s.items, s.skipped) for s in stats] == [('fetch', 30, 10), ('transform', 20, 0),
+                                                                 ('write', 20, 0)]
+        assert all(s.elapsed_seconds > 0 for s in stats)
+
+    def test_run_errors(self):
+
+        def _transform(value):
+            if value == 'B':
+                raise ValueError(value)
+            return value.lower()
+
+        written = []
+        pipeline = stage_pipeline.StagePipeline([
+            stage_pipeline.Stage('fetch', lambda x: x),
+            stage_pipeline.Stage('transform', _transform),
+            stage_pipeline.Stage('write', written.append),
+        ])
+        stats, errors = pipeline.run(['A', 'B', 'C'], key=lambda x: 'key-' + x)
+
+        assert [(stage_name, key, str(e)) for stage_name, key, e in errors] == [('transform', 'key-B', 'B')]
+        assert written == ['a', 'c']
+        assert stats[1].errors == 1
+        assert stats[2].items == 2
+
+    def test_run_expand(self):
+        written = []
+
+        def _write(value):
+            if value == 'b':
+                raise ValueError(value)
+            written.append(value)
+            return value
+
+        pipeline = stage_pipeline.StagePipeline([
+            stage_pipeline.Stage('fetch', list, expand=True),
+            stage_pipeline.Stage('write', _write),
+        ])
+        stats, errors = pipeline.run([('a', 'b'), (), ('c',)], key=lambda x: x)
+
+        assert sorted(written) == ['a', 'c']
+        assert [(stage_name, key) for stage_name, key, _ in errors] == [('write', 'b')]
+        assert [(s.name, s.items, s.skipped) for s in stats] == [('fetch', 3, 1), ('write', 3, 0)]
+
+    def test_run_aborted(self):
+        processed = []
+
+        def _transform(value):
+            if value == 3:
+                raise SystemExit(value)
+            processed.append(value)
+            return value
+
+        pipeline = stage_pipeline.StagePipeline([
+            stage_pipeline.Stage('fetch', lambda x: x, queue_size=1),
+            stage_pipeline.Stage('transform', _transform, workers=2, queue_size=1),
+            stage_pipeline.Stage('write', lambda x: x, queue_size=1),
+        ])
+        results = []
+        thread = threading.Thread(target=lambda: results.append(pytest.raises(SystemExit, pipeline.run, range(1000))))
+        thread.start()
+        thread.join(timeout=10)
+
+        # 全スレッドが終了して例外が送出され、中断後のデータは処理しない
+        assert not thread.is_alive()
+        assert results and results[0].value.code == 3
+        assert len(processed) < 999